@@ -0,0 +1,220 @@
+"""Agregados aditivos del tablero (KPIs, gráficos y resumen para la IA), construibles por bloques de filas."""
+import numpy as np
+import pandas as pd
+
+from cubo import MEDIDAS as MEDIDAS_CUBO, CuboMetricas, mes_venta, partir
+from sketches import a_bins, cuantil_histograma
+
+GRANO = ['Categoria', 'Ciudad_Destino', 'Canal_Venta', 'Estado_Envio']
+RESOLUCION_NPS = 0.1
+BINS_DISPERSION = 80
+PATRON_FANTASMA = 'Fantasma|No Catalogado'
+# Promedios que usa la IA: columna -> prefijo de sus columnas suma/conteo
+PROMEDIOS = {'Tiempo_Entrega_Real': 'tiempo', 'Satisfaccion_NPS': 'nps', 'Stock_Actual': 'stock'}
+
+
+def _texto(df, col):
+    return df[col].astype(object) if col in df.columns else pd.Series(np.nan, index=df.index, dtype=object)
+
+
+def _sumar(tablas, claves, columnas=None):
+    tabla = pd.concat(tablas, ignore_index=True)
+    agrupado = tabla.groupby(claves, dropna=False)
+    return (agrupado[columnas] if columnas else agrupado).sum().reset_index()
+
+
+class AgregadosTablero:
+    """Cubo de KPIs + sumas/conteos al grano Categoria × Ciudad × Canal × Estado, histograma de NPS
+    por Categoria × Ciudad y un histograma 2D disperso de Stock vs Utilidad.
+
+    Todo es aditivo: `desde_df(a).fusionar(desde_df(b))` equivale a `desde_df(concat(a, b))` siempre que
+    ambos bloques usen los mismos `anchos` de la grilla de dispersión.
+    """
+
+    def __init__(self, cubo, sumas, nps, dispersion, anchos, filas):
+        self.cubo = cubo
+        self.sumas = sumas
+        self.nps = nps
+        self.dispersion = dispersion
+        self.anchos = anchos
+        self.filas = filas
+
+    @staticmethod
+    def anchos_para(df, bins=BINS_DISPERSION):
+        """Ancho de celda de la grilla Stock × Utilidad a partir del rango de un bloque de referencia"""
+        anchos = []
+        for col in ('Stock_Actual', 'Utilidad_Total'):
+            valores = pd.to_numeric(df[col], errors='coerce') if col in df.columns else pd.Series(dtype=float)
+            rango = valores.max() - valores.min() if valores.notna().any() else 0
+            anchos.append(float(rango / bins) if rango > 0 else 1.0)
+        return tuple(anchos)
+
+    @classmethod
+    def desde_df(cls, df, anchos=None):
+        anchos = anchos or cls.anchos_para(df)
+        sumas, hist_nps, celdas = cls._tablas(df, anchos)
+        return cls(CuboMetricas.desde_df(df), sumas, hist_nps, celdas, anchos, len(df))
+
+    @classmethod
+    def por_mes(cls, df, anchos=None):
+        """Agregados de cada mes de Fecha_Venta ({Period('M') o None para las filas sin fecha: AgregadosTablero})
+        en una sola pasada: el mes es una clave más de cada groupby y después se parten las tablas"""
+        anchos = anchos or cls.anchos_para(df)
+        if 'Fecha_Venta' not in df.columns:
+            return {None: cls.desde_df(df, anchos)}
+        codigos, meses = pd.factorize(mes_venta(df['Fecha_Venta']))
+        completas = cls._tablas(df, anchos, pd.Series(codigos, index=df.index))
+        vacias = [tabla.drop(columns='_mes').iloc[:0] for tabla in completas]  # Meses sin NPS o sin dispersión
+        sumas_mes, nps_mes, celdas_mes = (partir(tabla, '_mes') for tabla in completas)
+        cubos = CuboMetricas.desde_df(df).por_mes()
+        resultado = {}
+        for codigo, sumas in sumas_mes.items():
+            mes = None if codigo < 0 else meses[codigo]
+            nps, celdas = nps_mes.get(codigo, vacias[1]), celdas_mes.get(codigo, vacias[2])
+            resultado[mes] = cls(cubos[mes], sumas, nps, celdas, anchos, int(sumas['filas'].sum()))
+        return resultado
+
+    @staticmethod
+    def _tablas(df, anchos, mes=None):
+        """Sumas, histograma de NPS y grilla de dispersión; con `mes` (código por fila) cada tabla lleva
+        además la clave '_mes'"""
+        claves = pd.DataFrame({col: _texto(df, col) for col in GRANO})
+        extra = []
+        if mes is not None:
+            claves.insert(0, '_mes', mes)
+            extra = ['_mes']
+
+        sumas = claves.assign(filas=1)
+        for col, prefijo in PROMEDIOS.items():
+            valores = pd.to_numeric(df[col], errors='coerce') if col in df.columns else pd.Series(np.nan, index=df.index)
+            sumas[f'{prefijo}_suma'] = valores.fillna(0).astype('float64')
+            sumas[f'{prefijo}_n'] = valores.notna().astype('int64')
+        utilidad = df['Utilidad_Total'] if 'Utilidad_Total' in df.columns else pd.Series(0.0, index=df.index)
+        sumas['perdidas'] = utilidad.where(utilidad < 0, 0.0)
+        sumas = sumas.groupby(extra + GRANO, dropna=False).sum().reset_index()
+
+        nps = pd.to_numeric(df['Satisfaccion_NPS'], errors='coerce') if 'Satisfaccion_NPS' in df.columns \
+            else pd.Series(np.nan, index=df.index)
+        con_nps = nps.notna()
+        hist_nps = claves.loc[con_nps, extra + ['Categoria', 'Ciudad_Destino']].assign(
+            bin=a_bins(nps[con_nps], RESOLUCION_NPS), n=1)
+        hist_nps = hist_nps.groupby(extra + ['Categoria', 'Ciudad_Destino', 'bin'], dropna=False)['n'].sum().reset_index()
+
+        stock = df['Stock_Actual'] if 'Stock_Actual' in df.columns else pd.Series(np.nan, index=df.index)
+        xy = pd.DataFrame({'x': pd.to_numeric(stock, errors='coerce'),
+                           'y': pd.to_numeric(utilidad, errors='coerce')}).dropna()
+        celdas = pd.DataFrame({**{c: claves.loc[xy.index, c] for c in extra + ['Categoria']},
+                               'bx': np.floor(xy['x'] / anchos[0]).astype('int64'),
+                               'by': np.floor(xy['y'] / anchos[1]).astype('int64'), 'n': 1})
+        celdas = celdas.groupby(extra + ['Categoria', 'bx', 'by'], dropna=False)['n'].sum().reset_index()
+        return sumas, hist_nps, celdas
+
+    def a_tablas(self):
+        """Las tablas que definen los agregados (para guardarlas, p. ej. como artefactos del lote)"""
+        return {'cubo_medidas': self.cubo.medidas, 'cubo_nps': self.cubo.nps, 'sumas': self.sumas,
+                'nps': self.nps, 'dispersion': self.dispersion}
+
+    @classmethod
+    def desde_tablas(cls, tablas, anchos, filas):
+        """Inverso de `a_tablas`: no recorre filas"""
+        return cls(CuboMetricas(tablas['cubo_medidas'], tablas['cubo_nps']), tablas['sumas'], tablas['nps'],
+                   tablas['dispersion'], tuple(anchos), filas)
+
+    @classmethod
+    def combinar(cls, partes, anchos):
+        """Agregados nuevos con la suma de todas las partes (p. ej. particiones mensuales), con un solo
+        groupby por tabla en lugar de fusionarlas de a una; las partes no se modifican"""
+        if any(p.anchos != tuple(anchos) for p in partes):
+            raise ValueError("Los bloques deben compartir la grilla de dispersión (anchos)")
+        if not partes:
+            vacio = pd.DataFrame(columns=GRANO + ['Fecha_Venta', 'Satisfaccion_NPS', *MEDIDAS_CUBO], dtype='float64')
+            return cls.desde_df(vacio, anchos=tuple(anchos))
+        return cls(CuboMetricas.combinar([p.cubo for p in partes]),
+                   _sumar([p.sumas for p in partes], GRANO),
+                   _sumar([p.nps for p in partes], ['Categoria', 'Ciudad_Destino', 'bin'], 'n'),
+                   _sumar([p.dispersion for p in partes], ['Categoria', 'bx', 'by'], 'n'),
+                   tuple(anchos), sum(p.filas for p in partes))
+
+    def fusionar(self, otro):
+        if otro.anchos != self.anchos:
+            raise ValueError("Los bloques deben compartir la grilla de dispersión (anchos)")
+        self.cubo.fusionar(otro.cubo)
+        self.sumas = _sumar([self.sumas, otro.sumas], GRANO)
+        self.nps = _sumar([self.nps, otro.nps], ['Categoria', 'Ciudad_Destino', 'bin'], 'n')
+        self.dispersion = _sumar([self.dispersion, otro.dispersion], ['Categoria', 'bx', 'by'], 'n')
+        self.filas += otro.filas
+        return self
+
+    def restar(self, otro):
+        """Descuenta los agregados de filas que salen (p. ej. reemplazadas por una versión nueva)"""
+        if otro.anchos != self.anchos:
+            raise ValueError("Los bloques deben compartir la grilla de dispersión (anchos)")
+        self.cubo.restar(otro.cubo)
+        conteos = otro.sumas.columns.difference(GRANO)
+        self.sumas = _sumar([self.sumas, otro.sumas.assign(**{c: -otro.sumas[c] for c in conteos})], GRANO)
+        self.sumas = self.sumas[self.sumas['filas'] != 0].reset_index(drop=True)
+        self.nps = _sumar([self.nps, otro.nps.assign(n=-otro.nps['n'])], ['Categoria', 'Ciudad_Destino', 'bin'], 'n')
+        self.nps = self.nps[self.nps['n'] != 0].reset_index(drop=True)
+        self.dispersion = _sumar([self.dispersion, otro.dispersion.assign(n=-otro.dispersion['n'])], ['Categoria', 'bx', 'by'], 'n')
+        self.dispersion = self.dispersion[self.dispersion['n'] != 0].reset_index(drop=True)
+        self.filas -= otro.filas
+        return self
+
+    # --- Consultas filtradas por categoría: costo ∝ celdas, no ∝ filas ---
+    @staticmethod
+    def _filtrar(tabla, categorias):
+        return tabla if categorias is None else tabla[tabla['Categoria'].isin(list(categorias))]
+
+    def conteo_estados(self, categorias=None):
+        sumas = self._filtrar(self.sumas, categorias)
+        return sumas.groupby('Estado_Envio')['filas'].sum().rename('Registros')
+
+    def estadisticas_caja(self, categorias=None):
+        """Mismas columnas que `graficos.estadisticas_caja`, calculadas desde el histograma de NPS"""
+        filas = {}
+        for ciudad, grupo in self._filtrar(self.nps, categorias).groupby('Ciudad_Destino'):
+            hist = grupo.groupby('bin')['n'].sum()
+            bins, conteos = hist.index.to_numpy(), hist.to_numpy()
+            q1, med, q3 = (cuantil_histograma(bins, conteos, q, RESOLUCION_NPS) for q in (0.25, 0.5, 0.75))
+            valores = bins * RESOLUCION_NPS
+            iqr = q3 - q1
+            filas[ciudad] = {'q1': q1, 'mediana': med, 'q3': q3,
+                             'bigote_inf': valores[valores >= q1 - 1.5 * iqr - 1e-9].min(),
+                             'bigote_sup': valores[valores <= q3 + 1.5 * iqr + 1e-9].max(),
+                             'n': int(conteos.sum())}
+        return pd.DataFrame.from_dict(filas, orient='index').rename_axis('Ciudad_Destino')
+
+    def grilla_dispersion(self, categorias=None, bins=BINS_DISPERSION):
+        """Centros x, centros y y matriz de conteos, re-agrupando celdas para no superar `bins` por eje"""
+        celdas = self._filtrar(self.dispersion, categorias)
+        if celdas.empty:
+            return np.array([]), np.array([]), np.zeros((0, 0))
+        celdas = celdas.groupby(['bx', 'by'])['n'].sum().reset_index()
+        ejes = []
+        for eje, ancho in (('bx', self.anchos[0]), ('by', self.anchos[1])):
+            minimo = celdas[eje].min()
+            factor = max(1, int(np.ceil((celdas[eje].max() - minimo + 1) / bins)))
+            celdas[eje] = (celdas[eje] - minimo) // factor
+            n = int(celdas[eje].max()) + 1
+            ejes.append((minimo + (np.arange(n) + 0.5) * factor) * ancho)
+        z = np.zeros((len(ejes[1]), len(ejes[0])))
+        np.add.at(z, (celdas['by'].to_numpy(), celdas['bx'].to_numpy()), celdas['n'].to_numpy())
+        return ejes[0], ejes[1], z
+
+    def resumen_ia(self, categorias=None):
+        """Los cuatro insumos del diagnóstico (fuga, logística, fantasmas, paradoja) con la forma de antes"""
+        sumas = self._filtrar(self.sumas, categorias)
+
+        def promedios(por, columnas):
+            g = sumas.groupby(por)[[f'{PROMEDIOS[c]}_{s}' for c in columnas for s in ('suma', 'n')]].sum()
+            return {c: (g[f'{PROMEDIOS[c]}_suma'] / g[f'{PROMEDIOS[c]}_n'].replace(0, np.nan)).to_dict() for c in columnas}
+
+        fuga = sumas.groupby('Canal_Venta')['perdidas'].sum()
+        por_cat = self._filtrar(self.cubo.medidas, categorias)
+        fantasmas = por_cat.loc[por_cat['Categoria'].astype(str).str.contains(PATRON_FANTASMA, na=False), 'ingresos'].sum()
+        return {
+            'fuga': fuga[fuga < 0].to_dict(),
+            'logistica': promedios('Ciudad_Destino', ['Tiempo_Entrega_Real', 'Satisfaccion_NPS']),
+            'fantasmas': fantasmas,
+            'paradoja': promedios('Categoria', ['Stock_Actual', 'Satisfaccion_NPS']),
+        }
@@ -0,0 +1,173 @@
+"""Llamadas a Groq para el diagnóstico: cliente reutilizado, respuestas cacheadas con TTL, streaming y límite de tiempo."""
+import hashlib
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+import groq
+import httpx
+
+MODELO = "llama-3.3-70b-versatile"
+TEMPERATURA = 0.2
+TIMEOUT_SEGUNDOS = 60      # Límite total de la respuesta (incluye el streaming de tokens)
+TIMEOUT_CONEXION = 10
+REINTENTOS = 3
+BACKOFF_SEGUNDOS = 0.5     # 0.5 s, 1 s, 2 s...
+TTL_SEGUNDOS = 6 * 60 * 60
+# Errores transitorios: vale la pena reintentar si todavía no se mostró ningún token
+ERRORES_REINTENTABLES = (groq.APIConnectionError, groq.RateLimitError, groq.InternalServerError)
+
+_clientes = {}
+_lock_clientes = threading.Lock()
+
+
+def obtener_cliente(api_key, base_url=None):
+    """Un cliente Groq por (api_key, base_url) y por proceso: reutiliza el pool de conexiones HTTP"""
+    clave = (hashlib.sha256(api_key.encode()).hexdigest(), base_url)
+    with _lock_clientes:
+        if clave not in _clientes:
+            _clientes[clave] = groq.Groq(api_key=api_key, base_url=base_url, max_retries=0,
+                                         timeout=groq.Timeout(TIMEOUT_SEGUNDOS, connect=TIMEOUT_CONEXION))
+        return _clientes[clave]
+
+
+def clave_prompt(prompt, modelo=MODELO, temperatura=TEMPERATURA):
+    return hashlib.sha256(f"{modelo}\x00{temperatura}\x00{prompt}".encode()).hexdigest()
+
+
+class CacheRespuestas:
+    """Cache LRU con expiración (TTL) de respuestas completas, compartida por todas las sesiones"""
+
+    def __init__(self, ttl=TTL_SEGUNDOS, max_entradas=256):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            guardado, texto = entrada
+            if time.monotonic() - guardado > self.ttl:
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return texto
+
+    def guardar(self, clave, texto):
+        with self._lock:
+            self._entradas[clave] = (time.monotonic(), texto)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+cache_respuestas = CacheRespuestas()
+
+
+def prompt_diagnostico(resumen, ingreso_total):
+    """Prompt del diagnóstico a partir de `AgregadosTablero.resumen_ia` y el ingreso de la selección.
+    El tablero y el lote lo arman igual, así una respuesta precalculada comparte la clave de cache"""
+    return f"""
+    Eres un Auditor Senior. Basado en estos datos REALES, responde las 5 preguntas de la caja anterior:
+    - Pérdidas por Canal: {resumen['fuga']}
+    - Logística por Ciudad: {resumen['logistica']}
+    - Venta SKUs Fantasma: ${resumen['fantasmas']}
+    - Stock vs NPS: {resumen['paradoja']}
+    - Ingreso Total: ${ingreso_total}
+
+    Instrucciones:
+    - Sé directo, crítico y profesional.
+    - Usa Markdown con negritas.
+    - Si el impacto de SKUs fantasma es > 0, calcula su % frente al ingreso total.
+    """
+
+
+def _restante(limite, timeout):
+    restante = limite - time.monotonic()
+    if restante <= 0:
+        raise TimeoutError(f"La respuesta de la IA superó {timeout} s")
+    return restante
+
+
+def _abrir_stream(cliente, prompt, modelo, temperatura, reintentos, backoff, limite, timeout):
+    """Abre la respuesta en streaming, reintentando con backoff exponencial los errores transitorios.
+    Cada intento (y cada espera entre intentos) se acota al tiempo que queda hasta `limite`"""
+    for intento in range(reintentos + 1):
+        restante = _restante(limite, timeout)
+        try:
+            return cliente.chat.completions.create(
+                model=modelo,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperatura,
+                stream=True,
+                timeout=groq.Timeout(restante, connect=min(TIMEOUT_CONEXION, restante)),
+            )
+        except ERRORES_REINTENTABLES:
+            if intento == reintentos:
+                if time.monotonic() >= limite:
+                    raise TimeoutError(f"La respuesta de la IA superó {timeout} s") from None
+                raise
+            time.sleep(min(backoff * 2 ** intento, _restante(limite, timeout)))
+
+
+def _tokens(stream, limite, timeout):
+    """Tokens del stream leídos en un hilo aparte: el límite se cumple aunque el servidor deje de enviar
+    a mitad de la respuesta (el timeout de lectura de httpx es por lectura, no total)"""
+    cola = queue.Queue()
+
+    def leer():
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    cola.put(chunk.choices[0].delta.content)
+            cola.put(None)
+        except Exception as e:  # Se entrega al generador, en el hilo de quien consume
+            cola.put(e)
+
+    threading.Thread(target=leer, daemon=True).start()
+    while True:
+        try:
+            token = cola.get(timeout=_restante(limite, timeout))
+        except queue.Empty:
+            raise TimeoutError(f"La respuesta de la IA superó {timeout} s") from None
+        if token is None:
+            return
+        if isinstance(token, (groq.APITimeoutError, httpx.TimeoutException)):
+            raise TimeoutError(f"La respuesta de la IA superó {timeout} s") from token
+        if isinstance(token, Exception):
+            raise token
+        yield token
+
+
+def diagnosticar(cliente, prompt, modelo=MODELO, temperatura=TEMPERATURA, cache=cache_respuestas,
+                 timeout=TIMEOUT_SEGUNDOS, reintentos=REINTENTOS, backoff=BACKOFF_SEGUNDOS):
+    """Genera el texto acumulado de la respuesta a medida que llegan los tokens.
+
+    Si el mismo prompt (y modelo) ya se respondió dentro del TTL, entrega la respuesta cacheada de una vez
+    sin llamar a la API. Lanza TimeoutError si la respuesta completa (reintentos incluidos) supera
+    `timeout` segundos. Solo se cachean respuestas con texto.
+    """
+    clave = clave_prompt(prompt, modelo, temperatura)
+    texto = cache.obtener(clave)
+    if texto is not None:
+        yield texto
+        return
+
+    limite = time.monotonic() + timeout
+    stream = _abrir_stream(cliente, prompt, modelo, temperatura, reintentos, backoff, limite, timeout)
+    partes = []
+    try:
+        for token in _tokens(stream, limite, timeout):
+            partes.append(token)
+            yield "".join(partes)
+    finally:
+        stream.close()
+    if partes:
+        cache.guardar(clave, "".join(partes))
@@ -0,0 +1,63 @@
+"""Benchmark: normalización de Lead_Time_Dias y Categoria por fila (apply + regex) vs. por valor distinto.
+
+Uso (desde la raíz del repo):  python -m benchmarks.bench_normalizacion [filas]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from pipeline import MAPA_CATEGORIAS, normalizar_categoria, simplificar_lead_time
+from normalizacion import normalizar_por_valor
+
+
+def inventario_sintetico(filas, semilla=0):
+    """Muestrea los valores crudos reales de inventario_central_v2.csv hasta `filas` registros"""
+    base = pd.read_csv('inventario_central_v2.csv', usecols=['Categoria', 'Lead_Time_Dias'])
+    rng = np.random.default_rng(semilla)
+    idx = rng.integers(0, len(base), filas)
+    return base.iloc[idx].reset_index(drop=True)
+
+
+def por_fila(df):
+    lead = df['Lead_Time_Dias'].apply(simplificar_lead_time)
+    cat = df['Categoria']
+    for patron, reemplazo in MAPA_CATEGORIAS.items():
+        cat = cat.str.replace(patron, reemplazo, regex=True)
+    return lead, cat
+
+
+def por_valor(df):
+    return (normalizar_por_valor(df['Lead_Time_Dias'], simplificar_lead_time),
+            normalizar_por_valor(df['Categoria'], normalizar_categoria))
+
+
+def cronometrar(funcion, df, repeticiones=3):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion(df)
+        tiempos.append(time.perf_counter() - t0)
+    return min(tiempos), resultado
+
+
+def main(filas=1_000_000):
+    df = inventario_sintetico(filas)
+    df_cat = df.astype('category')
+    t_fila, (lead_a, cat_a) = cronometrar(por_fila, df, repeticiones=1)
+    t_valor, (lead_b, cat_b) = cronometrar(por_valor, df)
+    t_cat, _ = cronometrar(por_valor, df_cat)
+
+    # Ambos caminos deben producir exactamente los mismos valores
+    pd.testing.assert_series_equal(lead_a, lead_b, check_names=False)
+    assert cat_a.astype(object).equals(cat_b.astype(object))
+
+    print(f"Filas: {filas:,}")
+    print(f"  Por fila (apply + {len(MAPA_CATEGORIAS)} regex):     {t_fila:8.3f} s")
+    print(f"  Por valor distinto (object):      {t_valor:8.3f} s   x{t_fila / t_valor:,.0f}")
+    print(f"  Por valor distinto (categórica):  {t_cat:8.3f} s   x{t_fila / t_cat:,.0f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
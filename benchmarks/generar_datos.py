@@ -0,0 +1,191 @@
+"""Generador de tablas sintéticas con el esquema (y la suciedad) de los CSV reales.
+
+Reproduce los valores que atacan las reglas de limpieza: Categoria '???' y variantes ('smart-phone', 'LAPTOP'),
+Lead Time textual ('25-30 días', 'Inmediato'), stock nulo o negativo, SKU fantasma, cantidades negativas,
+tiempos de entrega 999, estados vacíos, ciudades abreviadas ('MED', 'BOG'), comentarios '---' / 'N/A',
+ratings 99, edades 195 y Transaccion_ID duplicados en feedback.
+
+Uso (desde la raíz del repo):  python -m benchmarks.generar_datos --filas 10000 100000 --salida datos_sinteticos
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+TAMANOS = [10_000, 100_000, 1_000_000, 10_000_000]
+FILAS_POR_BLOQUE = 1_000_000
+
+CATEGORIAS = ['Laptops', 'Monitores', 'Smartphones', 'Tablets', 'Accesorios', 'smart-phone', '???', 'LAPTOP']
+LEAD_TIMES = ['25-30 días', 'Inmediato', '10', '5', '3', None]
+BODEGAS = ['norte', 'Sur', 'BOD-EXT-99', 'ZONA_FRANCA', 'Norte', 'Occidente']
+ESTADOS = ['Retrasado', 'Entregado', None, 'Devuelto', 'En Camino', 'Perdido']
+CIUDADES = ['Ventas_Web', 'BOG', 'Bogotá', 'Cali', 'Bucaramanga', 'Medellín', 'MED', 'Barranquilla']
+CANALES = ['Físico', 'Online', 'WhatsApp', 'App']
+COMENTARIOS = ['Excelente', 'Lento', None, 'Dañado', '---', 'No volvería', 'Precio justo', 'N/A']
+RECOMIENDA = ['SI', 'NO', None, 'Maybe', 'N/A']
+TICKETS = ['Sí', '1', '0', 'No']
+
+# Proporciones observadas en los CSV de muestra
+SKUS_POR_TRANSACCION = 0.25
+PROP_SKU_FANTASMA = 0.175
+PROP_FEEDBACK = 0.45
+PROP_FEEDBACK_DUPLICADO = 0.2
+PRIMER_SKU, PRIMERA_TRX, PRIMER_FB = 1000, 10000, 8000
+
+
+def _elegir(rng, opciones, n):
+    return np.asarray(opciones, dtype=object)[rng.integers(0, len(opciones), n)]
+
+
+def _fechas(rng, n, inicio, dias, formato):
+    return (pd.Timestamp(inicio) + pd.to_timedelta(rng.integers(0, dias, n), unit='D')).strftime(formato)
+
+
+def generar_inventario(n_skus, rng):
+    stock = rng.integers(-50, 2000, n_skus).astype(float)
+    stock[rng.random(n_skus) < 0.04] = np.nan
+    return pd.DataFrame({
+        'SKU_ID': [f'PROD-{i}' for i in range(PRIMER_SKU, PRIMER_SKU + n_skus)],
+        'Categoria': _elegir(rng, CATEGORIAS, n_skus),
+        'Stock_Actual': stock,
+        'Costo_Unitario_USD': np.round(rng.uniform(0.05, 1500, n_skus), 2),
+        'Punto_Reorden': rng.integers(50, 250, n_skus),
+        'Lead_Time_Dias': _elegir(rng, LEAD_TIMES, n_skus),
+        'Bodega_Origen': _elegir(rng, BODEGAS, n_skus),
+        'Ultima_Revision': _fechas(rng, n_skus, '2024-03-04', 700, '%Y-%m-%d'),
+    })
+
+
+def generar_transacciones(n, n_skus, rng, desplazamiento=0):
+    """Bloque de `n` transacciones con IDs consecutivos desde PRIMERA_TRX + desplazamiento"""
+    fantasma = rng.random(n) < PROP_SKU_FANTASMA
+    skus = np.where(fantasma, rng.integers(n_skus, int(n_skus * 1.6) + 1, n), rng.integers(0, n_skus, n)) + PRIMER_SKU
+    cantidad = rng.integers(1, 15, n)
+    cantidad[rng.random(n) < 0.01] = -5
+    costo_envio = np.round(rng.uniform(5, 100, n), 2)
+    costo_envio[rng.random(n) < 0.08] = np.nan
+    tiempo = rng.integers(1, 31, n)
+    tiempo[rng.random(n) < 0.005] = 999
+    return pd.DataFrame({
+        'Transaccion_ID': [f'TRX-{i}' for i in range(PRIMERA_TRX + desplazamiento, PRIMERA_TRX + desplazamiento + n)],
+        'SKU_ID': [f'PROD-{s}' for s in skus],
+        'Fecha_Venta': _fechas(rng, n, '2024-09-01', 520, '%d/%m/%Y'),
+        'Cantidad_Vendida': cantidad,
+        'Precio_Venta_Final': np.round(rng.uniform(10, 2000, n), 2),
+        'Costo_Envio': costo_envio,
+        'Tiempo_Entrega_Real': tiempo,
+        'Estado_Envio': _elegir(rng, ESTADOS, n),
+        'Ciudad_Destino': _elegir(rng, CIUDADES, n),
+        'Canal_Venta': _elegir(rng, CANALES, n),
+    })
+
+
+def generar_feedback(transacciones, rng, desplazamiento=0):
+    n = int(len(transacciones) * PROP_FEEDBACK)
+    # Parte de las encuestas repite una transacción ya encuestada (fan-out en el merge)
+    unicas = rng.choice(len(transacciones), int(n * (1 - PROP_FEEDBACK_DUPLICADO)), replace=False)
+    filas = np.concatenate([unicas, rng.choice(unicas, n - len(unicas))])
+    rating = rng.integers(1, 6, n).astype(int)
+    rating[rng.random(n) < 0.007] = 99
+    edad = rng.integers(18, 86, n)
+    edad[rng.random(n) < 0.005] = 195
+    return pd.DataFrame({
+        'Feedback_ID': [f'FB-{i}' for i in range(PRIMER_FB + desplazamiento, PRIMER_FB + desplazamiento + n)],
+        'Transaccion_ID': transacciones['Transaccion_ID'].to_numpy()[filas],
+        'Rating_Producto': rating,
+        'Rating_Logistica': rng.integers(1, 6, n),
+        'Comentario_Texto': _elegir(rng, COMENTARIOS, n),
+        'Recomienda_Marca': _elegir(rng, RECOMIENDA, n),
+        'Ticket_Soporte_Abierto': _elegir(rng, TICKETS, n),
+        'Edad_Cliente': edad,
+        'Satisfaccion_NPS': np.round(rng.uniform(-100, 100, n), 1),
+    })
+
+
+def generar_consolidado(inventario, transacciones, feedback):
+    """Consolidado con las convenciones de df_consolidado: centinelas 'Otro/Desconocido', 'Sin Registro'..."""
+    inv = inventario.copy()
+    inv['Categoria'] = inv['Categoria'].replace({'Laptops': 'Laptop', 'LAPTOP': 'Laptop', 'Monitores': 'Monitor',
+                                                 'Smartphones': 'Smartphone', 'smart-phone': 'Smartphone',
+                                                 'Accesorios': 'Accesorio', '???': 'No Definido'})
+    inv['Bodega_Origen'] = inv['Bodega_Origen'].str.capitalize()
+    inv['Lead_Time_Dias'] = inv['Lead_Time_Dias'].map({'25-30 días': 30.0, 'Inmediato': 0.0, '10': 10.0, '5': 5.0, '3': 3.0})
+    tr = transacciones.copy()
+    tr['Cantidad_Vendida'] = tr['Cantidad_Vendida'].clip(lower=0)
+    tr['Estado_Envio'] = tr['Estado_Envio'].fillna('No especificado')
+    tr['Ciudad_Destino'] = tr['Ciudad_Destino'].replace({'MED': 'Medellín', 'BOG': 'Bogotá'})
+    tr['Costo_Envio'] = tr['Costo_Envio'].fillna(tr['Costo_Envio'].median())
+    tr['Tiempo_Entrega_Real'] = tr['Tiempo_Entrega_Real'].replace(999, np.nan).fillna(15.0)
+
+    fb = feedback.copy()
+    fb['Comentario_Texto'] = fb['Comentario_Texto'].str.lower().replace({'---': 'sin comentario', 'n/a': 'sin comentario'})
+    fb['Comentario_Texto'] = fb['Comentario_Texto'].fillna('sin comentario')
+    fb['Recomienda_Marca'] = fb['Recomienda_Marca'].replace('N/A', None).fillna('SIN RESPUESTA')
+    fb['Ticket_Soporte_Abierto'] = fb['Ticket_Soporte_Abierto'].replace({'1': 'Sí', '0': 'No'})
+    fb = fb[fb['Rating_Producto'].between(1, 5)]
+
+    df = tr.merge(inv, on='SKU_ID', how='left').merge(fb, on='Transaccion_ID', how='left')
+    df = df.fillna({'Categoria': 'Otro/Desconocido', 'Bodega_Origen': 'BODEGA_DESCONOCIDA', 'Stock_Actual': 0.0,
+                    'Costo_Unitario_USD': 0.0, 'Punto_Reorden': 0.0, 'Lead_Time_Dias': 0.0,
+                    'Ultima_Revision': '1900-01-01'})
+    sin_fb = df['Feedback_ID'].isna()
+    df.loc[sin_fb, ['Feedback_ID']] = 'No Encuestado'
+    df.loc[sin_fb, ['Comentario_Texto', 'Recomienda_Marca', 'Ticket_Soporte_Abierto']] = 'Sin Registro'
+    df.loc[sin_fb, ['Rating_Producto', 'Rating_Logistica', 'Satisfaccion_NPS']] = 0.0
+    df['Edad_Cliente'] = df['Edad_Cliente'].fillna(df['Edad_Cliente'].median())
+    df['Utilidad_Dolares'] = (df['Precio_Venta_Final'] - df['Costo_Unitario_USD']) * df['Cantidad_Vendida'] - df['Costo_Envio']
+    df['SKU_Prefijo'] = df['SKU_ID'].str[:7]
+    return df
+
+
+def generar(filas, semilla=0):
+    """Las cuatro tablas en memoria para `filas` transacciones"""
+    rng = np.random.default_rng(semilla)
+    n_skus = max(int(filas * SKUS_POR_TRANSACCION), 10)
+    inventario = generar_inventario(n_skus, rng)
+    transacciones = generar_transacciones(filas, n_skus, rng)
+    feedback = generar_feedback(transacciones, rng)
+    return {
+        'inventario_central': inventario,
+        'transacciones_logistica': transacciones,
+        'feedback_clientes': feedback,
+        'df_consolidado': generar_consolidado(inventario, transacciones, feedback),
+    }
+
+
+def escribir(filas, directorio, semilla=0, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Escribe las cuatro tablas como CSV generando las transacciones por bloques (10M no caben holgadas en RAM)"""
+    directorio = Path(directorio) / f'{filas}'
+    directorio.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(semilla)
+    n_skus = max(int(filas * SKUS_POR_TRANSACCION), 10)
+    inventario = generar_inventario(n_skus, rng)
+    inventario.to_csv(directorio / 'inventario_central.csv', index=False)
+
+    rutas = {nombre: directorio / f'{nombre}.csv' for nombre in ('transacciones_logistica', 'feedback_clientes', 'df_consolidado')}
+    fb_emitidos = 0
+    for inicio in range(0, filas, filas_por_bloque):
+        n = min(filas_por_bloque, filas - inicio)
+        transacciones = generar_transacciones(n, n_skus, rng, desplazamiento=inicio)
+        feedback = generar_feedback(transacciones, rng, desplazamiento=fb_emitidos)
+        fb_emitidos += len(feedback)
+        bloques = {'transacciones_logistica': transacciones, 'feedback_clientes': feedback,
+                   'df_consolidado': generar_consolidado(inventario, transacciones, feedback)}
+        for nombre, bloque in bloques.items():
+            bloque.to_csv(rutas[nombre], index=False, mode='w' if inicio == 0 else 'a', header=inicio == 0)
+    return directorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, nargs='+', default=TAMANOS[:2])
+    parser.add_argument('--salida', default='datos_sinteticos')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    for filas in args.filas:
+        print(f"{filas:>12,} filas -> {escribir(filas, args.salida, args.semilla)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""Benchmark de punta a punta sin Streamlit: carga, limpieza, consolidación, agregación y figuras.
+
+Mide tiempo de pared y pico de memoria (tracemalloc, en una pasada aparte) por etapa sobre datos sintéticos y compara contra
+las líneas base guardadas en benchmarks/baselines.json. Sale con código 1 si alguna etapa empeora.
+
+Todo commit que cambie una etapa medida (o agregue una) re-graba la línea base en el mismo commit, en los
+tres tamaños de referencia: `--filas 10000 100000 1000000 --guardar`. Una línea base vieja esconde las
+regresiones; las etapas que no tienen línea base se listan al final de la comparación.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.harness --filas 10000 100000            # compara contra la línea base
+    python -m benchmarks.harness --filas 10000 100000 --guardar  # actualiza la línea base
+    python -m benchmarks.harness --filas 100000 --traza .cache/trazas  # además exporta la traza por etapa
+    python -m benchmarks.harness --filas 1000000 --trabajadores 8      # además mide la limpieza en el pool
+"""
+import argparse
+import contextlib
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+
+import graficos
+import paralelo
+import pipeline
+from agregados import AgregadosTablero
+from benchmarks.generar_datos import escribir
+from carga import cargar_tabla
+from temporal import AlmacenTemporal
+import instrumentacion
+
+RUTA_BASELINES = Path(__file__).with_name('baselines.json')
+DIRECTORIO_DATOS = Path('.cache/benchmarks')
+TOLERANCIA = 0.25         # 25 % más lento o más pesado que la línea base es regresión
+PISO_SEGUNDOS = 0.05      # Por debajo de esto la diferencia es ruido
+PISO_MB = 5.0
+
+
+@contextlib.contextmanager
+def _cronometro(resultados, etapa, filas_entrada=None):
+    """Pasada de tiempo: sin tracemalloc, que encarece mucho las etapas con muchos objetos Python"""
+    info = resultados.setdefault(etapa, {})
+    t0 = time.perf_counter()
+    with instrumentacion.etapa(etapa, filas_entrada):  # Solo registra algo si hay una traza activa
+        yield info
+    info['segundos'] = round(time.perf_counter() - t0, 4)
+    if filas_entrada is not None:
+        info['filas_entrada'] = filas_entrada
+
+
+@contextlib.contextmanager
+def _memoria(resultados, etapa, filas_entrada=None):
+    """Pasada de memoria: pico de asignaciones de la etapa por encima de lo ya retenido"""
+    info = resultados.setdefault(etapa, {})
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    yield info
+    info['pico_mb'] = round((tracemalloc.get_traced_memory()[1] - base) / 1e6, 2)
+
+
+def _etapas(archivos, medir, r):
+    with tempfile.TemporaryDirectory() as cache_columnar:
+        with medir(r, 'carga_csv'):
+            tablas = {n: cargar_tabla(str(ruta), cache_columnar) for n, ruta in archivos.items()}
+        with medir(r, 'carga_columnar'):
+            tablas = {n: cargar_tabla(str(ruta), cache_columnar) for n, ruta in archivos.items()}
+
+    inv, trans, feed = tablas['inventario_central'], tablas['transacciones_logistica'], tablas['feedback_clientes']
+    with medir(r, 'limpieza_inventario', len(inv)) as info:
+        inv_limpio, _ = pipeline.limpiar_inventario(inv)
+        info['filas_salida'] = len(inv_limpio)
+    with medir(r, 'limpieza_transacciones', len(trans)) as info:
+        trans_limpio, _ = pipeline.limpiar_transacciones(trans)
+        info['filas_salida'] = len(trans_limpio)
+    with medir(r, 'limpieza_feedback', len(feed)) as info:
+        feed_limpio, _ = pipeline.limpiar_feedback(feed)
+        info['filas_salida'] = len(feed_limpio)
+    if paralelo.TRABAJADORES > 1:
+        # Las tres tablas en el pool de procesos (el pico de memoria de los trabajadores no se ve aquí)
+        filas = len(inv) + len(trans) + len(feed)
+        with medir(r, 'limpieza_paralela', filas) as info:
+            limpias = pipeline.limpiar_tablas(inv, trans, feed)
+            info['filas_salida'] = sum(len(df) for df, _ in limpias)
+            info['trabajadores'] = paralelo.TRABAJADORES if paralelo.conviene(filas) else 1
+    with medir(r, 'consolidacion', len(trans_limpio)) as info:
+        _, df_full, _ = pipeline.consolidar(inv_limpio, trans_limpio, feed_limpio)
+        info['filas_salida'] = len(df_full)
+
+    consolidado = tablas['df_consolidado']
+    with medir(r, 'agregacion', len(consolidado)):
+        agregados = AgregadosTablero.desde_df(consolidado)
+    with medir(r, 'consulta_filtros'):
+        categorias = agregados.cubo.valores('Categoria')[:3]
+        agregados.cubo.consultar(Categoria=categorias)
+        agregados.resumen_ia(categorias)
+    with medir(r, 'almacen_temporal', len(consolidado)):
+        # Lo que hace el tablero al cargar: índice de fechas, totales diarios y agregados sin filtro
+        temporal = AlmacenTemporal.desde_df(consolidado)
+        temporal.agregados()
+        temporal.ventanas(categorias=categorias)
+    with medir(r, 'consulta_fechas') as info:
+        # Primer rango: arma las particiones por mes; un trimestre que no empieza ni termina en borde de
+        # mes combina particiones completas y agrega las filas de los bordes
+        primero, ultimo = temporal.rango()
+        desde = primero + (ultimo - primero) / 3
+        info['filas_salida'] = temporal.agregados(desde, desde + timedelta(days=90)).filas
+        info['particiones'] = len(temporal.particiones)
+    with medir(r, 'figuras', len(consolidado)) as info:
+        figuras = [
+            graficos.dispersion(consolidado, 'Stock_Actual', 'Utilidad_Total', color='Categoria'),
+            graficos.caja(consolidado, 'Ciudad_Destino', 'Satisfaccion_NPS'),
+            graficos.torta(consolidado, 'Estado_Envio'),
+        ]
+        info['payload_kb'] = round(sum(len(f.to_json()) for f in figuras) / 1024, 1)
+
+
+def ejecutar(filas, directorio_datos=DIRECTORIO_DATOS, directorio_traza=None):
+    """Corre todas las etapas para un tamaño (una pasada de tiempo y otra de memoria) y devuelve {etapa: métricas}.
+    Con `directorio_traza` la pasada de tiempo se registra además como traza de instrumentación y se exporta"""
+    datos = Path(directorio_datos) / f'{filas}'
+    if not (datos / 'df_consolidado.csv').exists():
+        escribir(filas, directorio_datos)
+    archivos = {nombre: datos / f'{nombre}.csv' for nombre in
+                ('inventario_central', 'transacciones_logistica', 'feedback_clientes', 'df_consolidado')}
+    r = {}
+    if directorio_traza:
+        with instrumentacion.trazar(f'benchmark_{filas}') as traza:
+            _etapas(archivos, _cronometro, r)
+        traza.exportar(directorio_traza)
+    else:
+        _etapas(archivos, _cronometro, r)
+    tracemalloc.start()
+    try:
+        _etapas(archivos, _memoria, r)
+    finally:
+        tracemalloc.stop()
+    return r
+
+
+def comparar(actual, base):
+    """Lista de regresiones (texto) de `actual` frente a la línea base del mismo tamaño"""
+    regresiones = []
+    for etapa, m in actual.items():
+        b = base.get(etapa)
+        if not b:
+            continue  # Sin línea base: `sin_linea_base` la reporta aparte
+        for clave, piso in (('segundos', PISO_SEGUNDOS), ('pico_mb', PISO_MB)):
+            if m[clave] > b[clave] * (1 + TOLERANCIA) and m[clave] - b[clave] > piso:
+                regresiones.append(f"{etapa}.{clave}: {b[clave]} -> {m[clave]}")
+    return regresiones
+
+
+def sin_linea_base(actual, base):
+    """Etapas medidas que no tienen línea base para este tamaño (la línea base quedó vieja)"""
+    return [etapa for etapa in actual if etapa not in base]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--guardar', action='store_true', help='Guarda los resultados como nueva línea base')
+    parser.add_argument('--json', help='Ruta donde escribir los resultados completos')
+    parser.add_argument('--traza', help='Directorio donde exportar la traza por etapa (JSON y Trace Event)')
+    parser.add_argument('--trabajadores', type=int, help='Procesos para medir limpieza_paralela (TRABAJADORES_LIMPIEZA)')
+    args = parser.parse_args()
+    if args.trabajadores:
+        paralelo.TRABAJADORES = args.trabajadores
+
+    baselines = json.loads(RUTA_BASELINES.read_text()) if RUTA_BASELINES.exists() else {}
+    resultados, regresiones, faltantes = {}, [], []
+    for filas in args.filas:
+        resultados[str(filas)] = r = ejecutar(filas, directorio_traza=args.traza)
+        print(f"\n== {filas:,} filas")
+        for etapa, m in r.items():
+            extra = ''.join(f"  {k}={v}" for k, v in m.items() if k not in ('segundos', 'pico_mb'))
+            print(f"  {etapa:<24} {m['segundos']:>9.3f} s {m['pico_mb']:>9.1f} MB{extra}")
+        for texto in comparar(r, baselines.get(str(filas), {})):
+            regresiones.append(f"[{filas}] {texto}")
+        faltantes += [f"[{filas}] {etapa}" for etapa in sin_linea_base(r, baselines.get(str(filas), {}))]
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(resultados, indent=2))
+    if args.guardar:
+        baselines.update(resultados)
+        RUTA_BASELINES.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+        print(f"\nLínea base actualizada en {RUTA_BASELINES}")
+        return
+    if faltantes:
+        print("\nSin línea base (re-grabar con --guardar):\n  " + "\n  ".join(faltantes))
+    if regresiones:
+        print("\nRegresiones:\n  " + "\n  ".join(regresiones))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""Lectura de CSV con cache columnar persistente (Arrow IPC, memory-mapped) de la tabla ya procesada."""
+import contextlib
+import hashlib
+import io
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from esquemas import aplicar_esquema, memoria_bytes
+
+try:
+    import pyarrow as pa
+except ImportError:  # Sin pyarrow se parsea el CSV en cada carga
+    pa = None
+
+DIRECTORIO_COLUMNAR = Path(os.environ.get("COLUMNAR_CACHE_DIR", ".cache/columnar"))
+# Tope de disco de la cache columnar: al superarlo se borran los archivos usados hace más tiempo
+MAX_BYTES_COLUMNAR = int(float(os.environ.get("COLUMNAR_CACHE_MAX_MB", 2048)) * 1e6)
+COLS_NUM = ['Precio_Venta_Final', 'Costo_Unitario_USD', 'Cantidad_Vendida', 'Costo_Envio', 'Satisfaccion_NPS', 'Stock_Actual']
+# Se incrementa cuando cambian `procesar` o los esquemas, para invalidar los archivos columnares ya escritos
+VERSION_PROCESO = 3
+CLAVE_MEMORIA = b"dashboard.memoria"
+
+
+def procesar(df):
+    """Coerción numérica y cálculo de Utilidad_Total"""
+    for col in COLS_NUM:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+    if all(c in df.columns for c in ['Precio_Venta_Final', 'Cantidad_Vendida', 'Costo_Unitario_USD', 'Costo_Envio']):
+        df['Utilidad_Total'] = (df['Precio_Venta_Final'] * df['Cantidad_Vendida']) - \
+                               (df['Costo_Unitario_USD'] * df['Cantidad_Vendida']) - \
+                               df['Costo_Envio']
+    return df
+
+
+def huella_fuente(file_source):
+    """Identifica el contenido de la fuente: hash de los bytes en archivos subidos, (ruta, tamaño, mtime) en disco"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"v{VERSION_PROCESO}".encode())
+    if hasattr(file_source, "getvalue"):
+        h.update(file_source.getvalue())
+    else:
+        ruta = Path(file_source)
+        st_ = ruta.stat()
+        h.update(f"{ruta.resolve()}|{st_.st_size}|{st_.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def _leer_csv(file_source):
+    """Parsea, procesa y aplica el esquema compacto. El reporte de memoria queda en `df.attrs['memoria']`"""
+    if hasattr(file_source, "seek"):
+        file_source.seek(0)
+    df, reporte = aplicar_esquema(procesar(pd.read_csv(file_source)))
+    df.attrs['memoria'] = reporte
+    return df
+
+
+def leer_columnar(ruta):
+    """Abre un archivo Arrow IPC con memory-map; las columnas numéricas sin nulos no se copian"""
+    with pa.memory_map(str(ruta), "r") as fuente:
+        tabla = pa.ipc.open_file(fuente).read_all()
+    df = tabla.to_pandas(split_blocks=True)
+    meta = tabla.schema.metadata or {}
+    if CLAVE_MEMORIA in meta:
+        df.attrs['memoria'] = json.loads(meta[CLAVE_MEMORIA])
+    return df
+
+
+def escribir_columnar(df, ruta, preservar_indice=False):
+    """Escribe la tabla sin compresión (requisito para mapearla en memoria) de forma atómica"""
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tabla = pa.Table.from_pandas(df, preserve_index=preservar_indice)
+    if 'memoria' in df.attrs:
+        meta = {**(tabla.schema.metadata or {}), CLAVE_MEMORIA: json.dumps(df.attrs['memoria']).encode()}
+        tabla = tabla.replace_schema_metadata(meta)
+    tmp = ruta.with_suffix(f".{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as destino, pa.ipc.new_file(destino, tabla.schema) as writer:
+        writer.write_table(tabla)
+    os.replace(tmp, ruta)
+
+
+def _huella_bytes(ruta, n):
+    """blake2b de los primeros `n` bytes del archivo"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(ruta, "rb") as f:
+        while n > 0:
+            bloque = f.read(min(n, 1 << 22))
+            if not bloque:
+                break
+            h.update(bloque)
+            n -= len(bloque)
+    return h.hexdigest()
+
+
+def _ruta_ultima_carga(file_source, directorio):
+    nombre = hashlib.sha1(str(Path(file_source).resolve()).encode()).hexdigest()[:16]
+    return Path(directorio) / f"{nombre}.ultimo.json"
+
+
+def concatenar(*tablas):
+    """Une tablas del mismo esquema compacto conservando las columnas categóricas (sin modificarlas)"""
+    unificadas = {}
+    for col in tablas[0].columns:
+        columnas = [t[col] for t in tablas if col in t.columns]
+        if any(isinstance(c.dtype, pd.CategoricalDtype) for c in columnas):
+            categorias = columnas[0].astype('category').cat.categories
+            for c in columnas[1:]:
+                categorias = categorias.union(c.astype('category').cat.categories, sort=False)
+            unificadas[col] = pd.CategoricalDtype(categorias)
+    df = pd.concat([t.astype({c: d for c, d in unificadas.items() if c in t.columns}) for t in tablas],
+                   ignore_index=True)
+    if all('memoria' in t.attrs for t in tablas):
+        antes = sum(t.attrs['memoria']['antes'] for t in tablas)
+        df.attrs['memoria'] = {**tablas[-1].attrs['memoria'], 'antes': antes, 'despues': memoria_bytes(df)}
+    else:
+        df.attrs.clear()
+    return df
+
+
+def _leer_agregado(file_source, directorio):
+    """Si el archivo en disco solo creció por el final desde la última carga, parsea únicamente la cola.
+
+    Devuelve None cuando no hay carga previa utilizable o el prefijo cambió (hay que leer todo).
+    """
+    try:
+        ultima = json.loads(_ruta_ultima_carga(file_source, directorio).read_text())
+        previa = Path(directorio) / ultima["columnar"]
+        tamano = Path(file_source).stat().st_size
+        if tamano <= ultima["bytes"] or not previa.exists():
+            return None
+        with open(file_source, "rb") as f:
+            encabezado = f.readline()
+            f.seek(ultima["bytes"] - 1)
+            if f.read(1) != b"\n" or _huella_bytes(file_source, ultima["bytes"]) != ultima["prefijo"]:
+                return None
+            f.seek(ultima["bytes"])
+            cola = _leer_csv(io.BytesIO(encabezado + f.read()))
+        return concatenar(leer_columnar(previa), cola)
+    except (OSError, ValueError, KeyError, pa.ArrowInvalid):
+        return None
+
+
+def _recordar_carga(file_source, directorio, ruta):
+    tamano = Path(file_source).stat().st_size
+    datos = {"columnar": ruta.name, "bytes": tamano, "prefijo": _huella_bytes(file_source, tamano)}
+    _ruta_ultima_carga(file_source, directorio).write_text(json.dumps(datos))
+
+
+def podar_cache(directorio=DIRECTORIO_COLUMNAR, max_bytes=MAX_BYTES_COLUMNAR, conservar=()):
+    """Borra los archivos columnares usados hace más tiempo (mtime) hasta que el total quepa en `max_bytes`.
+    Los nombres en `conservar` no se borran. Devuelve los bytes que quedan en disco"""
+    archivos = []
+    for ruta in Path(directorio).glob("*.arrow"):
+        try:
+            st_ = ruta.stat()
+        except OSError:
+            continue
+        archivos.append((st_.st_mtime_ns, st_.st_size, ruta))
+    total = sum(tamano for _, tamano, _ in archivos)
+    for _, tamano, ruta in sorted(archivos):
+        if total <= max_bytes:
+            break
+        if ruta.name in conservar:
+            continue
+        try:
+            ruta.unlink()  # Las tablas ya mapeadas siguen siendo válidas (el archivo se libera al cerrarlas)
+            total -= tamano
+        except OSError:
+            continue
+    return total
+
+
+def cargar_tabla(file_source, directorio=DIRECTORIO_COLUMNAR, max_bytes=MAX_BYTES_COLUMNAR):
+    """Carga un CSV ya procesado, parseándolo solo la primera vez que se ve su contenido.
+
+    Para rutas en disco (p. ej. el espejo de Teams) recuerda la última carga: si el archivo solo
+    recibió filas nuevas al final, se parsea la cola y se agrega a la tabla columnar anterior.
+    Cada archivo nuevo poda la cache hasta `max_bytes`, empezando por los usados hace más tiempo.
+    """
+    if pa is None:
+        return _leer_csv(file_source)
+    ruta = Path(directorio) / f"{huella_fuente(file_source)}.arrow"
+    if ruta.exists():
+        try:
+            df = leer_columnar(ruta)
+        except (OSError, pa.ArrowInvalid):
+            ruta.unlink(missing_ok=True)
+        else:
+            with contextlib.suppress(OSError):
+                os.utime(ruta)  # El mtime marca el último uso para la poda
+            return df
+    en_disco = not hasattr(file_source, "getvalue")
+    df = (_leer_agregado(file_source, directorio) if en_disco else None)
+    if df is None:
+        df = _leer_csv(file_source)
+    try:
+        escribir_columnar(df, ruta)
+        if en_disco:
+            _recordar_carga(file_source, directorio, ruta)
+        podar_cache(directorio, max_bytes, conservar={ruta.name})
+    except (OSError, pa.ArrowException):
+        pass  # La cache es una optimización: un fallo de escritura no debe romper la carga
+    return df
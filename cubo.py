@@ -0,0 +1,135 @@
+"""Cubo de métricas pre-agregado Categoria × Ciudad_Destino × Canal_Venta × Mes para responder los filtros sin releer filas."""
+import numpy as np
+import pandas as pd
+
+from sketches import a_bins, cuantil_histograma
+
+DIMENSIONES = ['Categoria', 'Ciudad_Destino', 'Canal_Venta', 'Mes']
+# Medidas aditivas: columna de origen -> nombre en el cubo
+MEDIDAS = {'Precio_Venta_Final': 'ingresos', 'Utilidad_Total': 'utilidad', 'Cantidad_Vendida': 'unidades'}
+RESOLUCION_NPS = 0.1  # El NPS viene con un decimal: con esta resolución la mediana es exacta
+
+
+def fecha_venta(fechas):
+    """Fecha_Venta (dd/mm/yyyy) como datetime64, parseando una vez cada fecha distinta (NaT si no es válida)"""
+    codigos, unicos = pd.factorize(fechas)
+    dias = pd.to_datetime(pd.Index(unicos), format='%d/%m/%Y', errors='coerce')
+    dias = dias.append(pd.DatetimeIndex([pd.NaT]))  # el código -1 (nulo) cae en NaT
+    return pd.Series(dias[codigos], index=fechas.index, name='Fecha')
+
+
+def mes_venta(fechas):
+    """Período mensual de Fecha_Venta (dd/mm/yyyy), parseando una vez cada fecha distinta"""
+    codigos, unicos = pd.factorize(fechas)
+    meses = pd.to_datetime(pd.Index(unicos), format='%d/%m/%Y', errors='coerce').to_period('M')
+    meses = meses.append(pd.PeriodIndex([pd.NaT], freq='M'))  # el código -1 (nulo) cae en NaT
+    return pd.Series(meses[codigos], index=fechas.index, name='Mes')
+
+
+def partir(tabla, columna, quitar=True):
+    """Divide una tabla por los valores de `columna` ({valor o None si es nulo: subtabla}), en una pasada"""
+    codigos, valores = pd.factorize(tabla[columna])
+    orden = np.argsort(codigos, kind='stable')
+    cortes = np.flatnonzero(np.diff(codigos[orden])) + 1
+    resto = tabla.drop(columns=columna) if quitar else tabla
+    partes = {}
+    for posiciones in np.split(orden, cortes):
+        if len(posiciones):
+            codigo = codigos[posiciones[0]]
+            partes[None if codigo < 0 else valores[codigo]] = resto.take(posiciones).reset_index(drop=True)
+    return partes
+
+
+def _dimensiones(df):
+    dims = pd.DataFrame(index=df.index)
+    for dim in DIMENSIONES[:-1]:
+        dims[dim] = df[dim].astype(object) if dim in df.columns else np.nan
+    dims['Mes'] = mes_venta(df['Fecha_Venta']) if 'Fecha_Venta' in df.columns else pd.NaT
+    return dims
+
+
+class CuboMetricas:
+    """Sumas y conteos por celda más un histograma de NPS (>0) por celda para la mediana.
+
+    Todas las partes son aditivas: dos cubos construidos sobre bloques disjuntos se fusionan
+    sumando, y el resultado es idéntico al cubo de la tabla completa.
+    """
+
+    def __init__(self, medidas=None, nps=None):
+        self.medidas = medidas if medidas is not None else pd.DataFrame(
+            columns=DIMENSIONES + list(MEDIDAS.values()) + ['filas'])
+        self.nps = nps if nps is not None else pd.DataFrame(columns=DIMENSIONES + ['bin', 'n'])
+
+    @classmethod
+    def desde_df(cls, df):
+        dims = _dimensiones(df)
+        valores = dims.assign(**{nombre: df[col] for col, nombre in MEDIDAS.items() if col in df.columns}, filas=1)
+        medidas = valores.groupby(DIMENSIONES, dropna=False, observed=True).sum().reset_index()
+
+        nps = df['Satisfaccion_NPS'] if 'Satisfaccion_NPS' in df.columns else pd.Series(np.nan, index=df.index)
+        positivos = nps > 0
+        hist = dims[positivos].assign(bin=a_bins(nps[positivos], RESOLUCION_NPS), n=1)
+        hist = hist.groupby(DIMENSIONES + ['bin'], dropna=False, observed=True)['n'].sum().reset_index()
+        return cls(medidas, hist)
+
+    @classmethod
+    def combinar(cls, cubos):
+        """Un cubo nuevo con la suma de todos (un solo groupby por tabla); no modifica los originales"""
+        if not cubos:
+            return cls()
+        medidas = pd.concat([c.medidas for c in cubos], ignore_index=True)
+        nps = pd.concat([c.nps for c in cubos], ignore_index=True)
+        return cls(medidas.groupby(DIMENSIONES, dropna=False).sum().reset_index(),
+                   nps.groupby(DIMENSIONES + ['bin'], dropna=False)['n'].sum().reset_index())
+
+    def por_mes(self):
+        """Un cubo por cada mes ({Period('M') o None para las filas sin fecha: CuboMetricas}), sin reagrupar"""
+        nps = partir(self.nps, 'Mes', quitar=False)
+        return {mes: CuboMetricas(medidas, nps.get(mes, self.nps.iloc[:0].reset_index(drop=True)))
+                for mes, medidas in partir(self.medidas, 'Mes', quitar=False).items()}
+
+    def fusionar(self, otro):
+        """Suma otro cubo a este (p. ej. de un bloque de filas nuevo) y devuelve el resultado"""
+        medidas = pd.concat([self.medidas, otro.medidas], ignore_index=True)
+        nps = pd.concat([self.nps, otro.nps], ignore_index=True)
+        self.medidas = medidas.groupby(DIMENSIONES, dropna=False).sum().reset_index()
+        self.nps = nps.groupby(DIMENSIONES + ['bin'], dropna=False)['n'].sum().reset_index()
+        return self
+
+    def restar(self, otro):
+        """Descuenta otro cubo (filas que salen o se reemplazan); las celdas que quedan vacías se eliminan"""
+        conteos = otro.medidas.columns.difference(DIMENSIONES)
+        self.fusionar(CuboMetricas(otro.medidas.assign(**{c: -otro.medidas[c] for c in conteos}),
+                                   otro.nps.assign(n=-otro.nps['n'])))
+        self.medidas = self.medidas[self.medidas['filas'] != 0].reset_index(drop=True)
+        self.nps = self.nps[self.nps['n'] != 0].reset_index(drop=True)
+        return self
+
+    @property
+    def celdas(self):
+        return len(self.medidas)
+
+    def valores(self, dimension):
+        """Valores distintos de una dimensión (para poblar los filtros)"""
+        return sorted(self.medidas[dimension].dropna().unique())
+
+    def _mascara(self, tabla, filtros):
+        mascara = np.ones(len(tabla), dtype=bool)
+        for dim, seleccion in filtros.items():
+            if seleccion is not None:
+                mascara &= tabla[dim].isin(list(seleccion)).to_numpy()
+        return mascara
+
+    def consultar(self, **filtros):
+        """KPIs del encabezado para la selección. Los filtros son `dimension=[valores]`; None = sin filtro"""
+        medidas = self.medidas[self._mascara(self.medidas, filtros)]
+        nps = self.nps[self._mascara(self.nps, filtros)]
+        hist = nps.groupby('bin')['n'].sum()
+        return {
+            'ingresos': medidas['ingresos'].sum(),
+            'utilidad': medidas['utilidad'].sum(),
+            'unidades': medidas['unidades'].sum(),
+            'filas': int(medidas['filas'].sum()),
+            'nps_mediana': cuantil_histograma(hist.index.to_numpy(), hist.to_numpy(), 0.5, RESOLUCION_NPS),
+            'utilidad_por_categoria': medidas.groupby('Categoria')['utilidad'].sum(),
+        }
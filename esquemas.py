@@ -0,0 +1,115 @@
+"""Esquemas de tipos compactos para las cuatro tablas del tablero (inventario, transacciones, feedback, consolidado)."""
+import numpy as np
+import pandas as pd
+
+# Columnas que identifican cada tabla (se evalúan en orden: la consolidada contiene a las demás)
+FIRMAS = [
+    ('consolidado', {'Transaccion_ID', 'SKU_ID', 'Feedback_ID', 'Categoria'}),
+    ('feedback', {'Feedback_ID', 'Transaccion_ID', 'Rating_Producto'}),
+    ('transacciones', {'Transaccion_ID', 'SKU_ID', 'Fecha_Venta'}),
+    ('inventario', {'SKU_ID', 'Categoria', 'Lead_Time_Dias'}),
+]
+
+# ids: columna -> prefijo textual que se elimina para guardar la clave como entero (si todas son canónicas)
+# categoricas: columnas de baja cardinalidad
+# enteros: columnas enteras (se reducen al menor entero posible; si tienen nulos, a float32)
+# float32: medidas acotadas donde float32 no pierde precisión útil. Los montos en USD quedan en float64
+ESQUEMAS = {
+    'inventario': {
+        'ids': {'SKU_ID': 'PROD-'},
+        'categoricas': ['Categoria', 'Lead_Time_Dias', 'Bodega_Origen'],
+        'enteros': ['Stock_Actual', 'Punto_Reorden'],
+        'float32': [],
+    },
+    'transacciones': {
+        'ids': {'Transaccion_ID': 'TRX-', 'SKU_ID': 'PROD-'},
+        'categoricas': ['Estado_Envio', 'Ciudad_Destino', 'Canal_Venta'],
+        'enteros': ['Cantidad_Vendida', 'Tiempo_Entrega_Real'],
+        'float32': [],
+    },
+    'feedback': {
+        'ids': {'Feedback_ID': 'FB-', 'Transaccion_ID': 'TRX-'},
+        'categoricas': ['Comentario_Texto', 'Recomienda_Marca', 'Ticket_Soporte_Abierto'],
+        'enteros': ['Rating_Producto', 'Rating_Logistica', 'Edad_Cliente'],
+        'float32': ['Satisfaccion_NPS'],
+    },
+    'consolidado': {
+        'ids': {'Transaccion_ID': 'TRX-', 'SKU_ID': 'PROD-', 'Feedback_ID': 'FB-'},
+        'categoricas': ['Estado_Envio', 'Ciudad_Destino', 'Canal_Venta', 'Categoria', 'Bodega_Origen',
+                        'Comentario_Texto', 'Recomienda_Marca', 'Ticket_Soporte_Abierto', 'SKU_Prefijo'],
+        'enteros': ['Cantidad_Vendida', 'Stock_Actual', 'Punto_Reorden', 'Lead_Time_Dias', 'Tiempo_Entrega_Real',
+                    'Rating_Producto', 'Rating_Logistica', 'Edad_Cliente'],
+        'float32': ['Satisfaccion_NPS'],
+    },
+}
+
+
+def detectar_tabla(df):
+    """Nombre del esquema que corresponde a las columnas de `df`, o None si no se reconoce"""
+    columnas = set(df.columns)
+    for nombre, firma in FIRMAS:
+        if firma <= columnas:
+            return nombre
+    return None
+
+
+def numeros_id(serie, prefijo):
+    """Número de cada ID ('PROD-1000' -> 1000.0), NaN si no tiene el prefijo, y máscara de los IDs con
+    prefijo cuyo número no está escrito en forma canónica ('PROD-01', 'PROD-1.0', 'PROD- 1')"""
+    texto = serie.astype(str)
+    con_prefijo = texto.str.startswith(prefijo)
+    sufijo = texto.str.removeprefix(prefijo)
+    numeros = pd.to_numeric(sufijo, errors='coerce')
+    numeros[~con_prefijo] = np.nan
+    canonico = sufijo.str.fullmatch(r'0|-?[1-9][0-9]*').fillna(False).to_numpy(dtype=bool)
+    no_canonico = con_prefijo.to_numpy(dtype=bool) & ~canonico
+    numeros[no_canonico] = np.nan
+    return numeros, no_canonico
+
+
+def id_a_entero(serie, prefijo):
+    """'PROD-1000' -> 1000. Los valores sin el prefijo (p. ej. 'No Encuestado') quedan como <NA>.
+    Si algún ID no es canónico ('PROD-01' junto a 'PROD-1') la columna queda como texto categórico:
+    pasarla a entero fusionaría claves distintas"""
+    if pd.api.types.is_integer_dtype(serie):
+        return serie
+    numeros, no_canonico = numeros_id(serie, prefijo)
+    if no_canonico.any():
+        return serie.astype('category')
+    if numeros.isna().any():
+        return numeros.astype('Int32' if numeros.max() < 2**31 else 'Int64')
+    return pd.to_numeric(numeros.astype('int64'), downcast='integer')
+
+
+def _entero_compacto(serie):
+    valores = pd.to_numeric(serie, errors='coerce')
+    if valores.isna().any() or not np.array_equal(valores, np.round(valores)):
+        return valores.astype('float32')
+    return pd.to_numeric(valores.astype('int64'), downcast='integer')
+
+
+def memoria_bytes(df):
+    """Memoria residente de la tabla, incluyendo el contenido de los strings"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def aplicar_esquema(df, tabla=None):
+    """Convierte `df` al esquema compacto de su tabla. Devuelve el DataFrame y el reporte de memoria"""
+    tabla = tabla or detectar_tabla(df)
+    antes = memoria_bytes(df)
+    esquema = ESQUEMAS.get(tabla)
+    if esquema is not None:
+        for col, prefijo in esquema['ids'].items():
+            if col in df.columns:
+                df[col] = id_a_entero(df[col], prefijo)
+        for col in esquema['categoricas']:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+        for col in esquema['enteros']:
+            if col in df.columns:
+                df[col] = _entero_compacto(df[col])
+        for col in esquema['float32']:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    reporte = {'tabla': tabla or 'desconocida', 'antes': antes, 'despues': memoria_bytes(df)}
+    return df, reporte
@@ -0,0 +1,81 @@
+"""Gráficos con payload acotado: por encima de un umbral de filas se envían agregados en lugar de puntos."""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+UMBRAL_DENSIDAD = 20_000  # Hasta aquí la dispersión viaja punto a punto (WebGL); encima, como densidad 2D
+UMBRAL_CAJA = 5_000       # Encima de este N los cuartiles y bigotes se calculan en el servidor
+BINS_DENSIDAD = 80
+
+
+def dispersion(df, x, y, color=None, umbral=UMBRAL_DENSIDAD, bins=BINS_DENSIDAD, **kwargs):
+    """Scatter WebGL para N moderado; histograma 2D precalculado (bins × bins celdas) para N grande"""
+    if len(df) <= umbral:
+        return px.scatter(df, x=x, y=y, color=color, render_mode='webgl', **kwargs)
+
+    datos = df[[x, y]].apply(pd.to_numeric, errors='coerce').dropna()
+    conteos, bordes_x, bordes_y = np.histogram2d(datos[x], datos[y], bins=bins)
+    centros_x = (bordes_x[:-1] + bordes_x[1:]) / 2
+    centros_y = (bordes_y[:-1] + bordes_y[1:]) / 2
+    return densidad(centros_x, centros_y, conteos.T, x, y, **kwargs)
+
+
+def densidad(centros_x, centros_y, z, x, y, **kwargs):
+    """Heatmap de conteos ya agregados; `z` tiene forma (len(centros_y), len(centros_x))"""
+    fig = go.Figure(go.Heatmap(
+        x=centros_x, y=centros_y, z=np.where(z > 0, z, np.nan),
+        colorscale='Blues', colorbar=dict(title='Filas'),
+        hovertemplate=f'{x}: %{{x:,.0f}}<br>{y}: %{{y:,.0f}}<br>Filas: %{{z:,.0f}}<extra></extra>',
+    ))
+    titulo = kwargs.get('title', '')
+    fig.update_layout(template=kwargs.get('template'), title=f"{titulo} (densidad de {int(z.sum()):,} filas)",
+                      xaxis_title=x, yaxis_title=y)
+    return fig
+
+
+def estadisticas_caja(df, x, y):
+    """Cuartiles y bigotes (1.5 × IQR, acotados a los datos) por grupo, como los calcula Plotly"""
+    grupos = df[[x, y]].dropna().groupby(x, observed=True)[y]
+    stats = grupos.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ['q1', 'mediana', 'q3']
+    iqr = stats['q3'] - stats['q1']
+    limites = df[[x]].join((stats['q1'] - 1.5 * iqr).rename('lim_inf'), on=x).join(
+        (stats['q3'] + 1.5 * iqr).rename('lim_sup'), on=x)
+    valores = df[y]
+    dentro_inf = valores.where(valores >= limites['lim_inf'])
+    dentro_sup = valores.where(valores <= limites['lim_sup'])
+    stats['bigote_inf'] = dentro_inf.groupby(df[x], observed=True).min()
+    stats['bigote_sup'] = dentro_sup.groupby(df[x], observed=True).max()
+    stats['n'] = grupos.size()
+    return stats
+
+
+def caja(df, x, y, umbral=UMBRAL_CAJA, color_discrete_sequence=None, **kwargs):
+    """Box plot con puntos crudos para N chico; con cuartiles precalculados (5 números por grupo) para N grande"""
+    if len(df) <= umbral:
+        return px.box(df, x=x, y=y, color_discrete_sequence=color_discrete_sequence, **kwargs)
+
+    return caja_desde_estadisticas(estadisticas_caja(df, x, y), x, y, color_discrete_sequence, **kwargs)
+
+
+def caja_desde_estadisticas(stats, x, y, color_discrete_sequence=None, **kwargs):
+    """go.Box con cuartiles y bigotes precalculados (columnas de `estadisticas_caja`)"""
+    color = (color_discrete_sequence or [None])[0]
+    fig = go.Figure(go.Box(
+        x=stats.index.astype(str), q1=stats['q1'], median=stats['mediana'], q3=stats['q3'],
+        lowerfence=stats['bigote_inf'], upperfence=stats['bigote_sup'],
+        marker_color=color, boxpoints=False, name=y,
+    ))
+    fig.update_layout(template=kwargs.get('template'), title=kwargs.get('title'), xaxis_title=x, yaxis_title=y)
+    return fig
+
+
+def torta(df, names, **kwargs):
+    """Pie chart a partir de los conteos por categoría: nunca envía filas al navegador"""
+    return torta_desde_conteos(df[names].value_counts(), names, **kwargs)
+
+
+def torta_desde_conteos(conteos, names, **kwargs):
+    conteos = conteos.rename_axis(names).reset_index(name='Registros')
+    return px.pie(conteos, names=names, values='Registros', **kwargs)
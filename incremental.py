@@ -0,0 +1,329 @@
+"""Refresco incremental de las tablas de Teams: solo se limpian y consolidan las filas nuevas desde la última carga."""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import pipeline
+from agregados import AgregadosTablero
+from carga import concatenar, escribir_columnar, leer_columnar, pa, procesar
+from instrumentacion import etapa
+from integridad import auditar
+from sketches import SketchCuantiles
+from uniones import claves_enteras, unir
+
+DIRECTORIO_INCREMENTAL = Path(os.environ.get("INCREMENTAL_DIR", ".cache/incremental"))
+# Marcas de agua: Transacciones y Feedback solo reciben filas con un ID mayor al último procesado
+MARCAS = {'transacciones': 'Transaccion_ID', 'feedback': 'Feedback_ID'}
+# Medianas de imputación mantenidas como sketches: columna -> resolución (exactas con datos a esa resolución)
+RESOLUCIONES = {'Costo_Envio': 0.01, 'Tiempo_Entrega_Real': 1, 'Rating_Producto': 1}
+TABLAS = ['df_inv', 'df_trans', 'df_feed', 'df_rich', 'df_full']
+# Columnas que necesitan los agregados del tablero (más las que usa `procesar` para Utilidad_Total)
+COLUMNAS_AGREGADOS = ['Categoria', 'Ciudad_Destino', 'Canal_Venta', 'Estado_Envio', 'Fecha_Venta', 'Precio_Venta_Final',
+                      'Cantidad_Vendida', 'Costo_Unitario_USD', 'Costo_Envio', 'Tiempo_Entrega_Real',
+                      'Satisfaccion_NPS', 'Stock_Actual']
+VERSION_ESTADO = 3
+MAX_SEGMENTOS = 30  # Con más segmentos en disco se reescribe todo en uno solo
+
+MODO_COMPLETO = "completo"
+MODO_INCREMENTAL = "incremental"
+MODO_SIN_CAMBIOS = "sin cambios"
+
+
+def _fecha_maxima(fechas):
+    """Fecha_Venta (dd/mm/yyyy) más reciente, parseando una vez cada valor distinto"""
+    unicas = pd.to_datetime(pd.Series(fechas.dropna().unique()), format='%d/%m/%Y', errors='coerce')
+    return None if unicas.isna().all() else unicas.max().date().isoformat()
+
+
+def _hash_filas(df):
+    """Hash de cada fila por sus valores (sin índice ni dtypes: el esquema compacto puede ensanchar una
+    columna cuando la tabla crece sin que cambie ningún valor)"""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _huella(hashes):
+    return hashlib.blake2b(hashes.tobytes(), digest_size=16).hexdigest()
+
+
+def _filas_limpias(df):
+    return int(df.notna().all(axis=1).sum())
+
+
+def _para_agregados(df):
+    """Copia mínima del consolidado con la coerción numérica y Utilidad_Total que usa el tablero"""
+    return procesar(df[[c for c in COLUMNAS_AGREGADOS if c in df.columns]].copy())
+
+
+def _a_json(valor):
+    return valor.item() if isinstance(valor, np.generic) else valor
+
+
+class RefrescoIncremental:
+    """Tablas limpias y consolidadas de Teams que se actualizan solo con las filas nuevas.
+
+    Cuando Inventario cambia, o Transacciones/Feedback no crecieron solo por el final (se borraron o
+    reescribieron filas: se compara el hash de las filas bajo la marca de agua con el de la carga
+    anterior), se reconstruye todo con el pipeline completo. En otro caso:
+      - las filas nuevas son las de ID mayor a la marca de agua;
+      - se limpian imputando con medianas de sketches mantenidos sobre todo el historial;
+      - se cruzan contra los índices cacheados y se agregan al consolidado; las transacciones viejas que
+        reciben feedback nuevo se vuelven a cruzar y reemplazan a sus filas anteriores;
+      - métricas, integridad y, con `con_agregados`, los agregados del consolidado se actualizan en su lugar.
+    El tablero agrega el archivo maestro que se sube, no el consolidado: solo el lote pide los agregados.
+    El estado se persiste en `directorio` (Arrow + JSON) para continuar después de un reinicio.
+    Las filas ya consolidadas conservan la mediana vigente cuando se imputaron.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_INCREMENTAL, con_agregados=False):
+        self.directorio = Path(directorio)
+        self.con_agregados = con_agregados
+        self.tablas = None
+        self.metricas = {}
+        self.marcas = {}
+        self.filas_fuente = {}
+        self.huellas_fuente = {}
+        self.sketches = {}
+        self.huella_inventario = None
+        self.integridad = None
+        self.agregados = None
+        self.ultimo = {}
+        self._generacion = 0
+        self._segmentos = []
+        self._lock = threading.Lock()
+        self._cargado = False
+
+    # --- Entrada pública ---
+    def obtener(self, df_inv, df_trans, df_feed):
+        """Mismo resultado que `pipeline.ejecutar_pipeline`, más 'agregados' (None sin `con_agregados`)
+        y el resumen 'refresco'"""
+        with self._lock:
+            if not self._cargado:
+                self._cargar()
+            t0 = time.perf_counter()
+            huella_inv = pipeline.huella_tablas(df_inv)
+            hashes = {'transacciones': _hash_filas(df_trans), 'feedback': _hash_filas(df_feed)}
+            nuevas_trans = self._filas_nuevas(df_trans, 'transacciones', hashes['transacciones'])
+            nuevas_feed = self._filas_nuevas(df_feed, 'feedback', hashes['feedback'])
+            fuente = {tabla: (len(h), _huella(h)) for tabla, h in hashes.items()}
+            if huella_inv != self.huella_inventario or nuevas_trans is None or nuevas_feed is None:
+                self._completo(df_inv, df_trans, df_feed, huella_inv, fuente)
+            elif len(nuevas_trans) or len(nuevas_feed):
+                self._incremental(nuevas_trans, nuevas_feed, fuente)
+            else:
+                self.ultimo = {'modo': MODO_SIN_CAMBIOS, 'transacciones_nuevas': 0, 'feedback_nuevo': 0,
+                               'feedback_tardio': 0}
+            self.ultimo['segundos'] = round(time.perf_counter() - t0, 3)
+            self.ultimo['fecha_max'] = self.marcas.get('Fecha_Venta')
+            return {**self.tablas, 'metricas': dict(self.metricas), 'agregados': self.agregados,
+                    'refresco': dict(self.ultimo)}
+
+    # --- Detección del delta ---
+    def _filas_nuevas(self, df, tabla, hashes):
+        """Filas por encima de la marca de agua, o None si la tabla no creció solo por el final
+        (cambió la cantidad o el contenido de las filas ya procesadas)"""
+        columna = MARCAS[tabla]
+        if self.tablas is None or columna not in self.marcas:
+            return None
+        nuevas = claves_enteras(df[columna], columna) > self.marcas[columna]
+        if len(df) - int(nuevas.sum()) != self.filas_fuente[tabla]:
+            return None
+        if _huella(hashes[~nuevas]) != self.huellas_fuente.get(tabla):
+            return None  # Alguna fila ya procesada se editó en su lugar
+        return df[nuevas]
+
+    def _alimentar_sketches(self, df_trans, df_feed):
+        self.sketches['Costo_Envio'].agregar(df_trans['Costo_Envio'])
+        self.sketches['Tiempo_Entrega_Real'].agregar(df_trans['Tiempo_Entrega_Real'].replace(999, np.nan))
+        rating = df_feed['Rating_Producto']
+        self.sketches['Rating_Producto'].agregar(rating[rating.between(1, 5)])
+
+    def _avanzar_marcas(self, df_trans, df_feed, fuente):
+        for tabla, df in (('transacciones', df_trans), ('feedback', df_feed)):
+            columna = MARCAS[tabla]
+            if len(df):
+                self.marcas[columna] = max(self.marcas.get(columna, -1), int(claves_enteras(df[columna], columna).max()))
+        fecha = _fecha_maxima(df_trans['Fecha_Venta']) if 'Fecha_Venta' in df_trans.columns and len(df_trans) else None
+        if fecha and fecha > (self.marcas.get('Fecha_Venta') or ''):
+            self.marcas['Fecha_Venta'] = fecha
+        self.filas_fuente = {tabla: filas for tabla, (filas, _) in fuente.items()}
+        self.huellas_fuente = {tabla: huella for tabla, (_, huella) in fuente.items()}
+
+    # --- Reconstrucción completa ---
+    def _completo(self, df_inv, df_trans, df_feed, huella_inv, fuente):
+        resultado = pipeline.ejecutar_pipeline(df_inv, df_trans, df_feed)
+        self.tablas = {nombre: resultado[nombre] for nombre in TABLAS}
+        self.metricas = dict(resultado['metricas'])
+        self.sketches = {col: SketchCuantiles(res) for col, res in RESOLUCIONES.items()}
+        self._alimentar_sketches(df_trans, df_feed)
+        self.marcas = {}
+        self._avanzar_marcas(df_trans, df_feed, fuente)
+        self.huella_inventario = huella_inv
+        self.integridad = auditar(self.tablas['df_inv'], self.tablas['df_trans'], self.tablas['df_feed'])
+        self.agregados = self._agregados_completos(self.tablas['df_full'])
+        self.ultimo = {'modo': MODO_COMPLETO, 'transacciones_nuevas': len(df_trans), 'feedback_nuevo': len(df_feed),
+                       'feedback_tardio': 0}
+        with etapa('persistencia'):
+            self._guardar()
+
+    # --- Refresco por delta ---
+    def _incremental(self, nuevas_trans, nuevas_feed, fuente):
+        t = self.tablas
+        marca_trans = self.marcas[MARCAS['transacciones']]
+        self._alimentar_sketches(nuevas_trans, nuevas_feed)
+        medianas = {col: self.sketches[col].mediana() for col in ('Costo_Envio', 'Tiempo_Entrega_Real')}
+        with etapa('limpieza_transacciones', len(nuevas_trans)) as info:
+            trans, metricas_trans = pipeline.limpiar_transacciones(nuevas_trans, medianas)
+            info['filas_salida'] = len(trans)
+        with etapa('limpieza_feedback', len(nuevas_feed)) as info:
+            feed, metricas_feed = pipeline.limpiar_feedback(nuevas_feed, self.sketches['Rating_Producto'].mediana())
+            info['filas_salida'] = len(feed)
+        df_trans = concatenar(t['df_trans'], trans) if len(trans) else t['df_trans']
+        df_feed = concatenar(t['df_feed'], feed) if len(feed) else t['df_feed']
+
+        with etapa('consolidacion', len(trans)) as info:
+            rich, _ = unir(trans, t['df_inv'], 'SKU_ID')
+            rich['Ganancias2'] = pipeline._ganancias(rich)
+
+            # Feedback tardío: transacciones ya consolidadas que ahora tienen feedback se vuelven a cruzar
+            ids_feed = claves_enteras(feed['Transaccion_ID'], 'Transaccion_ID')
+            tardias = np.unique(ids_feed[(ids_feed >= 0) & (ids_feed <= marca_trans)])
+            df_full = t['df_full']
+            salen = df_full.iloc[:0]
+            entran = rich
+            if len(tardias):
+                sale = np.isin(claves_enteras(df_full['Transaccion_ID'], 'Transaccion_ID'), tardias)
+                salen, df_full = df_full[sale], df_full[~sale].reset_index(drop=True)
+                rich_tardio = t['df_rich'][np.isin(claves_enteras(t['df_rich']['Transaccion_ID'], 'Transaccion_ID'), tardias)]
+                entran = concatenar(rich.copy(), rich_tardio.reset_index(drop=True)) if len(rich) else rich_tardio
+            full, union_feed = unir(entran, df_feed, 'Transaccion_ID')
+            full['Ganancias'] = pipeline._ganancias(full)
+            info.update(filas_salida=len(full), feedback_tardio=int(len(tardias)))
+
+        m = self.metricas
+        m['filas_rich'] += len(rich)
+        m['filas_rich_limpias'] += _filas_limpias(rich)
+        m['utilidad_sin_fantasmas'] += rich.loc[rich['Bodega_Origen'].notnull(), 'Ganancias2'].sum()
+        m['filas_full'] += len(full) - len(salen)
+        m['filas_full_limpias'] += _filas_limpias(full) - _filas_limpias(salen)
+        m['utilidad_con_fantasmas'] += full['Ganancias'].sum() - salen['Ganancias'].sum()
+        m['pct_conservado'] = round((m['filas_full_limpias'] / m['filas_full']) * 100, 1) if m['filas_full'] else 0.0
+        m['fanout_feedback'] = m['filas_full'] - m['filas_rich']
+        # Las filas que toca cada regla de limpieza se acumulan lote a lote
+        for clave, conteos in {**metricas_trans, **metricas_feed}.items():
+            m[clave] = {regla: m[clave].get(regla, 0) + n for regla, n in conteos.items()}
+        m['transacciones_duplicadas_feedback'] = union_feed['claves_duplicadas']
+
+        self.integridad['skus'].agregar(trans)
+        self.integridad['feedback'].agregar_dimension(feed['Transaccion_ID']).agregar(trans)
+        skus, sin_feedback = self.integridad['skus'].resumen(), self.integridad['feedback'].resumen()
+        m['skus_fantasma'] = skus['claves_huerfanas']
+        m['transacciones_fantasma'] = skus['hechos_huerfanos']
+        m['ingresos_skus_fantasma'] = skus['ingresos_huerfanos']
+        m['transacciones_sin_feedback'] = sin_feedback['filas_huerfanas']
+
+        # Se neta el delta contra las filas reemplazadas y se fusiona una sola vez con los agregados grandes
+        if self.con_agregados:
+            with etapa('agregados', len(full)):
+                anchos = self.agregados.anchos
+                delta = AgregadosTablero.desde_df(_para_agregados(full), anchos=anchos)
+                if len(salen):
+                    delta.restar(AgregadosTablero.desde_df(_para_agregados(salen), anchos=anchos))
+                self.agregados.fusionar(delta)
+
+        self.tablas = {**t, 'df_trans': df_trans, 'df_feed': df_feed,
+                       'df_rich': concatenar(t['df_rich'], rich) if len(rich) else t['df_rich'],
+                       'df_full': concatenar(df_full, full)}
+        self._avanzar_marcas(trans, feed, fuente)
+        self.ultimo = {'modo': MODO_INCREMENTAL, 'transacciones_nuevas': len(nuevas_trans),
+                       'feedback_nuevo': len(nuevas_feed), 'feedback_tardio': int(len(tardias))}
+        with etapa('persistencia'):
+            self._guardar({'df_trans': trans, 'df_feed': feed, 'df_rich': rich, 'df_full': full}, tardias)
+
+    # --- Persistencia: un segmento Arrow por refresco, compactado cada MAX_SEGMENTOS ---
+    def _ruta(self, nombre, segmento):
+        return self.directorio / f"{nombre}.{segmento}.arrow"
+
+    def _guardar(self, delta=None, reemplazadas=()):
+        """Escribe solo el delta como segmento nuevo (o todo al compactar) y después el JSON que lo apunta"""
+        if pa is None:
+            return
+        compactar = delta is None or len(self._segmentos) >= MAX_SEGMENTOS
+        tablas = self.tablas if compactar else {nombre: df for nombre, df in delta.items() if len(df)}
+        segmento = {'id': self._generacion + 1, 'tablas': list(tablas),
+                    'reemplazadas': [] if compactar else [int(i) for i in reemplazadas]}
+        segmentos = [segmento] if compactar else self._segmentos + [segmento]
+        try:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            for nombre, df in tablas.items():
+                escribir_columnar(df, self._ruta(nombre, segmento['id']))
+            estado = {
+                'version': VERSION_ESTADO,
+                'segmentos': segmentos,
+                'marcas': self.marcas,
+                'filas_fuente': self.filas_fuente,
+                'huellas_fuente': self.huellas_fuente,
+                'huella_inventario': self.huella_inventario,
+                'sketches': {col: sk.a_dict() for col, sk in self.sketches.items()},
+                'metricas': {k: _a_json(v) for k, v in self.metricas.items()},
+            }
+            tmp = self.directorio / f"estado.{os.getpid()}.tmp"
+            tmp.write_text(json.dumps(estado))
+            os.replace(tmp, self.directorio / "estado.json")
+        except (OSError, pa.ArrowException):
+            return  # La persistencia es una optimización: el estado en memoria sigue siendo válido
+        self._generacion, self._segmentos = segmento['id'], segmentos
+        vigentes = {self._ruta(n, seg['id']).name for seg in segmentos for n in seg['tablas']}
+        for ruta in self.directorio.glob("*.arrow"):
+            if ruta.name not in vigentes:
+                ruta.unlink(missing_ok=True)
+
+    def _cargar(self):
+        """Retoma el estado persistido; ante cualquier inconsistencia se reconstruirá todo"""
+        self._cargado = True
+        if pa is None:
+            return
+        try:
+            estado = json.loads((self.directorio / "estado.json").read_text())
+            if estado.get('version') != VERSION_ESTADO:
+                return
+            tablas = {}
+            for segmento in estado['segmentos']:
+                # Filas de segmentos anteriores que este segmento reemplaza (feedback tardío)
+                if segmento['reemplazadas']:
+                    previo = tablas['df_full']
+                    sale = np.isin(claves_enteras(previo['Transaccion_ID'], 'Transaccion_ID'), segmento['reemplazadas'])
+                    tablas['df_full'] = previo[~sale].reset_index(drop=True)
+                for nombre in segmento['tablas']:
+                    parte = leer_columnar(self._ruta(nombre, segmento['id']))
+                    tablas[nombre] = concatenar(tablas[nombre], parte) if nombre in tablas else parte
+        except (OSError, ValueError, KeyError, pa.ArrowInvalid):
+            return
+        self.tablas = tablas
+        self._segmentos = estado['segmentos']
+        self._generacion = self._segmentos[-1]['id']
+        self.marcas = estado['marcas']
+        self.filas_fuente = estado['filas_fuente']
+        self.huellas_fuente = estado['huellas_fuente']
+        self.huella_inventario = estado['huella_inventario']
+        self.sketches = {col: SketchCuantiles.desde_dict(d) for col, d in estado['sketches'].items()}
+        self.metricas = estado['metricas']
+        self.integridad = auditar(tablas['df_inv'], tablas['df_trans'], tablas['df_feed'])
+        self.agregados = self._agregados_completos(tablas['df_full'])
+
+    def _agregados_completos(self, df_full):
+        return AgregadosTablero.desde_df(_para_agregados(df_full)) if self.con_agregados else None
+
+    def limpiar(self):
+        with self._lock:
+            self.tablas = None
+            self.huella_inventario = None
+
+
+# Instancia compartida por todas las sesiones del proceso de Streamlit
+refresco_incremental = RefrescoIncremental()
@@ -0,0 +1,45 @@
+"""Ingesta por bloques de CSV más grandes que la memoria: solo se conservan los agregados del tablero."""
+import pandas as pd
+
+from agregados import AgregadosTablero
+from carga import COLS_NUM, procesar
+from esquemas import aplicar_esquema
+from temporal import AlmacenTemporal
+
+FILAS_POR_BLOQUE = 250_000
+# Archivos subidos por encima de este tamaño se agregan por bloques en lugar de cargarse completos
+UMBRAL_BYTES_STREAMING = 150 * 1024 * 1024
+
+
+def leer_en_bloques(file_source, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Itera bloques ya procesados (coerción numérica, Utilidad_Total y esquema compacto)"""
+    if hasattr(file_source, "seek"):
+        file_source.seek(0)
+    with pd.read_csv(file_source, chunksize=filas_por_bloque) as lector:
+        for bloque in lector:
+            bloque, _ = aplicar_esquema(procesar(bloque))
+            yield bloque
+
+
+def anchos_en_bloques(file_source, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Primera pasada: anchos de la grilla de dispersión sobre el archivo completo, leyendo solo las
+    columnas numéricas. Son los mismos que `AgregadosTablero.anchos_para` sobre la tabla cargada"""
+    if hasattr(file_source, "seek"):
+        file_source.seek(0)
+    extremos = []
+    with pd.read_csv(file_source, chunksize=filas_por_bloque, usecols=lambda c: c in COLS_NUM) as lector:
+        for bloque in lector:
+            bloque = procesar(bloque)
+            extremos.append(bloque.agg(['min', 'max']))
+    if not extremos:
+        return AgregadosTablero.anchos_para(pd.DataFrame())
+    return AgregadosTablero.anchos_para(pd.concat(extremos))
+
+
+def particionar_en_bloques(file_source, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Almacén temporal bloque a bloque (particiones por mes y totales diarios, sin las filas): los rangos
+    de fechas se responden por meses completos. La grilla de dispersión usa los anchos de todo el archivo"""
+    almacen = AlmacenTemporal(anchos_en_bloques(file_source, filas_por_bloque), conservar_filas=False)
+    for bloque in leer_en_bloques(file_source, filas_por_bloque):
+        almacen.agregar(bloque)
+    return almacen
@@ -0,0 +1,138 @@
+"""Instrumentación por etapa: tiempo de pared, filas de entrada/salida y memoria de cada paso de un rerun."""
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+DIRECTORIO_TRAZAS = Path(os.environ.get("TRAZAS_DIR", ".cache/trazas"))
+
+_traza_activa = contextvars.ContextVar('traza_activa', default=None)
+_etapa_activa = contextvars.ContextVar('etapa_activa', default=None)
+
+
+def memoria_residente():
+    """Memoria residente del proceso en bytes (None fuera de Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Traza:
+    """Etapas medidas de un rerun (o de una corrida por lotes), en el orden en que terminan"""
+
+    def __init__(self, nombre='rerun'):
+        self.nombre = nombre
+        self.fecha = time.time()
+        self.inicio = time.perf_counter()
+        self.etapas = []
+        self._lock = threading.Lock()
+
+    def registrar(self, info):
+        with self._lock:
+            self.etapas.append(info)
+
+    def a_dict(self):
+        return {'nombre': self.nombre, 'fecha_unix': self.fecha,
+                'segundos': round(time.perf_counter() - self.inicio, 4),
+                'etapas': sorted(self.etapas, key=lambda e: e['inicio'])}
+
+    def a_eventos_traza(self):
+        """Formato Trace Event (chrome://tracing, Perfetto, speedscope): un evento completo 'X' por etapa"""
+        pid = os.getpid()
+        eventos = []
+        for e in self.etapas:
+            args = {k: v for k, v in e.items() if k not in ('nombre', 'inicio', 'segundos', 'hilo', 'nivel', 'padre')}
+            eventos.append({'name': e['nombre'], 'cat': self.nombre, 'ph': 'X', 'pid': pid, 'tid': e['hilo'],
+                            'ts': round(e['inicio'] * 1e6), 'dur': round(e['segundos'] * 1e6), 'args': args})
+        return {'traceEvents': sorted(eventos, key=lambda ev: ev['ts']), 'displayTimeUnit': 'ms'}
+
+    def tabla(self):
+        """Una fila por etapa, indentada según su anidamiento, lista para st.dataframe"""
+        filas = []
+        for e in sorted(self.etapas, key=lambda e: e['inicio']):
+            extra = {k: v for k, v in e.items()
+                     if k not in ('nombre', 'inicio', 'segundos', 'hilo', 'nivel', 'padre', 'filas_entrada',
+                                  'filas_salida', 'memoria_mb')}
+            filas.append({'etapa': '  ' * e['nivel'] + e['nombre'], 'segundos': e['segundos'],
+                          'filas_entrada': e.get('filas_entrada'), 'filas_salida': e.get('filas_salida'),
+                          'memoria_mb': e.get('memoria_mb'),
+                          'detalle': json.dumps(extra, ensure_ascii=False, default=str) if extra else ''})
+        return pd.DataFrame(filas, columns=['etapa', 'segundos', 'filas_entrada', 'filas_salida', 'memoria_mb', 'detalle'])
+
+    def json(self):
+        return json.dumps(self.a_dict(), ensure_ascii=False, default=str, indent=2)
+
+    def json_eventos(self):
+        return json.dumps(self.a_eventos_traza(), ensure_ascii=False, default=str)
+
+    def exportar(self, directorio=DIRECTORIO_TRAZAS):
+        """Escribe `<nombre>.<fecha>.json` (etapas) y `.trace.json` (Trace Event); devuelve ambas rutas"""
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        base = directorio / f"{self.nombre}.{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.fecha))}"
+        ruta_json, ruta_eventos = base.with_suffix('.json'), base.with_suffix('.trace.json')
+        ruta_json.write_text(self.json())
+        ruta_eventos.write_text(self.json_eventos())
+        return ruta_json, ruta_eventos
+
+
+def activar(traza):
+    """Fija la traza del contexto actual (None desactiva la medición) y la devuelve"""
+    _traza_activa.set(traza)
+    _etapa_activa.set(None)
+    return traza
+
+
+@contextlib.contextmanager
+def trazar(nombre='rerun'):
+    """Mide todas las etapas del bloque en una traza nueva"""
+    token = _traza_activa.set(Traza(nombre))
+    try:
+        yield _traza_activa.get()
+    finally:
+        _traza_activa.reset(token)
+
+
+def activa():
+    return _traza_activa.get() is not None
+
+
+@contextlib.contextmanager
+def etapa(nombre, filas_entrada=None, **datos):
+    """Mide el bloque como una etapa de la traza activa. El bloque puede completar el dict que recibe
+    (p. ej. `info['filas_salida']`). Sin traza activa no se mide nada"""
+    traza = _traza_activa.get()
+    if traza is None:
+        yield {}
+        return
+    padre = _etapa_activa.get()
+    info = {'nombre': nombre, 'padre': padre['nombre'] if padre else None,
+            'nivel': padre['nivel'] + 1 if padre else 0, 'hilo': threading.get_ident(), **datos}
+    if filas_entrada is not None:
+        info['filas_entrada'] = filas_entrada
+    token = _etapa_activa.set(info)
+    memoria = memoria_residente()
+    t0 = time.perf_counter()
+    try:
+        yield info
+    finally:
+        info['inicio'] = round(t0 - traza.inicio, 6)
+        info['segundos'] = round(time.perf_counter() - t0, 6)
+        if memoria is not None:
+            info['memoria_mb'] = round((memoria_residente() - memoria) / 1e6, 2)  # Delta de RSS de todo el proceso
+        _etapa_activa.reset(token)
+        traza.registrar(info)
+
+
+def anotar(**datos):
+    """Agrega datos a la etapa en curso (si se está midiendo)"""
+    info = _etapa_activa.get()
+    if info is not None and _traza_activa.get() is not None:
+        info.update(datos)
@@ -0,0 +1,75 @@
+"""Integridad referencial por anti-join sobre conjuntos de claves: SKUs y transacciones fantasma sin cruzar tablas."""
+import numpy as np
+import pandas as pd
+
+from uniones import IndiceClaves, cache_indices, claves_enteras
+
+COLUMNA_INGRESOS = 'Precio_Venta_Final'  # Misma medida que 'ingresos' en el cubo
+
+
+class RelacionIntegridad:
+    """Filas de hechos cuya `clave` no existe en la tabla de dimensión (huérfanas), acumuladas por lotes.
+
+    Por cada lote de hechos se hace un solo anti-join contra el conjunto ordenado de claves de la
+    dimensión y se guardan únicamente las huérfanas (posición, clave, id propio e ingresos). Si llegan
+    claves nuevas a la dimensión, las huérfanas que ahora tienen pareja se descartan sin releer hechos.
+    """
+
+    def __init__(self, clave, claves_dimension, id_hechos=None, columna_ingresos=COLUMNA_INGRESOS):
+        self.clave = clave
+        self.id_hechos = id_hechos
+        self.columna_ingresos = columna_ingresos
+        self.filas = 0
+        self._indice = cache_indices.obtener(pd.Series(claves_dimension), clave)  # El mismo índice que usan los cruces
+        self._huerfanas = pd.DataFrame({'posicion': pd.Series(dtype='int64'), 'clave': pd.Series(dtype='int64'),
+                                        'id': pd.Series(dtype='int64'), 'ingresos': pd.Series(dtype='float64')})
+
+    def agregar(self, hechos):
+        """Procesa un lote de hechos; las posiciones continúan las de los lotes anteriores"""
+        claves = claves_enteras(hechos[self.clave], self.clave)
+        inicio, fin = self._indice.rangos(claves)
+        huerfana = fin == inicio
+        ids = claves_enteras(hechos[self.id_hechos], self.id_hechos) if self.id_hechos else claves
+        ingresos = pd.to_numeric(hechos[self.columna_ingresos], errors='coerce').to_numpy(dtype='float64') \
+            if self.columna_ingresos in hechos.columns else np.zeros(len(hechos))
+        nuevas = pd.DataFrame({'posicion': np.flatnonzero(huerfana) + self.filas, 'clave': claves[huerfana],
+                               'id': ids[huerfana], 'ingresos': ingresos[huerfana]})
+        self._huerfanas = pd.concat([self._huerfanas, nuevas], ignore_index=True) if len(self._huerfanas) else nuevas
+        self.filas += len(hechos)
+        return self
+
+    def agregar_dimension(self, claves_nuevas):
+        """Incorpora claves nuevas a la dimensión y resuelve las huérfanas que ahora tienen pareja"""
+        nuevas = claves_enteras(pd.Series(claves_nuevas), self.clave)
+        self._indice = IndiceClaves(np.concatenate([self._indice.claves, nuevas]))
+        self._huerfanas = self._huerfanas[~np.isin(self._huerfanas['clave'], nuevas[nuevas >= 0])].reset_index(drop=True)
+        return self
+
+    @property
+    def posiciones(self):
+        """Posiciones (0..filas-1 en el orden de llegada) de las filas de hechos huérfanas"""
+        return self._huerfanas['posicion'].to_numpy()
+
+    def reporte(self):
+        """Una fila por clave huérfana (las nulas juntas): filas de hechos, ids distintos e ingresos, de mayor a menor"""
+        h = self._huerfanas
+        reporte = h.groupby('clave').agg(filas=('id', 'size'), ids=('id', 'nunique'), ingresos=('ingresos', 'sum'))
+        reporte = reporte.sort_values(['ingresos', 'filas'], ascending=False).reset_index()
+        reporte['clave'] = reporte['clave'].astype('Int64').mask(reporte['clave'] < 0)
+        return reporte.rename(columns={'clave': self.clave})
+
+    def resumen(self):
+        h = self._huerfanas
+        return {
+            'filas_huerfanas': len(h),
+            'claves_huerfanas': int(h.loc[h['clave'] >= 0, 'clave'].nunique()),  # Las claves nulas no cuentan
+            'hechos_huerfanos': int(h.loc[h['id'] >= 0, 'id'].nunique()),
+            'ingresos_huerfanos': float(h['ingresos'].sum()),
+        }
+
+
+def auditar(df_inv, df_trans, df_feed):
+    """SKUs fantasma (Transacciones -> Inventario) y transacciones sin feedback (Transacciones -> Feedback)"""
+    skus = RelacionIntegridad('SKU_ID', df_inv['SKU_ID'], id_hechos='Transaccion_ID').agregar(df_trans)
+    feedback = RelacionIntegridad('Transaccion_ID', df_feed['Transaccion_ID']).agregar(df_trans)
+    return {'skus': skus, 'feedback': feedback}
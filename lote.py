@@ -0,0 +1,256 @@
+"""Modo por lotes sin Streamlit: descarga, limpieza, consolidación, KPIs y diagnóstico publicados como artefactos versionados.
+
+Cada corrida escribe una versión nueva en `<salida>/<version>/` (tablas Arrow + manifiesto.json) y recién
+al terminar apunta `<salida>/actual.json` a ella, de modo que el tablero nunca lee una versión a medias.
+Las fuentes se refrescan de forma incremental entre corridas (estado en `<salida>/incremental`).
+
+Uso (desde la raíz del repo):
+    python -m lote                                   # URLs de .streamlit/secrets.toml o de URL_TEAMS_1..3
+    python -m lote --ventas inventario_central_v2.csv --inventario transacciones_logistica_v2.csv \
+                   --logistica feedback_clientes_v2.csv --maestro df_consolidado-4.csv
+    0 * * * * cd /srv/dashboard && python -m lote >> .cache/lote.log 2>&1   # cron: cada hora
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import tomllib
+import uuid
+from pathlib import Path
+
+import groq
+import numpy as np
+
+from agregados import AgregadosTablero
+from auditor_ia import MODELO, clave_prompt, diagnosticar, obtener_cliente, prompt_diagnostico
+from carga import cargar_tabla, escribir_columnar, huella_fuente, leer_columnar, pa
+from incremental import RefrescoIncremental, _para_agregados
+from ingesta_streaming import UMBRAL_BYTES_STREAMING, particionar_en_bloques
+from instrumentacion import etapa, trazar
+from teams_sync import descargar_fuentes
+from temporal import AlmacenTemporal
+
+DIRECTORIO_ARTEFACTOS = Path(os.environ.get("ARTEFACTOS_DIR", ".cache/artefactos"))
+RUTA_SECRETOS = Path(".streamlit/secrets.toml")
+FORMATO_ARTEFACTOS = 1    # Se incrementa cuando cambian los archivos o el manifiesto
+CONSERVAR_VERSIONES = 5   # Versiones anteriores que se conservan (para volver atrás a mano)
+PATRON_VERSION = re.compile(r"\d{8}-\d{6}-[0-9a-f]{6}")
+# Fuente (nombre que usa el tablero) -> (secreto con su URL, tabla que alimenta en el pipeline)
+FUENTES = {'ventas': ('URL_TEAMS_1', 'inventario'), 'inventario': ('URL_TEAMS_2', 'transacciones'),
+           'logistica': ('URL_TEAMS_3', 'feedback')}
+
+
+def _a_json(valor):
+    return valor.item() if isinstance(valor, np.generic) else str(valor)
+
+
+def leer_secretos(ruta=RUTA_SECRETOS):
+    """Los mismos secretos que lee Streamlit (URLs de Teams, GROQ_API_KEY); {} si no hay archivo"""
+    try:
+        return tomllib.loads(Path(ruta).read_text())
+    except (OSError, tomllib.TOMLDecodeError):
+        return {}
+
+
+# --- 1. FUENTES ---
+def _obtener_fuentes(fuentes):
+    """{nombre: url o ruta local} -> {nombre: {'ruta', 'estado', 'version'}}; las URLs se bajan en paralelo"""
+    urls = {n: f for n, f in fuentes.items() if f.startswith(('http://', 'https://'))}
+    descargas = descargar_fuentes(urls) if urls else {}
+    for nombre, fuente in fuentes.items():
+        if nombre not in urls:
+            descargas[nombre] = {'ruta': Path(fuente), 'estado': 'local', 'version': huella_fuente(fuente)}
+    return {nombre: descargas[nombre] for nombre in fuentes}
+
+
+def _almacen_maestro(ruta):
+    """Almacén temporal del archivo maestro, como lo arma el tablero al subirlo (por bloques si es muy grande)"""
+    if Path(ruta).stat().st_size > UMBRAL_BYTES_STREAMING:
+        return particionar_en_bloques(ruta)
+    return AlmacenTemporal.desde_df(cargar_tabla(ruta))
+
+
+def _diagnostico(agregados, groq_key, groq_base_url=None):
+    """Diagnóstico con todas las categorías (la selección por defecto del tablero)"""
+    categorias = agregados.cubo.valores('Categoria')
+    prompt = prompt_diagnostico(agregados.resumen_ia(categorias), agregados.cubo.consultar(Categoria=categorias)['ingresos'])
+    texto = ''
+    for texto in diagnosticar(obtener_cliente(groq_key, groq_base_url), prompt):
+        pass
+    return {'clave': clave_prompt(prompt), 'modelo': MODELO, 'texto': texto}
+
+
+# --- 2. PUBLICACIÓN DE VERSIONES ---
+def version_actual(directorio=DIRECTORIO_ARTEFACTOS):
+    """Versión publicada más reciente, o None si el lote nunca corrió"""
+    try:
+        return json.loads((Path(directorio) / "actual.json").read_text())['version']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _versiones(directorio):
+    return sorted(d.name for d in Path(directorio).iterdir() if d.is_dir() and PATRON_VERSION.fullmatch(d.name))
+
+
+def publicar(directorio, version, escribir):
+    """`escribir(carpeta)` llena una carpeta temporal, que se renombra a `<directorio>/<version>`;
+    después se apunta actual.json a ella y se borran las versiones que exceden CONSERVAR_VERSIONES"""
+    directorio = Path(directorio)
+    tmp = directorio / f".{version}.tmp"
+    tmp.mkdir(parents=True)
+    try:
+        escribir(tmp)
+        os.replace(tmp, directorio / version)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    puntero = directorio / f"actual.{os.getpid()}.tmp"
+    puntero.write_text(json.dumps({'version': version}))
+    os.replace(puntero, directorio / "actual.json")
+    for vieja in _versiones(directorio)[:-CONSERVAR_VERSIONES - 1]:
+        shutil.rmtree(directorio / vieja, ignore_errors=True)
+
+
+def generar(fuentes, directorio=DIRECTORIO_ARTEFACTOS, maestro=None, groq_key=None, groq_base_url=None):
+    """Corre el ETL completo del tablero y publica una versión nueva; devuelve su manifiesto.
+
+    `fuentes` es {'ventas', 'inventario', 'logistica'} -> URL de Teams o ruta local. Los KPIs se
+    agregan desde `maestro` si se indica (el archivo que se sube en el tablero) o, si no, desde la
+    tabla consolidada. Sin `groq_key` no se precalcula el diagnóstico.
+    """
+    if pa is None:
+        raise RuntimeError("El modo por lotes necesita pyarrow para escribir los artefactos")
+    directorio = Path(directorio)
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    with trazar('lote') as traza:
+        with etapa('descargas_teams'):
+            descargas = _obtener_fuentes(fuentes)
+        tablas = {}
+        for nombre, d in descargas.items():
+            with etapa(f'carga_{nombre}') as info:
+                tablas[nombre] = cargar_tabla(str(d['ruta']))
+                info['filas_salida'] = len(tablas[nombre])
+        with etapa('refresco_incremental', len(tablas['inventario'])):
+            refresco = RefrescoIncremental(directorio / "incremental", con_agregados=not maestro)
+            resultado = refresco.obtener(tablas['ventas'], tablas['inventario'], tablas['logistica'])
+        with etapa('agregados_tablero') as info:
+            if maestro:
+                temporal = _almacen_maestro(maestro)
+                agregados = temporal.agregados()
+            else:
+                agregados = resultado['agregados']
+                temporal = AlmacenTemporal(agregados.anchos).agregar(_para_agregados(resultado['df_full']))
+            info['filas_salida'] = agregados.filas
+        diagnostico = None
+        if groq_key:
+            with etapa('diagnostico_ia'):
+                try:
+                    diagnostico = _diagnostico(agregados, groq_key, groq_base_url)
+                except (TimeoutError, groq.GroqError) as e:
+                    diagnostico = {'error': str(e)}  # Los KPIs se publican igual; el tablero puede llamar a la IA
+
+    archivos = {'consolidado': resultado['df_full'],
+                'skus_fantasma': refresco.integridad['skus'].reporte(),
+                'transacciones_sin_feedback': refresco.integridad['feedback'].reporte(),
+                **{f'agregados_{nombre}': tabla for nombre, tabla in agregados.a_tablas().items()},
+                # Particiones por mes y totales diarios (sin las filas): filtro por fechas y ventanas móviles
+                **{f'temporal_{nombre}': tabla for nombre, tabla in temporal.a_tablas(filas=False).items()}}
+    manifiesto = {
+        'formato': FORMATO_ARTEFACTOS,
+        'version': version,
+        'creado': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'fuentes': {n: {'estado': d['estado'], 'version': d['version']} for n, d in descargas.items()},
+        'refresco': resultado['refresco'],
+        'agregados': {'origen': str(maestro) if maestro else 'consolidado', 'anchos': list(agregados.anchos),
+                      'filas': agregados.filas},
+        'temporal': {'rango': [None if d is None else d.isoformat() for d in temporal.rango()],
+                     'particiones': len(temporal.particiones),
+                     'tablas': sorted(nombre for nombre in archivos if nombre.startswith('temporal_'))},
+        'tablas': {nombre: len(df) for nombre, df in archivos.items()},
+        'metricas': resultado['metricas'],
+        'integridad': {relacion: r.resumen() for relacion, r in refresco.integridad.items()},
+        'diagnostico': diagnostico,
+        'segundos': {e['nombre']: e['segundos'] for e in traza.etapas if e['nivel'] == 0},
+    }
+
+    def escribir(carpeta):
+        for nombre, df in archivos.items():
+            escribir_columnar(df, carpeta / f"{nombre}.arrow")
+        (carpeta / "manifiesto.json").write_text(json.dumps(manifiesto, ensure_ascii=False, default=_a_json, indent=2))
+        traza.exportar(carpeta)
+
+    publicar(directorio, version, escribir)
+    return manifiesto
+
+
+# --- 3. LECTURA DESDE EL TABLERO ---
+def leer_tabla(nombre, version=None, directorio=DIRECTORIO_ARTEFACTOS):
+    """Una tabla de la versión (mapeada en memoria), p. ej. 'consolidado' o 'skus_fantasma'"""
+    version = version or version_actual(directorio)
+    return leer_columnar(Path(directorio) / version / f"{nombre}.arrow")
+
+
+def leer_artefactos(version=None, directorio=DIRECTORIO_ARTEFACTOS):
+    """Manifiesto, agregados del tablero, almacén temporal y reporte de fantasmas de una versión publicada
+    (la última por defecto). No lee la tabla consolidada: para eso está `leer_tabla('consolidado')`"""
+    version = version or version_actual(directorio)
+    if version is None:
+        raise FileNotFoundError(f"No hay artefactos publicados en {directorio}")
+    carpeta = Path(directorio) / version
+    manifiesto = json.loads((carpeta / "manifiesto.json").read_text())
+    if manifiesto.get('formato') != FORMATO_ARTEFACTOS:
+        raise ValueError(f"Artefactos {version} en formato {manifiesto.get('formato')}; se esperaba {FORMATO_ARTEFACTOS}")
+    tablas = {nombre: leer_columnar(carpeta / f"agregados_{nombre}.arrow")
+              for nombre in ('cubo_medidas', 'cubo_nps', 'sumas', 'nps', 'dispersion')}
+    temporal = None
+    if 'temporal' in manifiesto:  # Versiones publicadas antes del almacén temporal no lo traen
+        temporal = AlmacenTemporal.desde_tablas(
+            {nombre.removeprefix('temporal_'): leer_columnar(carpeta / f"{nombre}.arrow")
+             for nombre in manifiesto['temporal']['tablas']}, manifiesto['agregados']['anchos'])
+    return {
+        'version': version,
+        'manifiesto': manifiesto,
+        'metricas': manifiesto['metricas'],
+        'diagnostico': manifiesto['diagnostico'],
+        'agregados': AgregadosTablero.desde_tablas(tablas, manifiesto['agregados']['anchos'],
+                                                   manifiesto['agregados']['filas']),
+        'temporal': temporal,
+        'fantasmas': {nombre: leer_columnar(carpeta / f"{nombre}.arrow")
+                      for nombre in ('skus_fantasma', 'transacciones_sin_feedback')},
+    }
+
+
+# --- 4. LÍNEA DE COMANDOS ---
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--salida', default=DIRECTORIO_ARTEFACTOS, type=Path, help='Directorio de artefactos')
+    for nombre, (secreto, tabla) in FUENTES.items():
+        parser.add_argument(f'--{nombre}', help=f'URL o ruta local de la tabla de {tabla} (por defecto {secreto})')
+    parser.add_argument('--maestro', help='CSV del que agregar los KPIs (por defecto, la tabla consolidada)')
+    parser.add_argument('--sin-diagnostico', action='store_true', help='No llamar a la IA aunque haya GROQ_API_KEY')
+    args = parser.parse_args()
+
+    secretos = leer_secretos()
+    fuentes = {nombre: getattr(args, nombre) or os.environ.get(secreto) or secretos.get(secreto)
+               for nombre, (secreto, _) in FUENTES.items()}
+    faltantes = [nombre for nombre, fuente in fuentes.items() if not fuente]
+    if faltantes:
+        parser.error(f"Faltan fuentes: {', '.join(faltantes)} (argumento, variable de entorno o {RUTA_SECRETOS})")
+    groq_key = None if args.sin_diagnostico else os.environ.get('GROQ_API_KEY') or secretos.get('GROQ_API_KEY')
+    groq_base_url = os.environ.get('GROQ_BASE_URL') or secretos.get('GROQ_BASE_URL')
+
+    manifiesto = generar(fuentes, args.salida, args.maestro, groq_key, groq_base_url)
+    print(f"Artefactos {manifiesto['version']} publicados en {args.salida} "
+          f"({sum(manifiesto['segundos'].values()):.2f} s, refresco {manifiesto['refresco']['modo']})")
+    for nombre, segundos in manifiesto['segundos'].items():
+        print(f"  {nombre:<24} {segundos:>9.3f} s")
+    if (manifiesto['diagnostico'] or {}).get('error'):
+        print(f"Diagnóstico no disponible: {manifiesto['diagnostico']['error']}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,17 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import numpy as np
-from groq import Groq
-import re
+import graficos
+from auditor_ia import cache_respuestas, clave_prompt, diagnosticar, obtener_cliente, prompt_diagnostico
+from carga import cargar_tabla
+from ingesta_streaming import UMBRAL_BYTES_STREAMING, particionar_en_bloques
+from incremental import refresco_incremental
+from instrumentacion import Traza, activar, anotar, etapa
+from lote import leer_artefactos, version_actual
+from pipeline import cache_pipeline
+from registro import registro_datasets
+from teams_sync import descargar_fuentes
+from temporal import VENTANAS_DIAS, AlmacenTemporal
 
 # --- 1. CONFIGURACIÓN DE PÁGINA ---
 st.set_page_config(page_title="Auditoría Pro: Operaciones & IA", layout="wide", page_icon="🌙")
@@ -27,20 +35,47 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # --- 3. LÓGICA DE DATOS MEJORADA ---
-@st.cache_data
+@st.cache_resource(max_entries=16)
 def load_and_process(file_source):
-    """Carga y procesa archivos ya sea desde upload local o URL de Teams"""
-    df = pd.read_csv(file_source)
-    cols_num = ['Precio_Venta_Final', 'Costo_Unitario_USD', 'Cantidad_Vendida', 'Costo_Envio', 'Satisfaccion_NPS', 'Stock_Actual']
-    for col in cols_num:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    
-    if all(c in df.columns for c in ['Precio_Venta_Final', 'Cantidad_Vendida', 'Costo_Unitario_USD', 'Costo_Envio']):
-        df['Utilidad_Total'] = (df['Precio_Venta_Final'] * df['Cantidad_Vendida']) - \
-                               (df['Costo_Unitario_USD'] * df['Cantidad_Vendida']) - \
-                               df['Costo_Envio']
-    return df
+    """Carga y procesa archivos ya sea desde upload local o URL de Teams.
+    Se usa cache_resource para no copiar el DataFrame en cada rerun: tratarlo como de solo lectura"""
+    return cargar_tabla(file_source)
+
+@st.cache_resource(max_entries=16)
+def load_dashboard_aggregates(file_source, streaming=False):
+    """Almacén temporal del tablero (agregados por mes y totales diarios): los filtros del sidebar,
+    categorías y fechas, se responden sin recorrer todas las filas.
+    En modo streaming el CSV se lee por bloques y nunca se materializa completo"""
+    if streaming:
+        return particionar_en_bloques(file_source)
+    return AlmacenTemporal.desde_df(load_and_process(file_source))
+
+def variacion(actual, previo):
+    """Delta porcentual para st.metric, o None si no hay base de comparación"""
+    return f"{(actual / previo - 1) * 100:+.1f}%" if previo else None
+
+@st.cache_resource(max_entries=2)
+def load_artifacts(version):
+    """Agregados, métricas y reporte de fantasmas que publicó el lote (`python -m lote`).
+    La versión publicada es la clave de cache: una corrida nueva del lote se toma en el siguiente rerun"""
+    return leer_artefactos(version)
+
+def fetch_teams_data():
+    """Descarga condicional y carga de las 3 tablas de Teams. Corre en una sola sesión por vencimiento:
+    el resultado vive en `registro_datasets` y todas las sesiones lo leen por referencia"""
+    with etapa('descargas_teams'):
+        descargas = descargar_fuentes({
+            "ventas": st.secrets["URL_TEAMS_1"],
+            "inventario": st.secrets["URL_TEAMS_2"],
+            "logistica": st.secrets["URL_TEAMS_3"],
+        })
+    teams_data = {}
+    for nombre, d in descargas.items():
+        with etapa(f'carga_{nombre}') as info:
+            teams_data[nombre] = cargar_tabla(str(d["ruta"]))
+            info['filas_salida'] = len(teams_data[nombre])
+    return {'tablas': teams_data, 'estados': {nombre: d['estado'] for nombre, d in descargas.items()},
+            'versiones': tuple(d['version'] for d in descargas.values())}
 
 # --- 4. SIDEBAR ---
 with st.sidebar:
@@ -53,49 +88,136 @@ with st.sidebar:
     # El disparador principal sigue siendo el archivo manual
     uploaded_file = st.file_uploader("📂 Cargar Datos Maestro (Local)", type=["csv"])
 
+    # Modo artefactos: el rerun solo lee lo que precalculó el lote, sin descargas ni ETL.
+    # Con un archivo subido arranca apagado: el archivo manual manda
+    version_lote = version_actual()
+    usar_artefactos = st.toggle("📦 Usar artefactos del lote", value=version_lote is not None and not uploaded_file,
+                                disabled=version_lote is None,
+                                help="Generados con `python -m lote`" if version_lote else "Todavía no se corrió `python -m lote`")
+    if usar_artefactos and uploaded_file:
+        st.warning("Con los artefactos del lote activos se ignora el archivo subido: apaga el modo para usarlo")
+
+    # Las tablas de Teams se comparten entre sesiones y vencen solas; esto fuerza una descarga nueva
+    if st.button("🔄 Refrescar datos de Teams", help="Vuelve a revalidar los archivos en Teams para todas las sesiones"):
+        registro_datasets.invalidar('teams')
+
+    # Medición opcional: tiempo, filas y memoria de cada etapa de este rerun
+    instrumentar = st.toggle("⏱️ Medir etapas del rerun", value=False)
+    traza = activar(Traza("rerun") if instrumentar else None)
+
+artefactos = None
+if usar_artefactos:
+    try:
+        with etapa('carga_artefactos', version=version_lote):
+            artefactos = load_artifacts(version_lote)
+    except (OSError, ValueError, KeyError) as e:
+        st.sidebar.warning(f"No se pudieron leer los artefactos {version_lote}: {e}")
+    # Diagnóstico precalculado: sale de la cache de respuestas si la selección coincide con la del lote.
+    # Se siembra una vez por versión y sesión; sembrarlo en cada rerun reiniciaría su TTL para siempre
+    if (artefactos is not None and (artefactos['diagnostico'] or {}).get('texto')
+            and st.session_state.get('diagnostico_sembrado') != version_lote):
+        cache_respuestas.guardar(artefactos['diagnostico']['clave'], artefactos['diagnostico']['texto'])
+        st.session_state['diagnostico_sembrado'] = version_lote
+
 # --- 5. LÓGICA DE CARGA HÍBRIDA (EL CORAZÓN DEL CAMBIO) ---
-if uploaded_file:
-    # 5.1 Carga del archivo local
-    df_raw = load_and_process(uploaded_file)
+if uploaded_file or artefactos is not None:
+    # 5.1 Carga del archivo local (los archivos muy grandes solo se agregan por bloques)
+    streaming = artefactos is None and getattr(uploaded_file, "size", 0) > UMBRAL_BYTES_STREAMING
+    df_raw = None
+    if artefactos is None:
+        with etapa('carga_local', streaming=streaming) as info:
+            df_raw = None if streaming else load_and_process(uploaded_file)
+            info['filas_salida'] = None if df_raw is None else len(df_raw)
+    # Sin filas en memoria (archivo grande o artefactos), los gráficos salen de los agregados
+    solo_agregados = df_raw is None
     
-    # 5.2 Carga AUTOMÁTICA de los 3 archivos de Teams (Solo si se cargó el local)
-    # Se guardan en st.session_state para que estén disponibles globalmente
-    try:
-        if 'teams_data' not in st.session_state:
-            with st.status("Conectando con servidores de Teams...", expanded=False) as status:
-                st.write("Descargando archivo de Ventas...")
-                df_t1 = load_and_process(st.secrets["URL_TEAMS_1"])
-                st.write("Descargando archivo de Inventarios...")
-                df_t2 = load_and_process(st.secrets["URL_TEAMS_2"])
-                st.write("Descargando archivo de Logística...")
-                df_t3 = load_and_process(st.secrets["URL_TEAMS_3"])
-                st.session_state.teams_data = {"ventas": df_t1, "inventario": df_t2, "logistica": df_t3}
-                status.update(label="✅ Datos de Teams sincronizados", state="complete")
-        
-        # Atajos para usar los dataframes de Teams
-        df_teams_1 = st.session_state.teams_data["ventas"]
-        df_teams_2 = st.session_state.teams_data["inventario"]
-        df_teams_3 = st.session_state.teams_data["logistica"]
-        df_inv = st.session_state.teams_data["ventas"]
-        df_invO = st.session_state.teams_data["ventas"]
-        df_trans=st.session_state.teams_data["inventario"]
-        df_feed=st.session_state.teams_data["logistica"]
+    # 5.2 Carga AUTOMÁTICA de los 3 archivos de Teams (Solo si se cargó el local; con artefactos ya las procesó el lote)
+    # Un solo juego de tablas por proceso (registro_datasets): la sesión guarda referencias, no copias
+    teams_data = {}
+    versiones_teams = None
+    if artefactos is None:
+        try:
+            if registro_datasets.vigente('teams'):
+                teams = registro_datasets.obtener('teams', fetch_teams_data)
+                teams_data = teams['tablas']
+            else:
+                with st.status("Conectando con servidores de Teams...", expanded=False) as status:
+                    st.write("Descargando archivos de Ventas, Inventarios y Logística en paralelo...")
+                    # Descarga concurrente y condicional; si otra sesión ya está descargando, se espera su resultado
+                    teams = registro_datasets.obtener('teams', fetch_teams_data)
+                    for nombre, estado in teams['estados'].items():
+                        st.write(f"{nombre.capitalize()}: {estado}")
+                    teams_data = teams['tablas']
+                    status.update(label="✅ Datos de Teams sincronizados", state="complete")
+        
+            # Versiones (ETag / hash del cuerpo) de las fuentes: identifican el contenido sin recorrer las tablas
+            versiones_teams = teams['versiones']
+
+            # Atajos para usar los dataframes de Teams
+            df_inv = teams_data["ventas"]
+            df_trans = teams_data["inventario"]
+            df_feed = teams_data["logistica"]
      
 
-    except Exception as e:
-        st.error(f"Error al leer de Teams. Verifica los enlaces en Secrets. Error: {e}")
+        except Exception as e:
+            st.error(f"Error al leer de Teams. Verifica los enlaces en Secrets. Error: {e}")
+
+    # Memoria residente por tabla antes y después del esquema compacto
+    with st.sidebar.expander("🧮 Memoria por tabla", expanded=False):
+        tablas_cargadas = {"local": df_raw, **teams_data}
+        for nombre, tabla in tablas_cargadas.items():
+            if tabla is None:
+                continue
+            mem = tabla.attrs.get('memoria')
+            if mem:
+                st.caption(f"**{nombre}** ({mem['tabla']}): {mem['antes']/1e6:,.2f} MB → {mem['despues']/1e6:,.2f} MB")
+        # Datasets compartidos por todas las sesiones del proceso
+        for d in registro_datasets.resumen():
+            st.caption(f"🗂️ Compartido **{d['clave']}**: {d['mb']:,.2f} MB · hace {d['edad_s'] // 60} min · "
+                       f"{d['lecturas']:,} lecturas · vence en {max(d['vence_en_s'], 0) // 60} min")
+        st.caption(f"Registro: {registro_datasets.bytes_totales / 1e6:,.2f} MB de {registro_datasets.max_bytes / 1e6:,.0f} MB")
 
     # --- 6. DASHBOARD PRINCIPAL ---
     # Filtros sobre df_raw (archivo local)
-    all_cats = sorted(df_raw['Categoria'].unique())
+    with etapa('agregados_tablero') as info:
+        if artefactos is not None:
+            temporal, agregados = artefactos['temporal'], artefactos['agregados']
+        else:
+            temporal = load_dashboard_aggregates(uploaded_file, streaming=streaming)
+            agregados = temporal.agregados()
+        info['filas_salida'] = agregados.filas
+    all_cats = agregados.cubo.valores('Categoria')
     sel_cats = st.sidebar.multiselect("Categorías", all_cats, default=all_cats)
-    limit = st.sidebar.slider("Muestra de datos", 50, len(df_raw), 500)
-    
-    df = df_raw[df_raw['Categoria'].isin(sel_cats)].head(limit)
+    if streaming:
+        st.sidebar.caption(f"📦 Archivo grande: {agregados.filas:,} filas agregadas por bloques")
+    if artefactos is not None:
+        st.sidebar.caption(f"📦 Artefactos {artefactos['version']} ({artefactos['manifiesto']['creado']}): "
+                           f"{agregados.filas:,} filas agregadas por el lote")
+
+    # Filtro por fechas: los meses completos salen de sus particiones y solo se recorren las filas de los bordes
+    rango_fechas = None
+    primero, ultimo = temporal.rango() if temporal is not None else (None, None)
+    if primero is not None:
+        seleccion = st.sidebar.date_input("Rango de fechas", (primero, ultimo), min_value=primero,
+                                          max_value=ultimo, format="DD/MM/YYYY")
+        # Mientras se elige el segundo extremo llega un solo día: se mantiene el rango completo
+        if isinstance(seleccion, (tuple, list)) and len(seleccion) == 2 and tuple(seleccion) != (primero, ultimo):
+            rango_fechas = temporal.rango_efectivo(*seleccion)
+            with etapa('filtro_fechas') as info:
+                agregados = temporal.agregados(*rango_fechas)
+                info['filas_salida'] = agregados.filas
+            ajuste = "" if rango_fechas == tuple(seleccion) else " (extendido a meses completos: no hay filas en memoria)"
+            st.sidebar.caption(f"📅 {rango_fechas[0]:%d/%m/%Y} – {rango_fechas[1]:%d/%m/%Y}{ajuste}: "
+                               f"{agregados.filas:,} ventas. Las filas sin Fecha_Venta quedan fuera")
+
+    # Sin muestreo: los gráficos agregan en el servidor cuando N es grande
+    base = df_raw if solo_agregados or rango_fechas is None else temporal.filas(*rango_fechas)
+    df = None if solo_agregados else base[base['Categoria'].isin(sel_cats)]
     
-    # Métricas y Tabs (Se mantiene tu lógica original)
-    rev_total = df['Precio_Venta_Final'].sum()
-    profit_total = df['Utilidad_Total'].sum()
+    # Métricas del encabezado desde el cubo: todas las filas filtradas, sin recorrer df_raw
+    kpis = agregados.cubo.consultar(Categoria=sel_cats)
+    rev_total = kpis['ingresos']
+    profit_total = kpis['utilidad']
 
     st.title("📊 Intelligence Business Dashboard")
     
@@ -103,8 +225,8 @@ if uploaded_file:
     m1.metric("Ingresos Totales", f"${rev_total:,.0f}")
     m2.metric("Utilidad Neta", f"${profit_total:,.0f}", 
               delta=f"{(profit_total/rev_total*100):.1f}%" if rev_total > 0 else "0%")
-    m3.metric("NPS (Mediana)", f"{df[df['Satisfaccion_NPS']>0]['Satisfaccion_NPS'].median():.1f}")
-    m4.metric("Unidades", f"{df['Cantidad_Vendida'].sum():,.0f}")
+    m3.metric("NPS (Mediana)", f"{kpis['nps_mediana']:.1f}")
+    m4.metric("Unidades", f"{kpis['unidades']:,.0f}")
 
     tab1, tab2, tab3, tab4 = st.tabs(["📊 Cuantitativo", "👤 Cualitativo", "🕵️ Auditoría IA"," 📋 Disclaimers"])
 
@@ -112,31 +234,55 @@ if uploaded_file:
     with tab1:
         st.subheader("Rendimiento Financiero")
         c1, c2 = st.columns(2)
-        with c1:
-            fig_bar = px.bar(df.groupby('Categoria')['Utilidad_Total'].sum().reset_index(), 
+        with c1, etapa('grafico_rentabilidad'):
+            fig_bar = px.bar(kpis['utilidad_por_categoria'].rename('Utilidad_Total').reset_index(), 
                              x='Categoria', y='Utilidad_Total', color='Utilidad_Total',
                              color_continuous_scale=[COLOR_ROJO, "#FFD700", COLOR_VERDE],
                              template="plotly_dark", title="Rentabilidad por Segmento")
             st.plotly_chart(fig_bar, use_container_width=True)
-        with c2:
-            fig_stock = px.scatter(df, x='Stock_Actual', y='Utilidad_Total', color='Categoria',
-                                   color_discrete_sequence=px.colors.sequential.Blues_r,
-                                   template="plotly_dark", title="Relación Stock vs Ganancia")
+        with c2, etapa('grafico_stock', None if solo_agregados else len(df)):
+            if solo_agregados:
+                fig_stock = graficos.densidad(*agregados.grilla_dispersion(sel_cats), 'Stock_Actual', 'Utilidad_Total',
+                                              template="plotly_dark", title="Relación Stock vs Ganancia")
+            else:
+                fig_stock = graficos.dispersion(df, x='Stock_Actual', y='Utilidad_Total', color='Categoria',
+                                                color_discrete_sequence=px.colors.sequential.Blues_r,
+                                                template="plotly_dark", title="Relación Stock vs Ganancia")
             st.plotly_chart(fig_stock, use_container_width=True)
 
+        # Ventanas móviles hasta el final del rango elegido, contra la ventana anterior del mismo largo
+        ventanas = {}
+        if temporal is not None:
+            with etapa('ventanas_moviles'):
+                ventanas = temporal.ventanas(None if rango_fechas is None else rango_fechas[1], sel_cats)
+        if ventanas:
+            st.subheader("Tendencia Reciente")
+            for n, col in zip(VENTANAS_DIAS, st.columns(len(VENTANAS_DIAS))):
+                v, previo = ventanas[n], ventanas[n]['previo']
+                col.metric(f"Ingresos {n} días", f"${v['ingresos']:,.0f}", delta=variacion(v['ingresos'], previo['ingresos']))
+                col.metric(f"Utilidad {n} días", f"${v['utilidad']:,.0f}", delta=variacion(v['utilidad'], previo['utilidad']))
+                col.metric(f"NPS medio {n} días", "—" if pd.isna(v['nps']) else f"{v['nps']:.1f}",
+                           delta=None if pd.isna(v['nps']) or pd.isna(previo['nps']) else f"{v['nps'] - previo['nps']:+.1f}")
+                col.caption(f"{v['filas']:,} ventas · vs. los {n} días anteriores ({previo['filas']:,})")
+
     # --- TAB 2: CUALITATIVO ---
     with tab2:
         st.subheader("Análisis de Servicio")
         c3, c4 = st.columns(2)
-        with c3:
-            fig_pie = px.pie(df, names='Estado_Envio', hole=0.4, 
-                             color_discrete_sequence=[COLOR_AZUL, COLOR_GRIS, "#1e293b"],
-                             template="plotly_dark", title="Estado de Envíos")
+        with c3, etapa('grafico_estados'):
+            fig_pie = graficos.torta_desde_conteos(agregados.conteo_estados(sel_cats), 'Estado_Envio', hole=0.4, 
+                                                   color_discrete_sequence=[COLOR_AZUL, COLOR_GRIS, "#1e293b"],
+                                                   template="plotly_dark", title="Estado de Envíos")
             st.plotly_chart(fig_pie, use_container_width=True)
-        with c4:
-            fig_nps = px.box(df, x='Ciudad_Destino', y='Satisfaccion_NPS', 
-                             color_discrete_sequence=[COLOR_AZUL],
-                             template="plotly_dark", title="Distribución NPS por Ciudad")
+        with c4, etapa('grafico_nps', None if solo_agregados else len(df)):
+            if solo_agregados:
+                fig_nps = graficos.caja_desde_estadisticas(agregados.estadisticas_caja(sel_cats), 'Ciudad_Destino', 'Satisfaccion_NPS',
+                                                           color_discrete_sequence=[COLOR_AZUL],
+                                                           template="plotly_dark", title="Distribución NPS por Ciudad")
+            else:
+                fig_nps = graficos.caja(df, x='Ciudad_Destino', y='Satisfaccion_NPS', 
+                                        color_discrete_sequence=[COLOR_AZUL],
+                                        template="plotly_dark", title="Distribución NPS por Ciudad")
             st.plotly_chart(fig_nps, use_container_width=True)
 
     # --- TAB 3: AUDITORÍA CON IA ---
@@ -155,37 +301,23 @@ if uploaded_file:
         """, unsafe_allow_html=True)
 
         if st.button("🧠 Ejecutar Diagnóstico Maestro"):
-            if groq_key:
+            # Datos consolidados para que la IA no alucine
+            # Desde los agregados: mismo resultado en modo completo, por bloques y con artefactos del lote
+            prompt = prompt_diagnostico(agregados.resumen_ia(sel_cats), rev_total)
+            # Un diagnóstico precalculado por el lote para esta selección no necesita la API
+            if groq_key or cache_respuestas.obtener(clave_prompt(prompt)) is not None:
                 with st.spinner("Analizando micro-datos y tendencias..."):
                     try:
-                        client = Groq(api_key=groq_key)
+                        # Cliente reutilizado por proceso; GROQ_BASE_URL permite apuntar a un servidor de pruebas
+                        client = obtener_cliente(groq_key, st.secrets.get("GROQ_BASE_URL")) if groq_key else None
                         
-                        # Datos consolidados para que la IA no alucine
-                        fuga = df[df['Utilidad_Total'] < 0].groupby('Canal_Venta')['Utilidad_Total'].sum().to_dict()
-                        logistica = df.groupby('Ciudad_Destino')[['Tiempo_Entrega_Real', 'Satisfaccion_NPS']].mean().to_dict()
-                        fantasmas = df[df['Categoria'].str.contains('Fantasma|No Catalogado', na=False)]['Precio_Venta_Final'].sum()
-                        paradoja = df.groupby('Categoria')[['Stock_Actual', 'Satisfaccion_NPS']].mean().to_dict()
-
-                        prompt = f"""
-                        Eres un Auditor Senior. Basado en estos datos REALES, responde las 5 preguntas de la caja anterior:
-                        - Pérdidas por Canal: {fuga}
-                        - Logística por Ciudad: {logistica}
-                        - Venta SKUs Fantasma: ${fantasmas}
-                        - Stock vs NPS: {paradoja}
-                        - Ingreso Total: ${rev_total}
-
-                        Instrucciones:
-                        - Sé directo, crítico y profesional.
-                        - Usa Markdown con negritas.
-                        - Si el impacto de SKUs fantasma es > 0, calcula su % frente al ingreso total.
-                        """
-                        
-                        chat = client.chat.completions.create(
-                            model="llama-3.3-70b-versatile",
-                            messages=[{"role": "user", "content": prompt}],
-                            temperature=0.2
-                        )
-                        st.markdown(f'<div class="ai-container">{chat.choices[0].message.content}</div>', unsafe_allow_html=True)
+                        # Los tokens se muestran a medida que llegan; un prompt ya respondido sale de la cache
+                        salida = st.empty()
+                        with etapa('diagnostico_ia'):
+                            for texto in diagnosticar(client, prompt):
+                                salida.markdown(f'<div class="ai-container">{texto}</div>', unsafe_allow_html=True)
+                    except TimeoutError as e:
+                        st.error(f"Tiempo de espera agotado: {e}")
                     except Exception as e:
                         st.error(f"Error de conexión: {e}")
             else:
@@ -197,17 +329,26 @@ if uploaded_file:
 
 
 
-        # 1. Definimos las máscaras (condiciones)
-        cond_categoria = (df_inv['Categoria'] == '???')
-        cond_stock = (df_inv['Stock_Actual'].isna()) | (pd.to_numeric(df_inv['Stock_Actual'], errors='coerce') <= 0)
-        cond_lead_time = (df_inv['Lead_Time_Dias'].isna())
-        
-        # 2. Combinamos las 3 condiciones con el operador & (AND)
-        # Esto identifica las filas que cumplen TODO al tiempo
-        filas_a_eliminar = cond_categoria & cond_stock & cond_lead_time
-        
+        if artefactos is not None:
+            # Métricas de limpieza del último lote: el rerun no toca las tablas de Teams
+            metricas = artefactos['metricas']
+            refresco = artefactos['manifiesto']['refresco']
+        else:
+            # Limpieza y consolidación incrementales: solo se procesan las filas nuevas desde el último refresco.
+            # Delante va la LRU por versión de las fuentes: los reruns por widgets no vuelven a hashear las tablas
+            with etapa('refresco_incremental', len(df_trans)):
+                resultado = cache_pipeline.obtener(df_inv, df_trans, df_feed, clave=versiones_teams,
+                                                   calcular=refresco_incremental.obtener)
+                anotar(**resultado['refresco'])
+            metricas = resultado['metricas']
+            refresco = resultado['refresco']
 
         st.caption("Proceso automático de filtrado y depuración de datos provenientes de Teams")
+        if artefactos is not None:
+            st.caption(f"Precalculado por el lote {artefactos['version']} ({artefactos['manifiesto']['creado']})")
+        st.caption(f"Refresco {refresco['modo']}: {refresco['transacciones_nuevas']:,} transacciones y "
+                   f"{refresco['feedback_nuevo']:,} feedbacks nuevos ({refresco['feedback_tardio']:,} tardíos) · "
+                   f"venta más reciente {refresco['fecha_max'] or '—'} · {refresco['segundos']:.2f} s")
 
         # Usamos un contenedor con borde para agrupar la limpieza
         with st.container():
@@ -215,20 +356,7 @@ if uploaded_file:
             
             # Creamos columnas para mostrar el progreso de forma visual
             col_a, col_b, col_c = st.columns(3)
-            df_inv1=df_inv[~filas_a_eliminar].copy()
-            filas_a_eliminar2 = cond_categoria & cond_lead_time
-            # 3. Mantenemos solo lo que NO cumple la combinación (usando el signo ~)
-            df_inv2=df_inv1[~filas_a_eliminar2].copy()
-            filas_a_eliminar3 = cond_categoria & cond_stock
-            # 3. Mantenemos solo lo que NO cumple la combinación (usando el signo ~)
-            df_inv3=df_inv2[~filas_a_eliminar3].copy()
-            
-            # Cálculo de porcentajes para reusar
-            p1 = (df_inv1.shape[0]/df_invO.shape[0])*100
-            p2 = (df_inv2.shape[0]/df_invO.shape[0])*100
-            p3 = (df_inv3.shape[0]/df_invO.shape[0])*100
-            p_final = (df_inv3.shape[0]/df_invO.shape[0])*100
-            df_inv=df_inv3
+            p1, p2, p3, p_final = metricas['p1'], metricas['p2'], metricas['p3'], metricas['p_final']
         
             with col_a:
                 st.metric("Filtro Multicondición", f"{p1:.1f}%", help="Categoría=??? + Stock Negativo/NaN + Sin Lead Time")
@@ -241,6 +369,14 @@ if uploaded_file:
             st.write("**Integridad Final de la tabla:**")
             st.progress(p_final / 100)
             st.markdown(f"> **Conclusión:** Se ha preservado el **{p_final:.2f}%** de la data original de inventarios tras aplicar las reglas de negocio.")
+
+            # Filas que tocó cada regla declarativa (pipeline.REGLAS), de una sola pasada por tabla
+            with st.expander("Filas afectadas por regla", expanded=False):
+                st.dataframe(pd.DataFrame([
+                    {'Tabla': tabla.capitalize(), 'Regla': regla, 'Filas': filas}
+                    for tabla in ('inventario', 'transacciones', 'feedback')
+                    for regla, filas in metricas[f'reglas_{tabla}'].items()
+                ]), hide_index=True, use_container_width=True)
         
         st.divider()
         
@@ -275,216 +411,44 @@ if uploaded_file:
                 </div>
                 """, unsafe_allow_html=True)
 
-    
-        def audit_report(df, name):
-            print(f"--- Reporte: {name} ---")
-            print(f"Nulos por columna:\n{df.isnull().sum() / len(df) * 100}%")
-            print(f"Duplicados: {df.duplicated().sum()}")
-            print("-" * 30)
-    
-        audit_report(df_inv, "Inventario")
-        audit_report(df_trans, "Transacciones")
-        audit_report(df_feed, "Feedback")
-        
-        import re
-    
-        def simplificar_lead_time(valor):
-            val_str = str(valor).lower().strip()
-            if val_str == 'inmediato': return 0.0
-            numeros = re.findall(r'\d+', val_str)
-            return float(max(numeros, key=int)) if numeros else np.nan
-    
-            # 1. Limpiamos los textos a números (dejando los NaN como tales)
-        df_inv['Lead_Time_Dias'] = df_inv['Lead_Time_Dias'].apply(simplificar_lead_time)
-        
-        # 2. Llenamos los NaN resultantes con la mediana de la columna
-        mediana_lead = df_inv['Lead_Time_Dias'].median()
-        df_inv['Lead_Time_Dias'] = df_inv['Lead_Time_Dias'].fillna(mediana_lead)
-    
-        # Llenar vacíos con una etiqueta de control
-        df_trans=pd.DataFrame(df_trans)
-        df_trans['Estado_Envio'] = df_trans['Estado_Envio'].fillna('No especificado')
-    
-            # 1. Diccionario de mapeo para estandarizar
-        mapeo_ciudades = {
-            'MED': 'Medellín',
-            'BOG': 'Bogotá',
-        }
-        
-        # 3. Aplicamos el reemplazo (solo para las que coinciden con el diccionario)
-        df_trans['Ciudad_Destino'] = df_trans['Ciudad_Destino'].replace(mapeo_ciudades)
-    
-    
-        # 1. Definimos los valores que consideramos "ruido"
-        ruido = ['---', 'N/A',"nan"]
-        
-        # 2. Limpiamos: pasamos a minúsculas, quitamos espacios y reemplazamos
-        df_feed['Comentario_Texto'] = df_feed['Comentario_Texto'].astype(str).str.lower().str.strip()
-        
-        # 3. Reemplazamos el ruido y los nulos por "Sin comentario"
-        df_feed['Comentario_Texto'] = df_feed['Comentario_Texto'].replace(ruido, 'sin comentario')
-        df_feed['Comentario_Texto'] = df_feed['Comentario_Texto'].fillna('sin comentario')
-        
-        # 4. Verificamos los primeros resultados
-        print("Muestra de comentarios limpios:")
-        print(df_feed['Comentario_Texto'].unique()[:10])
-    
-        # 2. Reemplazamos tanto los nulos reales como las variantes de texto
-        # Usamos fillna para los vacíos y replace para los que sí tienen texto "nan" o "N/A"
-        df_feed['Recomienda_Marca'] = df_feed['Recomienda_Marca'].replace(['nan', 'n/a', 'None', 'N/A'], np.nan)
-        df_feed['Recomienda_Marca'] = df_feed['Recomienda_Marca'].fillna('SIN RESPUESTA')
-        
-        # 3. Por si acaso quedaron como string 'nan' después del astype(str)
-        df_feed.loc[df_feed['Recomienda_Marca'] == 'nan', 'Recomienda_Marca'] = 'SIN RESPUESTA'
-        
-        print(df_feed['Recomienda_Marca'].value_counts())
-    
-        # 1. Calculamos la mediana (ignorando los nulos automáticamente)
-        mediana_envio = df_trans['Costo_Envio'].median()
-        
-        # 2. Rellenamos los vacíos con ese valor
-        df_trans['Costo_Envio'] = df_trans['Costo_Envio'].fillna(mediana_envio)
-        
-        # 3. Verificamos que ya no queden nulos
-        print(f"La mediana aplicada fue: {mediana_envio}")
-        print(f"Nulos restantes en Costo_Envio: {df_trans['Costo_Envio'].isnull().sum()}")
-        print(df_trans['Costo_Envio'])
-    
-        # Esto convierte 'norte', 'NORTE' y 'norte ' en 'Norte'
-        df_inv['Bodega_Origen'] = df_inv['Bodega_Origen'].astype(str).str.strip().str.capitalize()
-        
-        # 2. Verificamos el conteo corregido
-        print("Conteo de registros por Bodega (Corregido):")
-        df_inv["Bodega_Origen"].value_counts()
-    
-            # 1. Convertimos la columna a numérica (forzando errores a NaN)
-        # Esto convierte "25-30 días" o "Inmediato" en NaN temporalmente para calcular la mediana
-        lead_time_numerico = pd.to_numeric(df_inv['Lead_Time_Dias'], errors='coerce')
-        
-        # 2. Calculamos la mediana de los valores que SÍ son números
-        mediana_lead = lead_time_numerico.median()
-        
-        # 3. Llenamos los nulos originales en df_inv con esa mediana
-        # Nota: Esto solo afectará a los que quedaron después de tu limpieza anterior
-        df_inv['Lead_Time_Dias'] = df_inv['Lead_Time_Dias'].fillna(mediana_lead)
-        
-        # 4. (Opcional) Si también quieres reemplazar la palabra texto "nan" que mencionamos antes:
-        df_inv['Lead_Time_Dias'] = df_inv['Lead_Time_Dias'].replace('nan', mediana_lead)
-        
-        print(f"La mediana calculada fue: {mediana_lead}")
-        print(f"Valores nulos restantes: {df_inv['Lead_Time_Dias'].isna().sum()}")
-    
-            # Diccionario de normalización usando Regex
-        mapa_categorias = {
-            r'(?i)smart-?phones?': 'Smartphone',
-            r'(?i)laptops?': 'Laptop',
-            r'(?i)monitores?': 'Monitor',
-            r'(?i)accesorios?': 'Accesorio',
-            r'\?{3}': 'No Definido'
-        }
-        
-        # Aplicar la limpieza
-        for patron, reemplazo in mapa_categorias.items():
-            df_inv['Categoria'] = df_inv['Categoria'].str.replace(patron, reemplazo, regex=True)
-        
-        print(df_inv['Categoria'].unique())
-    
-            # 1. Corregir Cantidad_Vendida: Valores negativos se convierten en 0
-        # (También podrías usar .abs() si asumes que el número es correcto pero el signo no)
-        df_trans['Cantidad_Vendida'] = df_trans['Cantidad_Vendida'].clip(lower=0)
-        
-        # 2. Guardar archivos actualizados en el entorno
-        #df_inv.to_csv('inventario_central_limpio.csv', index=False)
-        #df_trans.to_csv('transacciones_logistica_limpias.csv', index=False)
-        #df_feed.to_csv('feedback_clientes_limpio.csv', index=False)
-    
-            # 1. Reemplazamos los 999 por NaN para que no afecten el cálculo
-        df_trans['Tiempo_Entrega_Real'] = df_trans['Tiempo_Entrega_Real'].replace(999, np.nan)
-        
-        # 2. Calculamos la mediana de los tiempos reales (ej. 3 o 5 días)
-        mediana_entrega = df_trans['Tiempo_Entrega_Real'].median()
-        
-        # 3. Imputamos la mediana en esos huecos
-        df_trans['Tiempo_Entrega_Real'] = df_trans['Tiempo_Entrega_Real'].fillna(mediana_entrega)
-    
-            # 1. Definimos el rango válido (1 a 5)
-        # Usamos el método .between() que es muy eficiente en Pandas
-        rango_valido = df_feed['Rating_Producto'].between(1, 5)
-        
-        # 2. Mantenemos solo las filas que cumplen la condición
-        df_feed = df_feed[rango_valido].copy()
-        
-        # 3. Verificación de seguridad
-        print(f"Rating mínimo: {df_feed['Rating_Producto'].min()}")
-        print(f"Rating máximo: {df_feed['Rating_Producto'].max()}")
-        print(f"Ahora tienes {len(df_feed)} filas con ratings reales.")
-    
-            # 1. Convertimos la columna a numérica (forzando errores a NaN)
-        # Esto convierte "25-30 días" o "Inmediato" en NaN temporalmente para calcular la mediana
-        lead_time_numerico = pd.to_numeric(df_inv['Lead_Time_Dias'], errors='coerce')
-        
-        # 2. Calculamos la mediana de los valores que SÍ son números
-        mediana_lead = lead_time_numerico.median()
-        
-        # 3. Llenamos los nulos originales en df_inv con esa mediana
-        # Nota: Esto solo afectará a los que quedaron después de tu limpieza anterior
-        df_inv['Lead_Time_Dias'] = df_inv['Lead_Time_Dias'].fillna(mediana_lead)
-        
-        # 4. (Opcional) Si también quieres reemplazar la palabra texto "nan" que mencionamos antes:
-        df_inv['Lead_Time_Dias'] = df_inv['Lead_Time_Dias'].replace('nan', mediana_lead)
-    
-            # 1. Calculamos la mediana de los ratings válidos (1 a 5)
-        mediana_rating = df_feed.loc[df_feed['Rating_Producto'].between(1, 5), 'Rating_Producto'].median()
-        
-        # 2. Definimos las condiciones de error
-        # El signo ~ significa "NO", es decir, que NO esté en el rango
-        rating_fuera = ~df_feed['Rating_Producto'].between(1, 5)
-        edad_fuera = ~df_feed['Edad_Cliente'].between(0, 100)
-        
-        # --- REGLA 1: ELIMINAR FILA ---
-        # Si Rating está mal Y la Edad está mal (ej. Rating 99 y Edad 195)
-        filas_para_eliminar = rating_fuera & edad_fuera
-        df_feed = df_feed[~filas_para_eliminar].copy()
-        
-        # --- REGLA 2: CAMBIAR POR MEDIANA ---
-        # Si el rating está mal pero la edad está BIEN (ej. Rating 99 y Edad 25)
-        cond_imputar = (~df_feed['Rating_Producto'].between(1, 5)) & (df_feed['Edad_Cliente'].between(0, 100))
-        df_feed.loc[cond_imputar, 'Rating_Producto'] = mediana_rating
-    
-    
-        
-        df_rich=pd.merge(df_trans,df_inv3,on='SKU_ID',how='left')
-        df_rich['Ganancias2']=(df_rich['Precio_Venta_Final']* df_rich['Cantidad_Vendida']) -(df_rich['Costo_Unitario_USD']* df_rich['Cantidad_Vendida'])-df_rich['Costo_Envio']
-        st.write("1. En la tabla Transaccional tengo"," ",df_rich.shape[0]," ","registros pero descartando los SKU_ID fantasma que no estan en la tabla de Inventarios obtengo",df_rich.dropna().shape[0]," ","registros.")
-        df_full=pd.merge(df_rich,df_feed,on='Transaccion_ID',how='left')
-        st.write("2. Luego conciliando la data de Feedbacks con la Transaccional obtengo"," ",df_full.shape[0]," ","registros pero hallamos unos Transaccion_ID fantasma (que no estan en la tabla de Feedbacks), descartandolos tambien como se hizo \n los SKU_ID Fantasma  obtengo",df_full.dropna().shape[0]," ","registros", "Despues de la limpieza de los NaN resultantes solo conservamos el"," ",round((df_full.dropna().shape[0]/df_full.shape[0])*100,1),"\n % de los datos")
-        #print(df_full)
-        
-        df_sku=(pd.DataFrame(df_full.groupby('SKU_ID')['Ultima_Revision'].count().reset_index()))
-        
-        st.write("3. ","Tenemos"," ",df_sku[df_sku['Ultima_Revision']==0].reset_index().shape[0]," ","SKU Fantasmas")
-        
-        df_tra=(pd.DataFrame(df_full.groupby('Transaccion_ID')['Ultima_Revision'].count().reset_index()))
-        
-        st.write("4. ","Tenemos"," ",df_tra[df_tra['Ultima_Revision']==0].reset_index().shape[0]," ","transacciones Fantasmas")
-    
-        df_full['Ganancias']=(df_full['Precio_Venta_Final']* df_full['Cantidad_Vendida']) -(df_full['Costo_Unitario_USD']* df_full['Cantidad_Vendida'])-df_full['Costo_Envio']
-        df_full[df_full['Ganancias']<0].groupby('SKU_ID')['Ganancias'].sum().sort_values(ascending=False)
-        
-        
-    
-        df_full[df_full['Ganancias']<0].groupby('SKU_ID')['Ganancias'].sum().sort_values(ascending=False)
-        
-        ## ganancias totales VS SKU CON PERDIDA
-        
-        conc=pd.merge(df_full.groupby('Categoria')['Ganancias'].sum().sort_values(ascending=False),df_full[df_full['Ganancias']<0].groupby('Categoria')['Ganancias'].sum().sort_values(ascending=False),on='Categoria',how='left')
-        (conc.rename(columns={'Ganancias_x':'Ganancias_totales','Ganancias_y':'Perdidas SKU con ganancias negativas'}))
-    
-        
-        st.write("La Utilidad Neta DESCARTANDO SKU Fantasma...",f"${(df_rich[df_rich['Bodega_Origen'].notnull()]['Ganancias2'].sum()):,.2f}")
-        st.write("La Utilidad Neta TOMANDO SKU Fantasma y Transaccion_ID fantasma es de...",f"${(df_full['Ganancias'].sum()):,.2f}")
+        st.write("1. En la tabla Transaccional tengo"," ",metricas['filas_rich']," ","registros pero descartando los SKU_ID fantasma que no estan en la tabla de Inventarios obtengo",metricas['filas_rich_limpias']," ","registros.")
+        st.write("2. Luego conciliando la data de Feedbacks con la Transaccional obtengo"," ",metricas['filas_full']," ","registros pero hallamos unos Transaccion_ID fantasma (que no estan en la tabla de Feedbacks), descartandolos tambien como se hizo \n los SKU_ID Fantasma  obtengo",metricas['filas_full_limpias']," ","registros", "Despues de la limpieza de los NaN resultantes solo conservamos el"," ",metricas['pct_conservado'],"\n % de los datos")
+        st.write("3. ","Tenemos"," ",metricas['skus_fantasma']," ","SKU Fantasmas")
+        st.write("4. ","Tenemos"," ",metricas['transacciones_fantasma']," ","transacciones Fantasmas")
+        st.write("5. ","Venta Invisible (ingresos de SKU que no estan en el maestro de Inventarios):"," ",f"${metricas['ingresos_skus_fantasma']:,.2f}")
+        st.write("6. ","Tenemos"," ",metricas['transacciones_sin_feedback']," ","transacciones sin registro en Feedbacks")
+        
+        for tabla, fanout, duplicadas in (("Inventarios", 'fanout_inventario', 'skus_duplicados_inventario'),
+                                          ("Feedbacks", 'fanout_feedback', 'transacciones_duplicadas_feedback')):
+            if metricas[fanout]:
+                st.warning(f"⚠️ La tabla de {tabla} repite {metricas[duplicadas]:,} claves: el cruce agregó "
+                           f"{metricas[fanout]:,} filas duplicadas que inflan las Ganancias.")
+
+        if artefactos is not None:
+            with st.expander("Reporte de registros fantasma (lote)", expanded=False):
+                for nombre, titulo in (('skus_fantasma', "SKUs fuera del maestro de Inventarios"),
+                                       ('transacciones_sin_feedback', "Transacciones sin Feedback")):
+                    reporte = artefactos['fantasmas'][nombre]
+                    st.caption(f"**{titulo}**: {len(reporte):,} claves")
+                    st.dataframe(reporte.head(100), hide_index=True, use_container_width=True)
+                    st.download_button(f"{titulo} (CSV)", reporte.to_csv(index=False), file_name=f"{nombre}.csv",
+                                       mime="text/csv", key=f"descarga_{nombre}")
+
+        st.write("La Utilidad Neta DESCARTANDO SKU Fantasma...",f"${metricas['utilidad_sin_fantasmas']:,.2f}")
+        st.write("La Utilidad Neta TOMANDO SKU Fantasma y Transaccion_ID fantasma es de...",f"${metricas['utilidad_con_fantasmas']:,.2f}")
         st.write("impacto casi del 75%!!... los datos elimiandos son considerables y esto debe ser tomado en cuenta en el analisis")
 
+    # --- 7. PANEL DE INSTRUMENTACIÓN (opcional) ---
+    if traza is not None:
+        with st.sidebar.expander("⏱️ Etapas del rerun", expanded=True):
+            etapas = traza.tabla()
+            medidos = sum(e['segundos'] for e in traza.etapas if e['nivel'] == 0)
+            st.caption(f"{len(etapas)} etapas · {medidos:.2f} s medidos")
+            st.dataframe(etapas, hide_index=True, use_container_width=True)
+            st.download_button("Etapas (JSON)", traza.json(), file_name="etapas.json", mime="application/json")
+            st.download_button("Trace Event (flame)", traza.json_eventos(), file_name="rerun.trace.json",
+                               mime="application/json", help="Abrir en https://ui.perfetto.dev o chrome://tracing")
+
 
 
 else:
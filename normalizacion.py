@@ -0,0 +1,74 @@
+"""Normalización de columnas de texto resolviendo cada valor distinto una sola vez (costo ∝ cardinalidad, no ∝ filas)."""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def _es_categorica(serie):
+    return isinstance(serie.dtype, pd.CategoricalDtype)
+
+
+def _todos_texto(valores):
+    no_nulos = [v for v in valores if not pd.isna(v)]
+    return bool(no_nulos) and all(isinstance(v, str) for v in no_nulos)
+
+
+def _mismo_valor(a, b):
+    if pd.isna(a) or pd.isna(b):
+        return bool(pd.isna(a) and pd.isna(b))
+    return bool(a == b)
+
+
+def normalizar_por_valor(serie, funcion, incluir_nulos=False):
+    """Aplica `funcion` a cada valor distinto de `serie` y propaga el resultado a las filas por código.
+
+    Si todos los resultados son texto la salida es categórica; si son números, float64.
+    Con `incluir_nulos=True` los nulos también pasan por `funcion` (equivale a un `astype(str)` previo).
+    """
+    return normalizar_con_conteo(serie, funcion, incluir_nulos)[0]
+
+
+def normalizar_con_conteo(serie, funcion, incluir_nulos=False):
+    """Como `normalizar_por_valor`, y además cuenta las filas cuyo valor cambió (sin comparar fila a fila)"""
+    if _es_categorica(serie):
+        codigos = serie.cat.codes.to_numpy()
+        unicos = serie.cat.categories
+    else:
+        codigos, unicos = pd.factorize(serie)
+    # El resultado de los nulos va al final: el código -1 de pandas indexa esa posición
+    valores = [funcion(v) for v in unicos]
+    valores.append(funcion(np.nan) if incluir_nulos else np.nan)
+    cambia = np.array([not _mismo_valor(v, r) for v, r in zip([*unicos, np.nan], valores)])
+    filas_por_valor = np.bincount(codigos + 1, minlength=len(valores))  # Posición 0: nulos
+    cambios = int(filas_por_valor[1:][cambia[:-1]].sum() + filas_por_valor[0] * cambia[-1])
+
+    if _todos_texto(valores):
+        codigos_res, categorias = pd.factorize(pd.Index(valores, dtype=object))
+        datos = pd.Categorical.from_codes(codigos_res[codigos], categories=categorias)
+    else:
+        try:
+            datos = np.asarray(valores, dtype=float)[codigos]
+        except (TypeError, ValueError):
+            datos = np.asarray(valores, dtype=object)[codigos]
+    return pd.Series(datos, index=serie.index, name=serie.name), cambios
+
+
+def rellenar(serie, valor):
+    """`fillna` que agrega `valor` como categoría cuando la columna es categórica"""
+    if _es_categorica(serie) and valor not in serie.cat.categories:
+        serie = serie.cat.add_categories([valor])
+    return serie.fillna(valor)
+
+
+def compilar_mapa_regex(mapa):
+    """Precompila un dict {patrón: reemplazo} en una función que aplica los reemplazos en orden"""
+    reglas = [(re.compile(patron), reemplazo) for patron, reemplazo in mapa.items()]
+
+    def aplicar(valor):
+        if not isinstance(valor, str):
+            return valor
+        for patron, reemplazo in reglas:
+            valor = patron.sub(reemplazo, valor)
+        return valor
+    return aplicar
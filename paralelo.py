@@ -0,0 +1,120 @@
+"""Pool de procesos para limpiar tablas en paralelo, con entrega de tablas por memoria compartida (Arrow IPC)."""
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from carga import escribir_columnar, leer_columnar, pa
+
+# Procesos para la limpieza: por defecto uno por núcleo (1 = en serie). Solo entra en juego desde
+# UMBRAL_FILAS; TRABAJADORES_LIMPIEZA=1 lo apaga si el benchmark
+# (`python -m benchmarks.harness --trabajadores N`) no muestra ganancia en el servidor
+TRABAJADORES = int(os.environ.get("TRABAJADORES_LIMPIEZA") or os.cpu_count() or 1)
+UMBRAL_FILAS = 200_000       # Por debajo, mover las tablas entre procesos cuesta más que limpiarlas
+FILAS_POR_BLOQUE = 250_000   # Tamaño de los bloques en que se reparte una tabla grande
+# tmpfs: los archivos viven en RAM y se mapean sin copiar
+DIRECTORIO_COMPARTIDO = Path(os.environ.get("MEMORIA_COMPARTIDA_DIR",
+                                            "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()))
+
+_pool = None
+_trabajadores_pool = 0
+_lock_pool = threading.Lock()
+
+
+# --- 1. TABLAS EN MEMORIA COMPARTIDA ---
+def escribir_compartida(df):
+    """Escribe `df` como Arrow IPC en memoria compartida (tmpfs) y devuelve la ruta; quien la lea la libera"""
+    ruta = DIRECTORIO_COMPARTIDO / f"limpieza-{os.getpid()}-{uuid.uuid4().hex}.arrow"
+    escribir_columnar(df, ruta, preservar_indice=True)
+    return str(ruta)
+
+
+def leer_compartida(ruta, liberar=True):
+    """DataFrame mapeado desde memoria compartida, sin pasar por pickle. El archivo se puede borrar
+    enseguida: el mapeo (y las columnas que apuntan a él) sigue vivo mientras se use"""
+    df = leer_columnar(ruta)
+    if liberar:
+        liberar_compartida(ruta)
+    return df
+
+
+def liberar_compartida(ruta):
+    Path(ruta).unlink(missing_ok=True)
+
+
+# --- 2. POOL ---
+def _obtener_pool(trabajadores):
+    """Pool persistente: los procesos arrancan (e importan pandas) una sola vez por servidor"""
+    global _pool, _trabajadores_pool
+    with _lock_pool:
+        if _pool is None or _trabajadores_pool != trabajadores:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # forkserver/spawn: no se hereda el estado de los hilos de Streamlit como con fork
+            metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=trabajadores, mp_context=multiprocessing.get_context(metodo))
+            _trabajadores_pool = trabajadores
+        return _pool
+
+
+def cerrar_pool():
+    global _pool
+    with _lock_pool:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def conviene(filas, trabajadores=None):
+    """¿Vale la pena repartir `filas` en el pool?"""
+    return pa is not None and (trabajadores or TRABAJADORES) > 1 and filas >= UMBRAL_FILAS
+
+
+def _trabajar(funcion, entrada, kwargs):
+    """Corre en el proceso del pool: lee la tabla compartida, la limpia y deja el resultado en otro bloque"""
+    t0 = time.perf_counter()
+    df = leer_compartida(entrada, liberar=False)
+    limpia, metricas = funcion(df, **kwargs)
+    return escribir_compartida(limpia), metricas, time.perf_counter() - t0
+
+
+def ejecutar(tareas, trabajadores=None):
+    """Corre cada tarea `(funcion, df, kwargs)` -> `funcion(df, **kwargs)`, que devuelve (tabla, métricas).
+
+    Con el pool, las tablas viajan en ambos sentidos como Arrow en memoria compartida y la función
+    viaja por referencia (debe ser de nivel de módulo). Devuelve [(tabla, métricas, segundos)] en orden.
+    """
+    trabajadores = trabajadores or TRABAJADORES
+    if pa is None or trabajadores <= 1:
+        resultados = []
+        for funcion, df, kwargs in tareas:
+            t0 = time.perf_counter()
+            resultados.append((*funcion(df, **kwargs), time.perf_counter() - t0))
+        return resultados
+
+    entradas = [escribir_compartida(df) for _, df, _ in tareas]
+    futuros = []
+    try:
+        pool = _obtener_pool(trabajadores)
+        futuros = [pool.submit(_trabajar, funcion, entrada, kwargs)
+                   for (funcion, _, kwargs), entrada in zip(tareas, entradas)]
+        resultados = []
+        for futuro in futuros:
+            salida, metricas, segundos = futuro.result()
+            resultados.append((leer_compartida(salida), metricas, segundos))
+        return resultados
+    except BrokenProcessPool:
+        cerrar_pool()
+        raise
+    finally:
+        for ruta in entradas:
+            liberar_compartida(ruta)
+        # Si una tarea falló, los resultados que otras dejen en memoria compartida ya no se leerán
+        for futuro in futuros:
+            if not futuro.cancel() and futuro.exception() is None:
+                liberar_compartida(futuro.result()[0])
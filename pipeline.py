@@ -0,0 +1,327 @@
+"""Pipeline puro de limpieza y consolidación de las tablas de Teams (Inventario, Transacciones, Feedback)."""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import paralelo
+from carga import concatenar
+from instrumentacion import activa, anotar, etapa
+from integridad import auditar
+from normalizacion import compilar_mapa_regex
+from reglas import compilar_reglas
+from uniones import unir
+
+
+# --- 1. HUELLA DE CONTENIDO ---
+def huella_tablas(*tablas):
+    """Hash estable del contenido (valores, índice, columnas y dtypes) de una o varias tablas"""
+    h = hashlib.blake2b(digest_size=16)
+    for df in tablas:
+        h.update(repr((list(df.columns), [str(t) for t in df.dtypes], df.shape)).encode())
+        h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+# --- 2. REGLAS DE LIMPIEZA POR TABLA ---
+def audit_report(df, name):
+    """Nulos (%) por columna y duplicados de la tabla, anotados en la etapa en curso solo si se está midiendo"""
+    if activa():
+        nulos = (df.isnull().mean() * 100).round(2)
+        anotar(tabla=name, nulos_pct=nulos[nulos > 0].to_dict(), duplicados=int(df.duplicated().sum()))
+
+
+def simplificar_lead_time(valor):
+    val_str = str(valor).lower().strip()
+    if val_str == 'inmediato': return 0.0
+    numeros = re.findall(r'\d+', val_str)
+    return float(max(numeros, key=int)) if numeros else np.nan
+
+
+# Diccionario de normalización usando Regex
+MAPA_CATEGORIAS = {
+    r'(?i)smart-?phones?': 'Smartphone',
+    r'(?i)laptops?': 'Laptop',
+    r'(?i)monitores?': 'Monitor',
+    r'(?i)accesorios?': 'Accesorio',
+    r'\?{3}': 'No Definido'
+}
+
+MAPEO_CIUDADES = {
+    'MED': 'Medellín',
+    'BOG': 'Bogotá',
+}
+
+normalizar_categoria = compilar_mapa_regex(MAPA_CATEGORIAS)
+
+# Valores que consideramos "ruido" en los comentarios
+RUIDO_COMENTARIOS = ['---', 'N/A', "nan"]
+
+
+def limpiar_comentario(valor):
+    texto = str(valor).lower().strip()
+    return 'sin comentario' if texto in RUIDO_COMENTARIOS else texto
+
+
+def normalizar_bodega(valor):
+    # Esto convierte 'norte', 'NORTE' y 'norte ' en 'Norte'
+    return str(valor).strip().capitalize()
+
+
+# Condiciones con nombre: (tipo, columna, *argumentos). Se evalúan una sola vez por tabla
+CONDICIONES = {
+    'inventario': {
+        'categoria_indefinida': ('igual', 'Categoria', '???'),
+        'stock_invalido': ('no_positivo', 'Stock_Actual'),
+        'sin_lead_time': ('nulo', 'Lead_Time_Dias'),
+    },
+    'feedback': {
+        'rating_fuera': ('fuera_de', 'Rating_Producto', 1, 5),
+        'edad_fuera': ('fuera_de', 'Edad_Cliente', 0, 100),
+        'edad_valida': ('dentro_de', 'Edad_Cliente', 0, 100),
+    },
+}
+
+# Reglas por tabla (ver reglas.ACCIONES). Las eliminaciones se aplican primero, en el orden listado;
+# el resto, en orden, sobre las filas conservadas
+REGLAS = {
+    'inventario': [
+        # Cada filtro se aplica sobre el resultado del anterior: Filtro Multicondición, Lead Time y Stock Crítico
+        {'nombre': 'multicondicion', 'accion': 'eliminar', 'si': ['categoria_indefinida', 'stock_invalido', 'sin_lead_time']},
+        {'nombre': 'lead_time', 'accion': 'eliminar', 'si': ['categoria_indefinida', 'sin_lead_time']},
+        {'nombre': 'stock_critico', 'accion': 'eliminar', 'si': ['categoria_indefinida', 'stock_invalido']},
+        # Textos a números (una vez por valor distinto) y NaN con la mediana
+        {'nombre': 'lead_time_a_numero', 'accion': 'mapear', 'columna': 'Lead_Time_Dias', 'funcion': simplificar_lead_time},
+        {'nombre': 'lead_time_mediana', 'accion': 'imputar_mediana', 'columna': 'Lead_Time_Dias'},
+        {'nombre': 'bodega_formato', 'accion': 'mapear', 'columna': 'Bodega_Origen', 'funcion': normalizar_bodega,
+         'incluir_nulos': True},
+        # Todos los patrones se aplican en una sola pasada sobre las categorías distintas
+        {'nombre': 'categoria_regex', 'accion': 'mapear', 'columna': 'Categoria', 'funcion': normalizar_categoria},
+    ],
+    'transacciones': [
+        # Llenar vacíos con una etiqueta de control
+        {'nombre': 'estado_sin_dato', 'accion': 'rellenar', 'columna': 'Estado_Envio', 'valor': 'No especificado'},
+        {'nombre': 'ciudad_abreviada', 'accion': 'mapear', 'columna': 'Ciudad_Destino', 'mapeo': MAPEO_CIUDADES},
+        {'nombre': 'costo_envio_mediana', 'accion': 'imputar_mediana', 'columna': 'Costo_Envio'},
+        # Valores negativos de Cantidad_Vendida se convierten en 0
+        {'nombre': 'cantidad_negativa', 'accion': 'recortar', 'columna': 'Cantidad_Vendida', 'minimo': 0},
+        # Los 999 son tiempos de entrega inválidos: se imputan con la mediana
+        {'nombre': 'tiempo_entrega_mediana', 'accion': 'imputar_mediana', 'columna': 'Tiempo_Entrega_Real',
+         'centinelas': [999]},
+    ],
+    'feedback': [
+        # Mantenemos solo las filas con rating en el rango válido (1 a 5)
+        {'nombre': 'rating_fuera_de_rango', 'accion': 'eliminar', 'si': ['rating_fuera']},
+        # --- REGLA 1: ELIMINAR FILA --- Rating mal Y Edad mal (ej. Rating 99 y Edad 195)
+        {'nombre': 'rating_y_edad_invalidos', 'accion': 'eliminar', 'si': ['rating_fuera', 'edad_fuera']},
+        # Pasamos a minúsculas, quitamos espacios y reemplazamos el ruido por "sin comentario"
+        {'nombre': 'comentario_ruido', 'accion': 'mapear', 'columna': 'Comentario_Texto', 'funcion': limpiar_comentario,
+         'incluir_nulos': True},
+        {'nombre': 'recomienda_ruido', 'accion': 'mapear', 'columna': 'Recomienda_Marca',
+         'mapeo': dict.fromkeys(['nan', 'n/a', 'None', 'N/A'], np.nan)},
+        {'nombre': 'recomienda_sin_respuesta', 'accion': 'rellenar', 'columna': 'Recomienda_Marca', 'valor': 'SIN RESPUESTA'},
+        # --- REGLA 2: CAMBIAR POR MEDIANA --- Rating mal pero Edad bien (ej. Rating 99 y Edad 25)
+        {'nombre': 'rating_mediana', 'accion': 'imputar_mediana', 'columna': 'Rating_Producto',
+         'si': ['rating_fuera', 'edad_valida']},
+    ],
+}
+
+LIMPIEZA = {tabla: compilar_reglas(reglas, CONDICIONES.get(tabla)) for tabla, reglas in REGLAS.items()}
+
+
+def limpiar_inventario(df_inv):
+    """Filtra registros inconsistentes y normaliza Lead Time, Bodega y Categoría"""
+    total = df_inv.shape[0]
+    df_inv, conteos = LIMPIEZA['inventario'](df_inv)
+    audit_report(df_inv, "Inventario")
+
+    # Porcentaje que sobrevive a cada filtro acumulado
+    descartadas = np.cumsum([conteos['multicondicion'], conteos['lead_time'], conteos['stock_critico']])
+    metricas = {f'p{i}': ((total - d) / total) * 100 for i, d in enumerate(descartadas, start=1)}
+    metricas['p_final'] = metricas['p3']
+    metricas['reglas_inventario'] = conteos
+    return df_inv, metricas
+
+
+def limpiar_transacciones(df_trans, medianas=None):
+    """Etiqueta estados vacíos, estandariza ciudades e imputa costos y tiempos de entrega.
+
+    `medianas` ({'Costo_Envio', 'Tiempo_Entrega_Real'}) permite imputar un lote nuevo con medianas
+    mantenidas sobre todo el historial en lugar de las del propio lote.
+    """
+    df_trans = pd.DataFrame(df_trans)
+    audit_report(df_trans, "Transacciones")
+    df_trans, conteos = LIMPIEZA['transacciones'](df_trans, medianas)
+    return df_trans, {'reglas_transacciones': conteos}
+
+
+def limpiar_feedback(df_feed, mediana_rating=None):
+    """Normaliza comentarios y recomendaciones y descarta ratings fuera de rango"""
+    audit_report(df_feed, "Feedback")
+    medianas = None if mediana_rating is None else {'Rating_Producto': mediana_rating}
+    df_feed, conteos = LIMPIEZA['feedback'](df_feed, medianas)
+    return df_feed, {'reglas_feedback': conteos}
+
+
+# --- 3. LIMPIEZA EN PARALELO ---
+def _bloques(df, filas):
+    return [df.iloc[i:i + filas] for i in range(0, len(df), filas)] or [df]
+
+
+def _unir_bloques(resultados):
+    """Tabla y métricas de una tabla limpiada por bloques: concatena en orden y suma los conteos por regla"""
+    partes = [df for df, _, _ in resultados]
+    limpia = partes[0]
+    if len(partes) > 1:
+        limpia = concatenar(*partes)
+        limpia.index = np.concatenate([p.index.to_numpy() for p in partes])  # Mismo índice que de una vez
+    metricas = {}
+    for _, m, _ in resultados:
+        for clave, conteos in m.items():
+            metricas[clave] = {regla: metricas.get(clave, {}).get(regla, 0) + n for regla, n in conteos.items()}
+    return limpia, metricas
+
+
+def limpiar_tablas(df_inv, df_trans, df_feed, trabajadores=None, filas_por_bloque=paralelo.FILAS_POR_BLOQUE):
+    """Limpia las tres tablas; devuelve [(tabla, métricas)] para Inventario, Transacciones y Feedback.
+
+    Las tablas no dependen entre sí hasta la consolidación: si son grandes y hay varios núcleos se
+    limpian en el pool de procesos. Transacciones y Feedback además se parten en bloques, imputados con
+    las medianas de la tabla completa (calculadas antes) para que el resultado sea el mismo que en serie.
+    """
+    if not paralelo.conviene(len(df_inv) + len(df_trans) + len(df_feed), trabajadores):
+        resultados = []
+        for nombre, funcion, df in (('inventario', limpiar_inventario, df_inv),
+                                    ('transacciones', limpiar_transacciones, df_trans),
+                                    ('feedback', limpiar_feedback, df_feed)):
+            with etapa(f'limpieza_{nombre}', len(df)) as info:
+                resultados.append(funcion(df))
+                info['filas_salida'] = len(resultados[-1][0])
+        return resultados
+
+    with etapa('limpieza_paralela', len(df_inv) + len(df_trans) + len(df_feed)) as info:
+        bloques_trans = _bloques(df_trans, filas_por_bloque)
+        bloques_feed = _bloques(df_feed, filas_por_bloque)
+        # Una tabla partida en bloques se imputa con las medianas de la tabla completa
+        with etapa('medianas_globales'):
+            kwargs_trans = {'medianas': LIMPIEZA['transacciones'].medianas(df_trans)} if len(bloques_trans) > 1 else {}
+            kwargs_feed = {'mediana_rating': LIMPIEZA['feedback'].medianas(df_feed).get('Rating_Producto')} \
+                if len(bloques_feed) > 1 else {}
+        tareas = [(limpiar_inventario, df_inv, {})]
+        tareas += [(limpiar_transacciones, b, kwargs_trans) for b in bloques_trans]
+        tareas += [(limpiar_feedback, b, kwargs_feed) for b in bloques_feed]
+        resultados = paralelo.ejecutar(tareas, trabajadores)
+        inv, metricas_inv, _ = resultados[0]
+        limpias = [(inv, metricas_inv),
+                   _unir_bloques(resultados[1:1 + len(bloques_trans)]),
+                   _unir_bloques(resultados[1 + len(bloques_trans):])]
+        info.update(tareas=len(tareas), segundos_trabajadores=round(sum(r[2] for r in resultados), 4),
+                    filas_salida=sum(len(df) for df, _ in limpias))
+    return limpias
+
+
+# --- 4. CONSOLIDACIÓN ---
+def _ganancias(df):
+    return (df['Precio_Venta_Final'] * df['Cantidad_Vendida']) - (df['Costo_Unitario_USD'] * df['Cantidad_Vendida']) - df['Costo_Envio']
+
+
+def consolidar(df_inv, df_trans, df_feed):
+    """Cruza Transacciones con Inventario y Feedback y mide el impacto de los registros fantasma.
+
+    Los cruces son por clave entera contra índices cacheados; si Inventario o Feedback repiten claves,
+    las filas se multiplican como en pd.merge y el excedente queda en las métricas `fanout_*`.
+    """
+    with etapa('union_inventario', len(df_trans)) as info:
+        df_rich, union_inv = unir(df_trans, df_inv, 'SKU_ID')
+        df_rich['Ganancias2'] = _ganancias(df_rich)
+        info.update(filas_salida=len(df_rich), sin_pareja=union_inv['sin_pareja'])
+    with etapa('union_feedback', len(df_rich)) as info:
+        df_full, union_feed = unir(df_rich, df_feed, 'Transaccion_ID')
+        df_full['Ganancias'] = _ganancias(df_full)
+        info.update(filas_salida=len(df_full), sin_pareja=union_feed['sin_pareja'])
+
+    # Filas sin ningún nulo, contadas sin materializar las tablas filtradas
+    filas_full_limpias = int(df_full.notna().all(axis=1).sum())
+    # Fantasmas por anti-join sobre las claves, sin depender de la tabla cruzada
+    with etapa('integridad', len(df_trans)):
+        integridad = auditar(df_inv, df_trans, df_feed)
+        skus, feedback = integridad['skus'].resumen(), integridad['feedback'].resumen()
+
+    metricas = {
+        'filas_rich': df_rich.shape[0],
+        'filas_rich_limpias': int(df_rich.notna().all(axis=1).sum()),
+        'filas_full': df_full.shape[0],
+        'filas_full_limpias': filas_full_limpias,
+        'pct_conservado': round((filas_full_limpias / df_full.shape[0]) * 100, 1) if df_full.shape[0] else 0.0,
+        'skus_fantasma': skus['claves_huerfanas'],
+        'transacciones_fantasma': skus['hechos_huerfanos'],
+        'ingresos_skus_fantasma': skus['ingresos_huerfanos'],
+        'transacciones_sin_feedback': feedback['filas_huerfanas'],
+        'utilidad_sin_fantasmas': df_rich[df_rich['Bodega_Origen'].notnull()]['Ganancias2'].sum(),
+        'utilidad_con_fantasmas': df_full['Ganancias'].sum(),
+        'fanout_inventario': union_inv['fanout'],
+        'skus_duplicados_inventario': union_inv['claves_duplicadas'],
+        'fanout_feedback': union_feed['fanout'],
+        'transacciones_duplicadas_feedback': union_feed['claves_duplicadas'],
+    }
+    return df_rich, df_full, metricas
+
+
+def ejecutar_pipeline(df_inv, df_trans, df_feed):
+    """Limpia las tres tablas y las consolida. No modifica las tablas de entrada"""
+    (df_inv, metricas_inv), (df_trans, metricas_trans), (df_feed, metricas_feed) = limpiar_tablas(df_inv, df_trans, df_feed)
+    with etapa('consolidacion', len(df_trans)) as info:
+        df_rich, df_full, metricas_cons = consolidar(df_inv, df_trans, df_feed)
+        info['filas_salida'] = len(df_full)
+    return {
+        'df_inv': df_inv,
+        'df_trans': df_trans,
+        'df_feed': df_feed,
+        'df_rich': df_rich,
+        'df_full': df_full,
+        'metricas': {**metricas_inv, **metricas_trans, **metricas_feed, **metricas_cons},
+    }
+
+
+# --- 5. MEMOIZACIÓN POR CONTENIDO ---
+class CachePipeline:
+    """Cache LRU acotada de resultados del pipeline, indexada por la huella de las tres tablas de entrada.
+
+    Si quien llama ya conoce una clave que identifica el contenido (p. ej. las versiones ETag de las
+    fuentes de Teams) la pasa en `clave` y no se recorren las tablas. `calcular` produce el resultado
+    en un fallo (por defecto el pipeline completo; el tablero usa el refresco incremental).
+    Los DataFrames devueltos se comparten entre llamadas: tratarlos como de solo lectura.
+    """
+
+    def __init__(self, max_entradas=4):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, df_inv, df_trans, df_feed, clave=None, calcular=ejecutar_pipeline):
+        clave = clave if clave is not None else huella_tablas(df_inv, df_trans, df_feed)
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                return self._entradas[clave]
+        resultado = calcular(df_inv, df_trans, df_feed)
+        with self._lock:
+            self._entradas[clave] = resultado
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return resultado
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+# Instancia compartida por todas las sesiones del proceso de Streamlit
+cache_pipeline = CachePipeline()
@@ -0,0 +1,125 @@
+"""Registro de datasets compartido por todas las sesiones del proceso: solo lectura, con TTL, tope de memoria LRU y cargas coalescidas."""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+from esquemas import memoria_bytes
+
+TTL_SEGUNDOS = int(os.environ.get("REGISTRO_TTL_SEGUNDOS", 10 * 60))
+MAX_BYTES = int(float(os.environ.get("REGISTRO_MAX_MB", 2048)) * 1e6)
+
+
+class CargaInterrumpida(RuntimeError):
+    """La sesión que cargaba el dataset se interrumpió (p. ej. un rerun); quien esperaba lo vuelve a pedir"""
+
+
+def tamano_bytes(valor):
+    """Memoria de un dataset: la de sus DataFrames (incluyendo strings), también dentro de dicts y listas"""
+    if isinstance(valor, pd.DataFrame):
+        return memoria_bytes(valor)
+    if isinstance(valor, dict):
+        return sum(tamano_bytes(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sum(tamano_bytes(v) for v in valor)
+    return 0
+
+
+class RegistroDatasets:
+    """Datasets cargados una vez por proceso y entregados por referencia a todas las sesiones.
+
+    Cada entrada vence a los `ttl` segundos de cargada. Mientras el total supera `max_bytes` se
+    desalojan las menos usadas recientemente (la recién cargada nunca). Si varias sesiones piden la
+    misma clave vencida a la vez, solo una corre `cargar()`; las demás esperan ese mismo resultado.
+    Los DataFrames son compartidos: no modificarlos en su lugar (con Copy-on-Write, derivar una tabla
+    con `copy(deep=False)`, filtros o asignaciones sobre la copia no copia los datos).
+    """
+
+    def __init__(self, ttl=TTL_SEGUNDOS, max_bytes=MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._en_curso = {}
+        self._lock = threading.Lock()
+
+    def _vigente(self, entrada):
+        return entrada is not None and time.monotonic() - entrada['cargado'] <= entrada['ttl']
+
+    def obtener(self, clave, cargar, ttl=None):
+        """Dataset vigente de `clave`, cargándolo con `cargar()` si falta o venció"""
+        while True:
+            with self._lock:
+                entrada = self._entradas.get(clave)
+                if self._vigente(entrada):
+                    self._entradas.move_to_end(clave)
+                    entrada['lecturas'] += 1
+                    return entrada['valor']
+                futuro = self._en_curso.get(clave)
+                propio = futuro is None
+                if propio:
+                    futuro = self._en_curso[clave] = Future()
+            if propio:
+                return self._cargar(clave, cargar, ttl, futuro)
+            try:
+                return futuro.result()  # Otra sesión ya lo está cargando
+            except CargaInterrumpida:
+                continue
+
+    def _cargar(self, clave, cargar, ttl, futuro):
+        try:
+            valor = cargar()
+        except BaseException as e:
+            with self._lock:
+                del self._en_curso[clave]
+            # Un error de la carga se comparte; una interrupción de la sesión que cargaba, no
+            futuro.set_exception(e if isinstance(e, Exception) else CargaInterrumpida(clave))
+            raise
+        with self._lock:
+            del self._en_curso[clave]
+            self._entradas[clave] = {'valor': valor, 'cargado': time.monotonic(), 'ttl': self.ttl if ttl is None else ttl,
+                                     'bytes': tamano_bytes(valor), 'lecturas': 1}
+            self._entradas.move_to_end(clave)
+            self._desalojar(clave)
+        futuro.set_result(valor)
+        return valor
+
+    def _desalojar(self, protegida):
+        for clave in list(self._entradas):
+            if self.bytes_totales <= self.max_bytes:
+                break
+            if clave != protegida:
+                del self._entradas[clave]  # Las sesiones que aún la usan conservan su referencia
+
+    def vigente(self, clave):
+        with self._lock:
+            return self._vigente(self._entradas.get(clave))
+
+    def invalidar(self, clave=None):
+        """Descarta una clave (o todas): la próxima lectura vuelve a cargarla"""
+        with self._lock:
+            if clave is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(clave, None)
+
+    @property
+    def bytes_totales(self):
+        return sum(e['bytes'] for e in self._entradas.values())
+
+    def resumen(self):
+        """Una fila por dataset (del menos al más usado recientemente), para mostrar en el tablero"""
+        ahora = time.monotonic()
+        with self._lock:
+            return [{'clave': clave, 'mb': round(e['bytes'] / 1e6, 2), 'edad_s': round(ahora - e['cargado']),
+                     'vence_en_s': round(e['cargado'] + e['ttl'] - ahora), 'lecturas': e['lecturas']}
+                    for clave, e in self._entradas.items()]
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+# Instancia compartida por todas las sesiones del proceso de Streamlit
+registro_datasets = RegistroDatasets()
@@ -0,0 +1,171 @@
+"""Motor de reglas de calidad de datos: especificación declarativa por tabla evaluada en una sola pasada fusionada."""
+import numpy as np
+import pandas as pd
+
+from instrumentacion import activa, anotar, etapa
+from normalizacion import normalizar_con_conteo, rellenar
+
+# eliminar: descarta las filas donde se cumplen todas las condiciones `si`
+# imputar_mediana: reemplaza nulos y `centinelas` (o las filas `si`) por la mediana de los valores válidos
+# mapear: aplica `funcion` o el dict `mapeo` a cada valor distinto de `columna`
+# rellenar: llena los nulos de `columna` con `valor`
+# recortar: lleva a `minimo` los valores menores
+ACCIONES = ('eliminar', 'imputar_mediana', 'mapear', 'rellenar', 'recortar')
+
+
+class ErrorRegla(ValueError):
+    """La especificación de reglas es inválida (acción o condición desconocida, campos faltantes)"""
+
+
+# --- 1. CONDICIONES ---
+def _mascara(resultado):
+    return resultado.fillna(False).to_numpy(dtype=bool)
+
+
+def evaluar_condicion(df, tipo, columna, *args):
+    """Máscara booleana (numpy) de una condición ('igual', 'nulo', 'no_positivo', 'dentro_de', 'fuera_de')"""
+    serie = df[columna]
+    if tipo == 'igual':
+        return _mascara(serie == args[0])
+    if tipo == 'nulo':
+        return serie.isna().to_numpy()
+    if tipo == 'no_positivo':
+        return serie.isna().to_numpy() | _mascara(pd.to_numeric(serie, errors='coerce') <= 0)
+    if tipo == 'dentro_de':
+        return _mascara(serie.between(*args))
+    if tipo == 'fuera_de':
+        return ~_mascara(serie.between(*args))
+    raise ErrorRegla(f"Condición desconocida: {tipo}")
+
+
+def _todas(mascaras, nombres):
+    resultado = mascaras[nombres[0]]
+    for nombre in nombres[1:]:
+        resultado = resultado & mascaras[nombre]
+    return resultado
+
+
+# --- 2. TRANSFORMACIONES SOBRE LAS FILAS CONSERVADAS ---
+def _invalidas(serie, regla, mascaras):
+    """Filas que imputa una regla 'imputar_mediana': las condiciones `si`, o nulos y centinelas"""
+    if 'si' in regla:
+        return _todas(mascaras, regla['si'])
+    invalida = serie.isna().to_numpy()
+    if regla.get('centinelas'):
+        invalida = invalida | serie.isin(regla['centinelas']).to_numpy()
+    return invalida
+
+
+def _imputar_mediana(serie, regla, mascaras, medianas):
+    invalida = _invalidas(serie, regla, mascaras)
+    mediana = medianas.get(regla['columna'])
+    if mediana is None:
+        mediana = serie[~invalida].median()
+    anotar(mediana=mediana)
+    if not invalida.any():
+        return serie, 0
+    return serie.mask(invalida, mediana), int(invalida.sum())
+
+
+def _mapear(serie, regla, mascaras, medianas):
+    mapeo = regla.get('mapeo')
+    funcion = regla.get('funcion') or (lambda v: mapeo.get(v, v))
+    nueva, cambios = normalizar_con_conteo(serie, funcion, regla.get('incluir_nulos', False))
+    if activa():
+        anotar(valores=[str(v) for v in nueva.dropna().unique()[:10]])
+    return nueva, cambios
+
+
+def _rellenar(serie, regla, mascaras, medianas):
+    return rellenar(serie, regla['valor']), int(serie.isna().sum())
+
+
+def _recortar(serie, regla, mascaras, medianas):
+    return serie.clip(lower=regla['minimo']), int((serie < regla['minimo']).sum())
+
+
+TRANSFORMACIONES = {'imputar_mediana': _imputar_mediana, 'mapear': _mapear, 'rellenar': _rellenar,
+                    'recortar': _recortar}
+
+
+# --- 3. COMPILACIÓN ---
+def _validar(reglas, condiciones):
+    nombres = set()
+    for regla in reglas:
+        nombre, accion = regla.get('nombre'), regla.get('accion')
+        if not nombre or nombre in nombres:
+            raise ErrorRegla(f"Cada regla necesita un nombre único: {regla}")
+        nombres.add(nombre)
+        if accion not in ACCIONES:
+            raise ErrorRegla(f"{nombre}: acción desconocida {accion!r}")
+        if accion == 'eliminar' and not regla.get('si'):
+            raise ErrorRegla(f"{nombre}: 'eliminar' necesita condiciones 'si'")
+        if accion != 'eliminar' and 'columna' not in regla:
+            raise ErrorRegla(f"{nombre}: '{accion}' necesita 'columna'")
+        faltantes = [c for c in regla.get('si', []) if c not in condiciones]
+        if faltantes:
+            raise ErrorRegla(f"{nombre}: condiciones no definidas {faltantes}")
+
+
+class ReglasCompiladas:
+    """Reglas de una tabla validadas y listas para aplicarse en una sola pasada (ver `compilar_reglas`)"""
+
+    def __init__(self, reglas, condiciones=None):
+        self.condiciones = condiciones or {}
+        _validar(reglas, self.condiciones)
+        self.filtros = [r for r in reglas if r['accion'] == 'eliminar']
+        self.transformaciones = [r for r in reglas if r['accion'] != 'eliminar']
+        self._usadas = list(dict.fromkeys(c for r in reglas for c in r.get('si', [])))
+
+    def _filtrar(self, df):
+        """(filas conservadas, filas descartadas por regla, máscaras de las condiciones sobre las conservadas)"""
+        mascaras = {nombre: evaluar_condicion(df, *self.condiciones[nombre]) for nombre in self._usadas}
+        conserva = np.ones(len(df), dtype=bool)
+        conteos = {}
+        for regla in self.filtros:
+            descarta = conserva & _todas(mascaras, regla['si'])
+            conteos[regla['nombre']] = int(descarta.sum())
+            conserva &= ~descarta
+        return conserva, conteos, {nombre: m[conserva] for nombre, m in mascaras.items()}
+
+    def __call__(self, df, medianas=None):
+        medianas = medianas or {}
+        with etapa('filtros', len(df)) as info:
+            conserva, conteos, mascaras = self._filtrar(df)
+            limpia = df.copy(deep=False) if conserva.all() else df[conserva]
+            info['filas_salida'] = len(limpia)
+        for regla in self.transformaciones:
+            with etapa(regla['nombre'], len(limpia)) as info:
+                columna = regla['columna']
+                limpia[columna], conteos[regla['nombre']] = TRANSFORMACIONES[regla['accion']](
+                    limpia[columna], regla, mascaras, medianas)
+                info['filas_afectadas'] = conteos[regla['nombre']]
+        return limpia, conteos
+
+    def medianas(self, df):
+        """Medianas que usaría cada 'imputar_mediana' sobre `df` completo, tocando solo las columnas imputadas.
+        Permite limpiar la tabla por bloques independientes con el mismo resultado que de una vez"""
+        conserva, _, mascaras = self._filtrar(df)
+        resultado = {}
+        for i, regla in enumerate(self.transformaciones):
+            if regla['accion'] != 'imputar_mediana':
+                continue
+            serie = df[regla['columna']][conserva]
+            for previa in self.transformaciones[:i]:
+                if previa['columna'] == regla['columna']:
+                    serie, _ = TRANSFORMACIONES[previa['accion']](serie, previa, mascaras, resultado)
+            resultado[regla['columna']] = serie[~_invalidas(serie, regla, mascaras)].median()
+        return resultado
+
+
+def compilar_reglas(reglas, condiciones=None):
+    """Valida la especificación y devuelve `aplicar(df, medianas=None) -> (tabla limpia, filas por regla)`.
+
+    Todas las reglas 'eliminar' se evalúan sobre la tabla de entrada, antes de cualquier transformación:
+    cada condición se calcula una sola vez, las máscaras se combinan en orden (cada regla cuenta solo
+    las filas que las anteriores no descartaron) y la tabla se copia una única vez. Después, las
+    transformaciones se aplican en orden sobre las filas conservadas, reemplazando columnas enteras.
+    `medianas` ({columna: valor}) fija la mediana de imputación en lugar de calcularla sobre la tabla;
+    `aplicar.medianas(df)` las calcula para una tabla completa.
+    """
+    return ReglasCompiladas(reglas, condiciones)
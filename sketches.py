@@ -0,0 +1,66 @@
+"""Sketches de cuantiles fusionables basados en histogramas de resolución fija."""
+import numpy as np
+import pandas as pd
+
+
+def cuantil_histograma(bins, conteos, q, resolucion):
+    """Cuantil `q` (interpolación lineal, igual que pandas) a partir de bins enteros y sus conteos.
+
+    Es exacto cuando los datos originales son múltiplos de `resolucion` (p. ej. NPS con un decimal).
+    """
+    bins = np.asarray(bins)
+    conteos = np.asarray(conteos)
+    if len(bins) == 0 or conteos.sum() == 0:
+        return np.nan
+    orden = np.argsort(bins, kind='stable')
+    bins, conteos = bins[orden], conteos[orden]
+    acumulado = np.cumsum(conteos)
+    posicion = q * (acumulado[-1] - 1)
+    bajo, alto = int(np.floor(posicion)), int(np.ceil(posicion))
+    v_bajo = bins[np.searchsorted(acumulado, bajo, side='right')]
+    v_alto = bins[np.searchsorted(acumulado, alto, side='right')]
+    return float((v_bajo + (v_alto - v_bajo) * (posicion - bajo)) * resolucion)
+
+
+def a_bins(valores, resolucion):
+    """Discretiza valores (sin nulos) al entero más cercano en unidades de `resolucion`"""
+    return np.rint(np.asarray(valores, dtype='float64') / resolucion).astype('int64')
+
+
+class SketchCuantiles:
+    """Histograma disperso {bin: conteo} de resolución fija. Dos sketches se fusionan sumando conteos."""
+
+    def __init__(self, resolucion=0.1):
+        self.resolucion = resolucion
+        self.conteos = pd.Series(dtype='int64')
+
+    def agregar(self, valores):
+        valores = pd.Series(valores).dropna()
+        if len(valores):
+            nuevos = pd.Series(a_bins(valores, self.resolucion)).value_counts()
+            self.conteos = self.conteos.add(nuevos, fill_value=0).astype('int64')
+        return self
+
+    def fusionar(self, otro):
+        if otro.resolucion != self.resolucion:
+            raise ValueError("Solo se pueden fusionar sketches con la misma resolución")
+        self.conteos = self.conteos.add(otro.conteos, fill_value=0).astype('int64')
+        return self
+
+    def cuantil(self, q):
+        return cuantil_histograma(self.conteos.index.to_numpy(), self.conteos.to_numpy(), q, self.resolucion)
+
+    def mediana(self):
+        return self.cuantil(0.5)
+
+    def __len__(self):
+        return int(self.conteos.sum())
+
+    def a_dict(self):
+        return {'resolucion': self.resolucion, 'bins': self.conteos.index.tolist(), 'conteos': self.conteos.tolist()}
+
+    @classmethod
+    def desde_dict(cls, datos):
+        sketch = cls(datos['resolucion'])
+        sketch.conteos = pd.Series(datos['conteos'], index=datos['bins'], dtype='int64')
+        return sketch
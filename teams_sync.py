@@ -0,0 +1,132 @@
+"""Descarga concurrente y condicional (ETag / If-Modified-Since) de las fuentes de Teams con espejo local en disco."""
+import contextvars
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from instrumentacion import anotar, etapa
+
+DIRECTORIO_ESPEJO = Path(os.environ.get("TEAMS_MIRROR_DIR", ".cache/teams"))
+TIMEOUT_SEGUNDOS = (5, 60)  # (conexión, lectura)
+
+# Estados posibles de cada descarga
+DESCARGADO = "descargado"
+SIN_CAMBIOS = "sin cambios"
+ESPEJO_OFFLINE = "espejo (sin conexión)"
+# 4xx que no son transitorios (URL vencida, sin permisos...): se informan en lugar de servir el espejo
+ESTADOS_TRANSITORIOS = (408, 429)
+
+
+def crear_sesion(pool=8, reintentos=2):
+    """Sesión HTTP con pool de conexiones keep-alive y reintentos con backoff ante errores transitorios"""
+    sesion = requests.Session()
+    retry = Retry(total=reintentos, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset(["GET"]))
+    adaptador = HTTPAdapter(pool_connections=pool, pool_maxsize=pool, max_retries=retry)
+    sesion.mount("http://", adaptador)
+    sesion.mount("https://", adaptador)
+    return sesion
+
+
+def _rutas_espejo(url, directorio):
+    nombre = hashlib.sha1(url.encode()).hexdigest()[:16]
+    return directorio / f"{nombre}.csv", directorio / f"{nombre}.meta.json"
+
+
+def _leer_meta(ruta_meta):
+    try:
+        return json.loads(ruta_meta.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _error_del_cliente(error):
+    respuesta = getattr(error, "response", None)
+    return respuesta is not None and 400 <= respuesta.status_code < 500 \
+        and respuesta.status_code not in ESTADOS_TRANSITORIOS
+
+
+def _escribir_atomico(ruta, escribir):
+    """Escribe en un temporal del mismo directorio y lo renombra, para no dejar espejos a medias"""
+    fd, tmp = tempfile.mkstemp(dir=ruta.parent, prefix=ruta.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            escribir(f)
+        os.replace(tmp, ruta)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def descargar_condicional(url, directorio=DIRECTORIO_ESPEJO, sesion=None, timeout=TIMEOUT_SEGUNDOS):
+    """Revalida `url` contra su copia en el espejo y solo descarga el cuerpo si cambió.
+
+    Devuelve un dict con la ruta local, el estado de la descarga y una `version` (ETag, Last-Modified
+    o hash del contenido) que sirve como clave de cache para el parseo posterior. Ante una falla de red
+    (también a mitad del cuerpo) o un 5xx sirve la última copia buena; un 4xx se propaga como error.
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    ruta, ruta_meta = _rutas_espejo(url, directorio)
+    sesion = sesion or crear_sesion()
+
+    meta = _leer_meta(ruta_meta) if ruta.exists() else {}
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    digest = hashlib.sha1()
+    try:
+        resp = sesion.get(url, headers=headers, timeout=timeout, stream=True)
+        with resp:
+            if resp.status_code == 304 and meta:
+                return {"ruta": ruta, "estado": SIN_CAMBIOS, "version": meta["version"]}
+            resp.raise_for_status()
+
+            def escribir(f):
+                for bloque in resp.iter_content(chunk_size=1 << 20):
+                    digest.update(bloque)
+                    f.write(bloque)
+
+            # Si la conexión se corta a mitad del cuerpo, el espejo anterior queda intacto
+            _escribir_atomico(ruta, escribir)
+    except requests.RequestException as e:
+        # Sin conexión o servidor caído: servimos la última copia buena si existe
+        if meta and not _error_del_cliente(e):
+            return {"ruta": ruta, "estado": ESPEJO_OFFLINE, "version": meta["version"]}
+        raise
+
+    meta = {
+        "url": url,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "version": digest.hexdigest(),
+    }
+    _escribir_atomico(ruta_meta, lambda f: f.write(json.dumps(meta).encode()))
+    return {"ruta": ruta, "estado": DESCARGADO, "version": meta["version"]}
+
+
+def descargar_fuentes(urls, directorio=DIRECTORIO_ESPEJO, sesion=None, max_workers=None):
+    """Descarga en paralelo un dict {nombre: url}; el tiempo total queda acotado por el archivo más lento"""
+    sesion = sesion or crear_sesion(pool=max(len(urls), 1))
+
+    def descargar(nombre, url):
+        with etapa(f'descarga_{nombre}'):
+            resultado = descargar_condicional(url, directorio, sesion)
+            anotar(estado=resultado['estado'], bytes=Path(resultado['ruta']).stat().st_size)
+            return resultado
+
+    with ThreadPoolExecutor(max_workers=max_workers or max(len(urls), 1)) as pool:
+        # Cada hilo corre en una copia del contexto para que sus etapas queden en la traza del rerun
+        futuros = {nombre: pool.submit(contextvars.copy_context().run, descargar, nombre, url)
+                   for nombre, url in urls.items()}
+        return {nombre: futuro.result() for nombre, futuro in futuros.items()}
@@ -0,0 +1,236 @@
+"""Ventas particionadas por mes sobre un índice de fechas ordenado: filtro por rango de fechas y ventanas móviles sin reparsear Fecha_Venta."""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from agregados import AgregadosTablero, _sumar, _texto
+from carga import concatenar
+from cubo import fecha_venta
+
+VENTANAS_DIAS = (7, 30, 90)
+MAX_RANGOS = 32  # Rangos ya consultados que se recuerdan (cada uno es un AgregadosTablero chico)
+# Totales por día y categoría, la base de las ventanas móviles: medida -> columna de origen
+MEDIDAS_DIARIAS = {'ingresos': 'Precio_Venta_Final', 'utilidad': 'Utilidad_Total', 'unidades': 'Cantidad_Vendida'}
+TABLAS_AGREGADOS = ('cubo_medidas', 'cubo_nps', 'sumas', 'nps', 'dispersion')
+
+
+def _numero(df, col):
+    return pd.to_numeric(df[col], errors='coerce').fillna(0) if col in df.columns else pd.Series(0.0, index=df.index)
+
+
+def _dia(valor, defecto):
+    return defecto if valor is None else pd.Timestamp(valor).normalize()
+
+
+class AlmacenTemporal:
+    """Ventas ordenadas por día (Fecha_Venta se parsea una sola vez, al agregarlas) y partidas por mes.
+
+    Cada mes guarda sus AgregadosTablero ya calculados. Un rango de fechas combina los meses que cubre
+    completos (poda de particiones) y solo agrega las filas de los meses del borde, que se ubican por
+    búsqueda binaria en el índice ordenado. Los totales por día y categoría sostienen las ventanas de
+    7/30/90 días.
+    Con las filas en memoria las particiones se arman recién en la primera consulta por rango (una sola
+    pasada agrupada por mes) y los agregados sin filtro salen directo de las filas: el tablero sin
+    filtro de fechas cuesta lo mismo que antes. Sin filas (archivos agregados por bloques) cada bloque
+    se particiona al llegar y los rangos se extienden a meses completos.
+    """
+
+    def __init__(self, anchos=None, conservar_filas=True):
+        self.anchos = anchos
+        self.conservar_filas = conservar_filas
+        self._particiones = {}  # Period('M') -> AgregadosTablero; las filas sin fecha quedan en la clave None
+        self._pendientes = False  # Hay filas que todavía no entraron en las particiones
+        self.diarios = pd.DataFrame(columns=['dia', 'Categoria', *MEDIDAS_DIARIAS, 'nps_suma', 'nps_n', 'filas'])
+        self._filas = None      # Filas en orden de llegada
+        self._dias = None       # Día de cada fila (datetime64), mismo orden
+        self._orden = None      # Posiciones de las filas con fecha, ordenadas por día
+        self._dias_ordenados = None
+        self._ordenada = False  # Las filas ya llegaron ordenadas por día y todas tienen fecha
+        self._rangos = OrderedDict()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def desde_df(cls, df, anchos=None):
+        """Almacén de una tabla en memoria; las filas no se copian (el índice guarda posiciones)"""
+        return cls(anchos or AgregadosTablero.anchos_para(df)).agregar(df)
+
+    # --- Carga incremental ---
+    def agregar(self, bloque):
+        """Incorpora un bloque de ventas: agrega sus meses y días y lo suma al índice"""
+        self.anchos = self.anchos or AgregadosTablero.anchos_para(bloque)
+        dias = fecha_venta(bloque['Fecha_Venta']) if 'Fecha_Venta' in bloque.columns \
+            else pd.Series(pd.NaT, index=bloque.index, dtype='datetime64[ns]')
+        with self._lock:
+            if self.conservar_filas:
+                self._pendientes = True
+            else:
+                for mes, parte in AgregadosTablero.por_mes(bloque, self.anchos).items():
+                    self._particiones[mes] = self._particiones[mes].fusionar(parte) if mes in self._particiones else parte
+
+            nps = _numero(bloque, 'Satisfaccion_NPS')
+            diarios = pd.DataFrame({'dia': dias, 'Categoria': _texto(bloque, 'Categoria'),
+                                    **{m: _numero(bloque, col) for m, col in MEDIDAS_DIARIAS.items()},
+                                    'nps_suma': nps.where(nps > 0, 0.0), 'nps_n': (nps > 0).astype('int64'), 'filas': 1})
+            diarios = diarios[dias.notna()].groupby(['dia', 'Categoria'], dropna=False).sum().reset_index()
+            self.diarios = _sumar([self.diarios, diarios], ['dia', 'Categoria']) if len(self.diarios) else diarios
+
+            if self.conservar_filas:
+                nuevos = dias.to_numpy(dtype='datetime64[D]')
+                if self._filas is None:
+                    self._filas, self._dias = bloque, nuevos
+                else:
+                    self._filas = concatenar(self._filas, bloque)
+                    self._dias = np.concatenate([self._dias, nuevos])
+                self._orden = None  # El índice ordenado se rehace en la próxima consulta
+            self._rangos.clear()
+        return self
+
+    @property
+    def particiones(self):
+        """{Period('M') o None: AgregadosTablero}; con filas en memoria se arman en el primer uso"""
+        with self._lock:
+            if self._pendientes:
+                self._particiones = AgregadosTablero.por_mes(self._filas, self.anchos)
+                self._pendientes = False
+            return self._particiones
+
+    def _indice(self):
+        """Posiciones de las filas ordenadas por día (orden estable; las filas sin fecha no entran)"""
+        if self._orden is None:
+            con_fecha = np.flatnonzero(~np.isnat(self._dias))
+            self._orden = con_fecha[np.argsort(self._dias[con_fecha], kind='stable')]
+            self._dias_ordenados = self._dias[self._orden]
+            self._ordenada = bool(np.array_equal(self._orden, np.arange(len(self._dias))))
+        return self._orden, self._dias_ordenados
+
+    # --- Consultas por rango ---
+    def rango(self):
+        """(primer día, último día) con ventas, o (None, None) si no hay fechas"""
+        if not len(self.diarios):
+            return None, None
+        return self.diarios['dia'].min().date(), self.diarios['dia'].max().date()
+
+    def _corte(self, desde, hasta):
+        """[i, j) del índice ordenado con las filas de [desde, hasta] (búsqueda binaria)"""
+        _, dias = self._indice()
+        i = 0 if desde is None else np.searchsorted(dias, np.datetime64(_dia(desde, None).date()), 'left')
+        j = len(dias) if hasta is None else np.searchsorted(dias, np.datetime64(_dia(hasta, None).date()), 'right')
+        return i, j
+
+    def filas(self, desde=None, hasta=None):
+        """Filas con Fecha_Venta en [desde, hasta], en orden de fecha"""
+        with self._lock:
+            i, j = self._corte(desde, hasta)
+            if self._ordenada:
+                return self._filas.iloc[i:j]  # Tabla ya ordenada: corte sin copia
+            return self._filas.take(self._orden[i:j])
+
+    def rango_efectivo(self, desde, hasta):
+        """Rango que cubre realmente `agregados(desde, hasta)`: sin filas, se extiende a meses completos"""
+        if self.conservar_filas:
+            return desde, hasta
+        return pd.Period(desde, 'M').start_time.date(), pd.Period(hasta, 'M').end_time.date()
+
+    def agregados(self, desde=None, hasta=None):
+        """AgregadosTablero de las ventas en [desde, hasta]. Sin límites incluye las filas sin fecha"""
+        inicio, fin = _dia(desde, pd.Timestamp.min), _dia(hasta, pd.Timestamp.max.normalize())
+        clave = (desde is None and hasta is None, inicio, fin)
+        with self._lock:
+            if clave in self._rangos:
+                self._rangos.move_to_end(clave)
+                return self._rangos[clave]
+            if clave[0] and self.conservar_filas and self._filas is not None:
+                # Sin filtro de fechas: una pasada sobre las filas, sin armar las particiones
+                resultado = AgregadosTablero.desde_df(self._filas, anchos=self.anchos)
+            else:
+                resultado = self._combinar_rango(inicio, fin, incluir_sin_fecha=clave[0])
+            self._rangos[clave] = resultado
+            while len(self._rangos) > MAX_RANGOS:
+                self._rangos.popitem(last=False)
+            return resultado
+
+    def _combinar_rango(self, inicio, fin, incluir_sin_fecha):
+        partes, bordes = [], []
+        for mes, parte in self.particiones.items():
+            if mes is None:
+                if incluir_sin_fecha:
+                    partes.append(parte)
+            elif mes.end_time < inicio or mes.start_time > fin:
+                continue  # Partición podada
+            elif (mes.start_time >= inicio and mes.end_time.normalize() <= fin) or not self.conservar_filas:
+                partes.append(parte)
+            else:
+                bordes.append(self._corte(max(inicio, mes.start_time), min(fin, mes.end_time.normalize())))
+        if bordes:
+            # Las filas de los (a lo sumo dos) meses del borde se agregan juntas, en una sola pasada
+            posiciones = np.concatenate([self._orden[i:j] for i, j in bordes])
+            partes.append(AgregadosTablero.desde_df(self._filas.take(posiciones), anchos=self.anchos))
+        return AgregadosTablero.combinar(partes, self.anchos)
+
+    # --- Ventanas móviles ---
+    def ventanas(self, hasta=None, categorias=None, dias=VENTANAS_DIAS):
+        """Ingresos, utilidad, unidades y NPS medio (>0) de los últimos N días hasta `hasta` (inclusive), y
+        los mismos totales de los N días anteriores. Sale de las sumas acumuladas de los totales diarios"""
+        diarios = self.diarios
+        if categorias is not None:
+            diarios = diarios[diarios['Categoria'].isin(list(categorias))]
+        if not len(diarios):
+            return {}
+        por_dia = diarios.groupby('dia')[[*MEDIDAS_DIARIAS, 'nps_suma', 'nps_n', 'filas']].sum()
+        fin = _dia(hasta, por_dia.index.max())
+        inicio = min(por_dia.index.min(), fin) - pd.Timedelta(days=2 * max(dias))
+        acumulado = por_dia.reindex(pd.date_range(inicio, max(fin, por_dia.index.max())), fill_value=0).cumsum()
+
+        def total(desde_excl, hasta_incl):
+            return acumulado.loc[hasta_incl] - acumulado.loc[desde_excl]
+
+        resultado = {}
+        for n in dias:
+            actual = total(fin - pd.Timedelta(days=n), fin)
+            previo = total(fin - pd.Timedelta(days=2 * n), fin - pd.Timedelta(days=n))
+            resultado[n] = {
+                **{m: actual[m] for m in MEDIDAS_DIARIAS},
+                'nps': actual['nps_suma'] / actual['nps_n'] if actual['nps_n'] else np.nan,
+                'filas': int(actual['filas']),
+                'previo': {**{m: previo[m] for m in MEDIDAS_DIARIAS},
+                           'nps': previo['nps_suma'] / previo['nps_n'] if previo['nps_n'] else np.nan,
+                           'filas': int(previo['filas'])},
+            }
+        return resultado
+
+    # --- Persistencia (artefactos del lote) ---
+    def a_tablas(self, filas=True):
+        """Particiones (una tabla por cada tabla de los agregados, con la columna 'Particion'), totales
+        diarios y, si se conservan y `filas`, las filas ya ordenadas por fecha"""
+        tablas = {}
+        for nombre in TABLAS_AGREGADOS:
+            partes = [tabla.assign(Particion=pd.PeriodIndex([mes] * len(tabla), freq='M'))
+                      for mes, tabla in ((mes, parte.a_tablas()[nombre]) for mes, parte in self.particiones.items())]
+            tablas[f'particiones_{nombre}'] = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+        tablas['particiones'] = pd.DataFrame({'Particion': pd.PeriodIndex(list(self.particiones), freq='M'),
+                                              'filas': [p.filas for p in self.particiones.values()]})
+        tablas['diarios'] = self.diarios
+        if filas and self.conservar_filas and self._filas is not None:
+            orden, _ = self._indice()
+            tablas['filas'] = self._filas.take(orden).reset_index(drop=True)
+        return tablas
+
+    @classmethod
+    def desde_tablas(cls, tablas, anchos):
+        """Inverso de `a_tablas`. Las filas llegan ordenadas: los rangos se cortan sin copiar"""
+        almacen = cls(tuple(anchos), conservar_filas='filas' in tablas)
+        for mes, filas in zip(tablas['particiones']['Particion'], tablas['particiones']['filas']):
+            mes = None if pd.isna(mes) else mes
+            partes = {}
+            for nombre in TABLAS_AGREGADOS:
+                tabla = tablas[f'particiones_{nombre}']
+                seleccion = tabla['Particion'].isna() if mes is None else tabla['Particion'] == mes
+                partes[nombre] = tabla[seleccion.to_numpy()].drop(columns='Particion').reset_index(drop=True)
+            almacen._particiones[mes] = AgregadosTablero.desde_tablas(partes, anchos, int(filas))
+        almacen.diarios = tablas['diarios']
+        if almacen.conservar_filas:
+            almacen._filas = tablas['filas']
+            almacen._dias = fecha_venta(almacen._filas['Fecha_Venta']).to_numpy(dtype='datetime64[D]')
+        return almacen
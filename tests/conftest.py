@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+from carga import cargar_tabla  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def tablas_teams(tmp_path_factory):
+    """Las tres tablas de ejemplo del repo, cargadas como las carga el tablero"""
+    columnar = tmp_path_factory.mktemp('columnar')
+    return {nombre: cargar_tabla(str(RAIZ / archivo), columnar) for nombre, archivo in (
+        ('inv', 'inventario_central_v2.csv'), ('trans', 'transacciones_logistica_v2.csv'),
+        ('feed', 'feedback_clientes_v2.csv'))}
+
+
+@pytest.fixture(scope='session')
+def maestro(tmp_path_factory):
+    """El maestro consolidado de ejemplo (df_consolidado-4.csv) con el esquema compacto"""
+    return cargar_tabla(str(RAIZ / 'df_consolidado-4.csv'), tmp_path_factory.mktemp('columnar'))
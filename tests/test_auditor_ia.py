@@ -0,0 +1,93 @@
+import http.server
+import json
+import threading
+import time
+
+import pytest
+
+from auditor_ia import CacheRespuestas, clave_prompt, diagnosticar, obtener_cliente
+
+
+class ServidorFalso(http.server.BaseHTTPRequestHandler):
+    """Completions de Groq en streaming (SSE). Cada POST consume el siguiente guion de `self.server.guiones`:
+    un código de error, o una lista de tokens (un número en la lista es una pausa en segundos)"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.llamadas += 1
+        guion = self.server.guiones.pop(0)
+        if isinstance(guion, int):
+            self.send_response(guion)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'{}')
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for paso in guion:
+                if isinstance(paso, (int, float)):
+                    time.sleep(paso)
+                    continue
+                chunk = {'id': 'x', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'm',
+                         'choices': [{'index': 0, 'delta': {'content': paso}, 'finish_reason': None}]}
+                self._escribir(f"data: {json.dumps(chunk)}\n\n")
+            self._escribir("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # El cliente cortó por el límite de tiempo
+
+    def _escribir(self, texto):
+        datos = texto.encode()
+        self.wfile.write(f"{len(datos):x}\r\n".encode() + datos + b"\r\n")
+        self.wfile.flush()
+
+
+@pytest.fixture
+def servidor():
+    srv = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ServidorFalso)
+    srv.daemon_threads = True
+    srv.guiones, srv.llamadas = [], 0
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    srv.cliente = obtener_cliente('clave-de-prueba', f'http://127.0.0.1:{srv.server_port}')
+    yield srv
+    srv.shutdown()
+
+
+def test_reintenta_errores_transitorios_y_cachea(servidor):
+    servidor.guiones = [503, ['**Fuga** ', 'de capital']]
+    cache = CacheRespuestas()
+    textos = list(diagnosticar(servidor.cliente, 'prompt', cache=cache, backoff=0.01))
+    assert textos[-1] == '**Fuga** de capital'
+    assert servidor.llamadas == 2
+
+    # Mismo prompt: sale de la cache de una vez, sin llamar al servidor
+    assert list(diagnosticar(servidor.cliente, 'prompt', cache=cache)) == ['**Fuga** de capital']
+    assert servidor.llamadas == 2
+
+
+def test_limite_de_tiempo_con_el_stream_detenido(servidor):
+    servidor.guiones = [['Primer token', 5]]
+    cache = CacheRespuestas()
+    inicio = time.monotonic()
+    with pytest.raises(TimeoutError):
+        for _ in diagnosticar(servidor.cliente, 'prompt', cache=cache, timeout=0.5):
+            pass
+    assert time.monotonic() - inicio < 1.5
+    assert cache.obtener(clave_prompt('prompt')) is None
+
+
+def test_respuesta_vacia_no_se_cachea(servidor):
+    servidor.guiones = [[], ['Ahora sí']]
+    cache = CacheRespuestas()
+    assert list(diagnosticar(servidor.cliente, 'prompt', cache=cache)) == []
+    assert cache.obtener(clave_prompt('prompt')) is None
+    assert list(diagnosticar(servidor.cliente, 'prompt', cache=cache)) == ['Ahora sí']
+    assert servidor.llamadas == 2
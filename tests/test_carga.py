@@ -0,0 +1,40 @@
+import time
+
+from carga import cargar_tabla, huella_fuente, podar_cache
+
+
+def _csv(directorio, nombre, filas):
+    ruta = directorio / f'{nombre}.csv'
+    ruta.write_text('Transaccion_ID,Precio_Venta_Final\n' + ''.join(f'TRX-{i},{i}.5\n' for i in range(filas)))
+    return ruta
+
+
+def test_poda_los_archivos_usados_hace_mas_tiempo(tmp_path):
+    cache = tmp_path / 'columnar'
+    fuentes = [_csv(tmp_path, nombre, 2000) for nombre in ('a', 'b', 'c')]
+    cargar_tabla(str(fuentes[0]), cache)
+    tamano = sum(r.stat().st_size for r in cache.glob('*.arrow'))
+    tope = int(tamano * 2.5)  # Caben dos archivos
+
+    time.sleep(0.01)
+    cargar_tabla(str(fuentes[1]), cache, tope)
+    time.sleep(0.01)
+    primero = cargar_tabla(str(fuentes[0]), cache, tope)  # Lectura desde la cache: 'a' pasa a ser el más reciente
+    time.sleep(0.01)
+    cargar_tabla(str(fuentes[2]), cache, tope)
+
+    presentes = {r.name for r in cache.glob('*.arrow')}
+    assert presentes == {f'{huella_fuente(str(f))}.arrow' for f in (fuentes[0], fuentes[2])}
+    assert sum(r.stat().st_size for r in cache.glob('*.arrow')) <= tope
+    # 'b' fue el desalojado; 'a' se vuelve a leer de la cache sin escribir nada nuevo
+    assert len(primero) == 2000
+    cargar_tabla(str(fuentes[0]), cache, tope)
+    assert {r.name for r in cache.glob('*.arrow')} == presentes
+
+
+def test_el_archivo_recien_escrito_no_se_poda(tmp_path):
+    cache = tmp_path / 'columnar'
+    df = cargar_tabla(str(_csv(tmp_path, 'grande', 5000)), cache, max_bytes=1)
+    assert len(df) == 5000
+    assert len(list(cache.glob('*.arrow'))) == 1
+    assert podar_cache(cache, max_bytes=0) == 0
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cubo import CuboMetricas, mes_venta
+from sketches import SketchCuantiles
+
+
+def _filtrar(df, filtros):
+    mascara = np.ones(len(df), dtype=bool)
+    for dim, seleccion in filtros.items():
+        columna = mes_venta(df['Fecha_Venta']) if dim == 'Mes' else df[dim].astype(object)
+        mascara &= columna.isin(seleccion).to_numpy()
+    return df[mascara]
+
+
+@pytest.mark.parametrize('filtros', [
+    {},
+    {'Categoria': ['Smartphone', 'Laptop']},
+    {'Ciudad_Destino': ['Bogotá', 'Medellín'], 'Canal_Venta': ['Online']},
+    {'Mes': [pd.Period('2025-03', 'M')], 'Categoria': ['Accesorio']},
+])
+def test_consulta_igual_a_groupby(maestro, filtros):
+    cubo = CuboMetricas.desde_df(maestro)
+    kpis = cubo.consultar(**filtros)
+    filas = _filtrar(maestro, filtros)
+    assert len(filas) and kpis['filas'] == len(filas)
+    assert np.isclose(kpis['ingresos'], filas['Precio_Venta_Final'].sum())
+    assert np.isclose(kpis['utilidad'], filas['Utilidad_Total'].sum())
+    assert kpis['unidades'] == filas['Cantidad_Vendida'].sum()
+    nps = filas['Satisfaccion_NPS']
+    assert np.isclose(kpis['nps_mediana'], nps[nps > 0].astype('float64').round(1).median())
+
+    por_categoria = filas.groupby(filas['Categoria'].astype(object))['Utilidad_Total'].sum()
+    pd.testing.assert_series_equal(kpis['utilidad_por_categoria'].sort_index(), por_categoria.sort_index(),
+                                   check_names=False, check_index_type=False)
+
+
+def test_fusionar_bloques_igual_al_total(maestro):
+    mitad = len(maestro) // 2
+    cubo = CuboMetricas.desde_df(maestro.iloc[:mitad]).fusionar(CuboMetricas.desde_df(maestro.iloc[mitad:]))
+    total = CuboMetricas.desde_df(maestro)
+    a, b = cubo.consultar(), total.consultar()
+    assert a['filas'] == b['filas'] and np.isclose(a['ingresos'], b['ingresos'])
+    assert a['nps_mediana'] == b['nps_mediana']
+    assert cubo.celdas == total.celdas
+
+
+@pytest.mark.parametrize('q', [0.1, 0.25, 0.5, 0.9])
+def test_sketch_cuantiles_igual_a_pandas(maestro, q):
+    nps = maestro['Satisfaccion_NPS'].astype('float64').round(1).dropna()
+    mitad = len(nps) // 2
+    sketch = SketchCuantiles().agregar(nps.iloc[:mitad]).fusionar(SketchCuantiles().agregar(nps.iloc[mitad:]))
+    assert len(sketch) == len(nps)
+    assert np.isclose(sketch.cuantil(q), nps.quantile(q))
+    assert np.isclose(SketchCuantiles.desde_dict(sketch.a_dict()).cuantil(q), nps.quantile(q))
@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from carga import escribir_columnar, leer_columnar
+from conftest import RAIZ
+from esquemas import aplicar_esquema, id_a_entero
+from uniones import claves_enteras, unir
+
+
+@pytest.mark.parametrize('archivo, tabla', [('inventario_central_v2.csv', 'inventario'),
+                                            ('transacciones_logistica_v2.csv', 'transacciones'),
+                                            ('feedback_clientes_v2.csv', 'feedback'),
+                                            ('df_consolidado-4.csv', 'consolidado')])
+def test_esquema_sobrevive_al_archivo_columnar(archivo, tabla, tmp_path):
+    original = pd.read_csv(RAIZ / archivo)
+    df, reporte = aplicar_esquema(original.copy())
+    assert reporte['tabla'] == tabla and reporte['despues'] < reporte['antes']
+
+    escribir_columnar(df, tmp_path / 'tabla.arrow')
+    leida = leer_columnar(tmp_path / 'tabla.arrow')
+    assert leida.dtypes.to_dict() == df.dtypes.to_dict()
+    pd.testing.assert_frame_equal(leida, df)
+
+    # Las claves enteras vuelven a dar el texto original
+    for col, prefijo in (('SKU_ID', 'PROD-'), ('Transaccion_ID', 'TRX-')):
+        if col in original.columns:
+            assert pd.api.types.is_integer_dtype(leida[col])
+            assert (prefijo + leida[col].astype(str)).tolist() == original[col].tolist()
+
+
+def test_ids_no_canonicos_quedan_como_texto():
+    canonicos = id_a_entero(pd.Series(['PROD-1', 'PROD-1000', 'No Encuestado']), 'PROD-')
+    assert canonicos.dtype == 'Int32' and canonicos.tolist()[:2] == [1, 1000] and canonicos.isna().iloc[2]
+
+    mezclados = id_a_entero(pd.Series(['PROD-01', 'PROD-1', 'PROD-2']), 'PROD-')
+    assert isinstance(mezclados.dtype, pd.CategoricalDtype)
+    assert mezclados.tolist() == ['PROD-01', 'PROD-1', 'PROD-2']
+    assert claves_enteras(mezclados, 'SKU_ID').tolist() == [-1, 1, 2]
+
+
+def test_union_no_fusiona_ids_con_ceros():
+    inventario = pd.DataFrame({'SKU_ID': pd.Series(['PROD-1', 'PROD-2']), 'Categoria': ['a', 'b']})
+    ventas = pd.DataFrame({'SKU_ID': aplicar_esquema(pd.DataFrame({'SKU_ID': ['PROD-01', 'PROD-2']}),
+                                                     'transacciones')[0]['SKU_ID']})
+    unida, reporte = unir(ventas, inventario, 'SKU_ID', validar='m:1')
+    assert unida['Categoria'].isna().tolist() == [True, False]
+    assert reporte['sin_pareja'] == 1
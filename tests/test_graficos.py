@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+import graficos
+
+
+def test_dispersion_pasa_a_densidad_sobre_el_umbral(maestro):
+    chica = graficos.dispersion(maestro, 'Stock_Actual', 'Utilidad_Total', umbral=len(maestro))
+    assert chica.data[0].type == 'scattergl'
+
+    grande = graficos.dispersion(maestro, 'Stock_Actual', 'Utilidad_Total', umbral=100, bins=40)
+    z = np.nan_to_num(np.asarray(grande.data[0].z, dtype=float))
+    assert grande.data[0].type == 'heatmap' and z.shape == (40, 40)
+    assert z.sum() == maestro[['Stock_Actual', 'Utilidad_Total']].dropna().shape[0]
+
+    # El payload no crece con las filas
+    doble = pd.concat([maestro, maestro], ignore_index=True)
+    assert len(graficos.dispersion(doble, 'Stock_Actual', 'Utilidad_Total', umbral=100, bins=40).to_json()) < \
+        1.1 * len(grande.to_json())
+
+
+def test_estadisticas_caja_igual_a_por_grupo(maestro):
+    df = maestro[['Ciudad_Destino', 'Satisfaccion_NPS']].astype({'Satisfaccion_NPS': 'float64'})
+    stats = graficos.estadisticas_caja(df, 'Ciudad_Destino', 'Satisfaccion_NPS')
+    for ciudad, valores in df.dropna().groupby('Ciudad_Destino', observed=True)['Satisfaccion_NPS']:
+        q1, mediana, q3 = np.quantile(valores, [0.25, 0.5, 0.75])
+        fila = stats.loc[ciudad]
+        assert np.allclose([fila['q1'], fila['mediana'], fila['q3']], [q1, mediana, q3])
+        dentro = valores[(valores >= q1 - 1.5 * (q3 - q1)) & (valores <= q3 + 1.5 * (q3 - q1))]
+        assert fila['bigote_inf'] == dentro.min() and fila['bigote_sup'] == dentro.max()
+        assert fila['n'] == len(valores)
+
+    fig = graficos.caja(df, 'Ciudad_Destino', 'Satisfaccion_NPS', umbral=100)
+    assert fig.data[0].boxpoints is False and len(fig.data[0].q1) == len(stats)
+
+
+def test_torta_solo_envia_conteos(maestro):
+    fig = graficos.torta(maestro, 'Estado_Envio')
+    conteos = maestro['Estado_Envio'].value_counts()
+    assert sorted(fig.data[0].values) == sorted(conteos.tolist())
+    assert len(fig.data[0].values) == len(conteos) < len(maestro)
@@ -0,0 +1,72 @@
+import pipeline
+from incremental import MODO_COMPLETO, MODO_INCREMENTAL, MODO_SIN_CAMBIOS, RefrescoIncremental
+
+
+def _refrescar(refresco, inv, trans, feed):
+    resultado = refresco.obtener(inv, trans, feed)
+    return resultado['refresco']['modo'], resultado['metricas']
+
+
+def test_fila_editada_en_su_lugar_reconstruye_todo(tablas_teams, tmp_path):
+    inv, trans, feed = tablas_teams['inv'], tablas_teams['trans'], tablas_teams['feed']
+    refresco = RefrescoIncremental(tmp_path)
+    assert _refrescar(refresco, inv, trans, feed)[0] == MODO_COMPLETO
+    assert _refrescar(refresco, inv, trans, feed)[0] == MODO_SIN_CAMBIOS
+
+    # Misma cantidad de filas y ningún ID nuevo: solo cambia un precio ya procesado
+    editada = trans.copy()
+    editada.loc[0, 'Precio_Venta_Final'] = 1e9
+    modo, metricas = _refrescar(refresco, inv, editada, feed)
+    esperado = pipeline.ejecutar_pipeline(inv, editada, feed)['metricas']
+    assert modo == MODO_COMPLETO
+    assert metricas['utilidad_con_fantasmas'] == esperado['utilidad_con_fantasmas']
+
+    # El estado persistido ya corresponde a la tabla editada
+    modo, metricas = _refrescar(RefrescoIncremental(tmp_path), inv, editada, feed)
+    assert modo == MODO_SIN_CAMBIOS
+    assert metricas['utilidad_con_fantasmas'] == esperado['utilidad_con_fantasmas']
+
+
+def test_filas_agregadas_al_final_son_incrementales(tablas_teams, tmp_path):
+    inv, trans, feed = tablas_teams['inv'], tablas_teams['trans'], tablas_teams['feed']
+    refresco = RefrescoIncremental(tmp_path)
+    _refrescar(refresco, inv, trans.iloc[:-500], feed)
+    modo, _ = _refrescar(refresco, inv, trans, feed)
+    assert modo == MODO_INCREMENTAL
+
+
+def test_agregados_solo_con_agregados(tablas_teams, tmp_path):
+    inv, trans, feed = tablas_teams['inv'], tablas_teams['trans'], tablas_teams['feed']
+    assert RefrescoIncremental(tmp_path / 'tablero').obtener(inv, trans, feed)['agregados'] is None
+
+    refresco = RefrescoIncremental(tmp_path / 'lote', con_agregados=True)
+    refresco.obtener(inv, trans.iloc[:-500], feed)
+    resultado = refresco.obtener(inv, trans, feed)
+    completo = RefrescoIncremental(tmp_path / 'completo', con_agregados=True).obtener(inv, trans, feed)
+    assert resultado['agregados'].filas == completo['agregados'].filas == len(resultado['df_full'])
+
+
+def test_cache_pipeline_por_version_no_recalcula(tablas_teams, tmp_path):
+    inv, trans, feed = tablas_teams['inv'], tablas_teams['trans'], tablas_teams['feed']
+    refresco = RefrescoIncremental(tmp_path)
+    llamadas = []
+
+    def calcular(*tablas):
+        llamadas.append(1)
+        return refresco.obtener(*tablas)
+
+    cache = pipeline.CachePipeline(max_entradas=2)
+    primero = cache.obtener(inv, trans, feed, clave=('v1',), calcular=calcular)
+    assert cache.obtener(inv, trans, feed, clave=('v1',), calcular=calcular) is primero
+    assert len(llamadas) == 1
+
+    # Versiones nuevas desalojan la menos usada
+    cache.obtener(inv, trans.iloc[:-500], feed, clave=('v2',), calcular=calcular)
+    cache.obtener(inv, trans, feed, clave=('v3',), calcular=calcular)
+    assert len(cache) == 2 and len(llamadas) == 3
+    cache.obtener(inv, trans, feed, clave=('v1',), calcular=calcular)
+    assert len(llamadas) == 4
+
+    # Sin clave se indexa por la huella del contenido
+    sin_clave = pipeline.CachePipeline()
+    assert sin_clave.obtener(inv, trans, feed) is sin_clave.obtener(inv, trans.copy(), feed)
@@ -0,0 +1,52 @@
+import json
+import threading
+
+import pipeline
+from instrumentacion import Traza, activa, activar, anotar, etapa, trazar
+
+
+def test_etapas_anidadas_y_exportadas(tmp_path):
+    with trazar('prueba') as traza:
+        assert activa()
+        with etapa('carga', 100) as info:
+            with etapa('parseo'):
+                anotar(columnas=3)
+            info['filas_salida'] = 90
+    assert not activa()
+
+    padre, hijo = traza.a_dict()['etapas']
+    assert (padre['nombre'], padre['nivel'], padre['filas_entrada'], padre['filas_salida']) == ('carga', 0, 100, 90)
+    assert (hijo['nombre'], hijo['nivel'], hijo['padre'], hijo['columnas']) == ('parseo', 1, 'carga', 3)
+    assert padre['segundos'] >= hijo['segundos'] >= 0
+    assert traza.tabla()['etapa'].tolist() == ['carga', '  parseo']
+
+    ruta_json, ruta_eventos = traza.exportar(tmp_path)
+    assert json.loads(ruta_json.read_text())['nombre'] == 'prueba'
+    eventos = json.loads(ruta_eventos.read_text())['traceEvents']
+    assert [e['name'] for e in eventos] == ['carga', 'parseo'] and eventos[1]['args']['columnas'] == 3
+
+
+def test_sin_traza_no_mide():
+    activar(None)
+    with etapa('nada', 10) as info:
+        anotar(ignorado=True)
+    assert info == {}
+
+
+def test_traza_por_hilo():
+    """Cada sesión (hilo) ve solo su propia traza"""
+    traza = activar(Traza('sesion'))
+    otras = []
+    hilo = threading.Thread(target=lambda: otras.append(activa()))
+    hilo.start()
+    hilo.join()
+    assert otras == [False]
+    activar(None)
+    assert traza.etapas == []
+
+
+def test_pipeline_registra_sus_etapas(tablas_teams):
+    with trazar() as traza:
+        pipeline.ejecutar_pipeline(tablas_teams['inv'], tablas_teams['trans'], tablas_teams['feed'])
+    nombres = {e['nombre'] for e in traza.etapas}
+    assert {'limpieza_inventario', 'limpieza_transacciones', 'limpieza_feedback', 'consolidacion'} <= nombres
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from integridad import RelacionIntegridad, auditar
+
+
+def test_fantasmas_igual_a_isin(tablas_teams):
+    inv, trans, feed = tablas_teams['inv'], tablas_teams['trans'], tablas_teams['feed']
+    auditoria = auditar(inv, trans, feed)
+
+    fantasmas = trans[~trans['SKU_ID'].isin(inv['SKU_ID'].dropna())]
+    skus = auditoria['skus']
+    assert np.array_equal(skus.posiciones, np.flatnonzero(~trans['SKU_ID'].isin(inv['SKU_ID'].dropna())))
+    resumen = skus.resumen()
+    assert resumen['filas_huerfanas'] == len(fantasmas) > 0
+    assert resumen['claves_huerfanas'] == fantasmas['SKU_ID'].nunique()
+    assert resumen['hechos_huerfanos'] == fantasmas['Transaccion_ID'].nunique()
+    assert np.isclose(resumen['ingresos_huerfanos'], fantasmas['Precio_Venta_Final'].sum())
+
+    reporte = skus.reporte()
+    por_sku = fantasmas.groupby('SKU_ID', dropna=False)['Precio_Venta_Final'].agg(['size', 'sum'])
+    assert reporte['filas'].sum() == len(fantasmas)
+    assert reporte.set_index('SKU_ID')['filas'].sort_index().tolist() == por_sku['size'].sort_index().tolist()
+
+    sin_feedback = ~trans['Transaccion_ID'].isin(feed['Transaccion_ID'].dropna())
+    assert auditoria['feedback'].resumen()['filas_huerfanas'] == int(sin_feedback.sum())
+
+
+def test_por_lotes_y_dimension_que_crece():
+    dimension = pd.Series([1, 2, 3])
+    hechos = pd.DataFrame({'SKU_ID': [1, 4, 5, 4, 2, 9], 'Precio_Venta_Final': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]})
+    relacion = RelacionIntegridad('SKU_ID', dimension).agregar(hechos.iloc[:3]).agregar(hechos.iloc[3:])
+    assert relacion.posiciones.tolist() == [1, 2, 3, 5]
+    assert relacion.resumen()['ingresos_huerfanos'] == 15.0
+
+    # Llega el SKU 4 al inventario: sus filas dejan de ser huérfanas sin releer los hechos
+    relacion.agregar_dimension([4])
+    assert relacion.posiciones.tolist() == [2, 5]
+    assert relacion.resumen() == {'filas_huerfanas': 2, 'claves_huerfanas': 2, 'hechos_huerfanos': 2,
+                                  'ingresos_huerfanos': 9.0}
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+import numpy as np
+
+import pipeline
+from conftest import RAIZ
+from incremental import MODO_SIN_CAMBIOS
+from lote import leer_artefactos, leer_tabla, version_actual
+
+ARGUMENTOS = ['--ventas', 'inventario_central_v2.csv', '--inventario', 'transacciones_logistica_v2.csv',
+              '--logistica', 'feedback_clientes_v2.csv', '--maestro', 'df_consolidado-4.csv', '--sin-diagnostico']
+
+
+def _correr(salida):
+    return subprocess.run([sys.executable, '-m', 'lote', '--salida', str(salida), *ARGUMENTOS],
+                          cwd=RAIZ, capture_output=True, text=True, check=True, timeout=300)
+
+
+def test_cli_publica_y_el_tablero_lee_la_version(tmp_path, tablas_teams, maestro):
+    salida = tmp_path / 'artefactos'
+    assert version_actual(salida) is None
+    corrida = _correr(salida)
+    version = version_actual(salida)
+    assert version and f"Artefactos {version} publicados" in corrida.stdout
+
+    artefactos = leer_artefactos(directorio=salida)
+    assert artefactos['version'] == version and artefactos['diagnostico'] is None
+    esperado = pipeline.ejecutar_pipeline(tablas_teams['inv'], tablas_teams['trans'], tablas_teams['feed'])
+    for clave in ('filas_full', 'filas_full_limpias', 'utilidad_con_fantasmas'):
+        assert np.isclose(artefactos['metricas'][clave], esperado['metricas'][clave])
+    assert len(leer_tabla('consolidado', directorio=salida)) == len(esperado['df_full'])
+
+    # Los KPIs del tablero salen del maestro, igual que al subirlo
+    assert artefactos['agregados'].filas == len(maestro)
+    assert np.isclose(artefactos['agregados'].cubo.consultar()['ingresos'], maestro['Precio_Venta_Final'].sum())
+    assert artefactos['temporal'].rango() is not None
+
+    # Una segunda corrida sin cambios publica otra versión y mueve el puntero
+    _correr(salida)
+    nueva = version_actual(salida)
+    assert nueva != version and leer_artefactos(directorio=salida)['manifiesto']['refresco']['modo'] == MODO_SIN_CAMBIOS
+    assert leer_artefactos(version, directorio=salida)['version'] == version
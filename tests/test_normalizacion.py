@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import RAIZ
+from normalizacion import normalizar_con_conteo, normalizar_por_valor, rellenar
+from pipeline import MAPA_CATEGORIAS, RUIDO_COMENTARIOS, limpiar_comentario, normalizar_categoria, simplificar_lead_time
+
+
+@pytest.fixture(scope='module')
+def crudos():
+    inv = pd.read_csv(RAIZ / 'inventario_central_v2.csv', usecols=['Categoria', 'Lead_Time_Dias', 'Bodega_Origen'])
+    feed = pd.read_csv(RAIZ / 'feedback_clientes_v2.csv', usecols=['Comentario_Texto'])
+    return pd.concat([inv, feed], axis=1)
+
+
+@pytest.mark.parametrize('categorica', [False, True])
+def test_por_valor_igual_a_por_fila(crudos, categorica):
+    df = crudos.astype('category') if categorica else crudos
+
+    lead = normalizar_por_valor(df['Lead_Time_Dias'], simplificar_lead_time)
+    pd.testing.assert_series_equal(lead, crudos['Lead_Time_Dias'].apply(simplificar_lead_time).astype(float))
+
+    categoria = crudos['Categoria']
+    for patron, reemplazo in MAPA_CATEGORIAS.items():
+        categoria = categoria.str.replace(patron, reemplazo, regex=True)
+    assert normalizar_por_valor(df['Categoria'], normalizar_categoria).astype(object).equals(categoria.astype(object))
+
+    comentario = crudos['Comentario_Texto'].astype(str).str.lower().str.strip()
+    comentario = comentario.replace(RUIDO_COMENTARIOS, 'sin comentario').fillna('sin comentario')
+    resultado = normalizar_por_valor(df['Comentario_Texto'], limpiar_comentario, incluir_nulos=True)
+    assert resultado.astype(object).tolist() == comentario.tolist()
+
+
+def test_conteo_de_cambios(crudos):
+    funcion = lambda v: str(v).strip().capitalize()  # noqa: E731
+    resultado, cambios = normalizar_con_conteo(crudos['Bodega_Origen'], funcion, incluir_nulos=True)
+    por_fila = crudos['Bodega_Origen'].map(funcion, na_action=None)
+    assert resultado.astype(object).tolist() == por_fila.tolist()
+    assert cambios == int((crudos['Bodega_Origen'].astype(object) != por_fila).sum())
+
+
+def test_rellenar_categorica():
+    serie = pd.Series(['a', np.nan, 'b'], dtype='category')
+    assert rellenar(serie, 'z').tolist() == ['a', 'z', 'b']
+    assert rellenar(serie.astype(object), 'z').tolist() == ['a', 'z', 'b']
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+from reglas import ErrorRegla, compilar_reglas
+
+
+# Filtros escritos a mano que reemplazó el motor de reglas (misma semántica, sin instrumentación)
+def _inventario_a_mano(df_inv):
+    cond_categoria = df_inv['Categoria'] == '???'
+    cond_stock = df_inv['Stock_Actual'].isna() | (pd.to_numeric(df_inv['Stock_Actual'], errors='coerce') <= 0)
+    cond_lead_time = df_inv['Lead_Time_Dias'].isna()
+    keep1 = ~(cond_categoria & cond_stock & cond_lead_time)
+    keep2 = keep1 & ~(cond_categoria & cond_lead_time)
+    keep3 = keep2 & ~(cond_categoria & cond_stock)
+    metricas = {f'p{i}': keep.sum() / len(df_inv) * 100 for i, keep in enumerate((keep1, keep2, keep3), start=1)}
+
+    df_inv = df_inv[keep3].copy()
+    df_inv['Lead_Time_Dias'] = df_inv['Lead_Time_Dias'].astype(object).apply(pipeline.simplificar_lead_time).astype(float)
+    df_inv['Lead_Time_Dias'] = df_inv['Lead_Time_Dias'].fillna(df_inv['Lead_Time_Dias'].median())
+    df_inv['Bodega_Origen'] = df_inv['Bodega_Origen'].astype(object).astype(str).str.strip().str.capitalize()
+    categoria = df_inv['Categoria'].astype(object)
+    for patron, reemplazo in pipeline.MAPA_CATEGORIAS.items():
+        categoria = categoria.str.replace(patron, reemplazo, regex=True)
+    df_inv['Categoria'] = categoria
+    return df_inv, metricas
+
+
+def _transacciones_a_mano(df_trans):
+    df_trans = df_trans.copy()
+    df_trans['Estado_Envio'] = df_trans['Estado_Envio'].astype(object).fillna('No especificado')
+    df_trans['Ciudad_Destino'] = df_trans['Ciudad_Destino'].astype(object).replace(pipeline.MAPEO_CIUDADES)
+    df_trans['Costo_Envio'] = df_trans['Costo_Envio'].fillna(df_trans['Costo_Envio'].median())
+    df_trans['Cantidad_Vendida'] = df_trans['Cantidad_Vendida'].clip(lower=0)
+    tiempo = df_trans['Tiempo_Entrega_Real'].astype('float64').replace(999, np.nan)
+    df_trans['Tiempo_Entrega_Real'] = tiempo.fillna(tiempo.median())
+    return df_trans
+
+
+def _feedback_a_mano(df_feed):
+    df_feed = df_feed.copy()
+    comentario = df_feed['Comentario_Texto'].astype(object).astype(str).str.lower().str.strip()
+    df_feed['Comentario_Texto'] = comentario.replace(pipeline.RUIDO_COMENTARIOS, 'sin comentario').fillna('sin comentario')
+    recomienda = df_feed['Recomienda_Marca'].astype(object).replace(dict.fromkeys(['nan', 'n/a', 'None', 'N/A'], np.nan))
+    df_feed['Recomienda_Marca'] = recomienda.fillna('SIN RESPUESTA')
+    df_feed = df_feed[df_feed['Rating_Producto'].between(1, 5)].copy()
+    mediana_rating = df_feed['Rating_Producto'].median()
+    rating_fuera = ~df_feed['Rating_Producto'].between(1, 5)
+    edad_fuera = ~df_feed['Edad_Cliente'].between(0, 100)
+    df_feed = df_feed[~(rating_fuera & edad_fuera)].copy()
+    df_feed.loc[rating_fuera & ~edad_fuera, 'Rating_Producto'] = mediana_rating
+    return df_feed
+
+
+def _igual(motor, a_mano):
+    assert motor.index.equals(a_mano.index)
+    for col in a_mano.columns:
+        izquierda, derecha = motor[col].astype(object), a_mano[col].astype(object)
+        assert izquierda.isna().equals(derecha.isna()), col
+        assert (izquierda[izquierda.notna()] == derecha[derecha.notna()]).all(), col
+
+
+def test_inventario_igual_a_los_filtros_a_mano(tablas_teams):
+    limpio, metricas = pipeline.limpiar_inventario(tablas_teams['inv'])
+    esperado, metricas_a_mano = _inventario_a_mano(tablas_teams['inv'])
+    _igual(limpio, esperado)
+    for clave, valor in metricas_a_mano.items():
+        assert np.isclose(metricas[clave], valor)
+    assert metricas['p3'] < 100
+
+
+def test_transacciones_y_feedback_igual_a_los_filtros_a_mano(tablas_teams):
+    limpio, _ = pipeline.limpiar_transacciones(tablas_teams['trans'])
+    _igual(limpio, _transacciones_a_mano(tablas_teams['trans']))
+    limpio, conteos = pipeline.limpiar_feedback(tablas_teams['feed'])
+    esperado = _feedback_a_mano(tablas_teams['feed'])
+    _igual(limpio, esperado)
+    assert conteos['reglas_feedback']['rating_fuera_de_rango'] == len(tablas_teams['feed']) - len(esperado) > 0
+
+
+def test_especificacion_invalida():
+    with pytest.raises(ErrorRegla):
+        compilar_reglas([{'nombre': 'x', 'accion': 'borrar', 'columna': 'a'}])
+    with pytest.raises(ErrorRegla):
+        compilar_reglas([{'nombre': 'x', 'accion': 'eliminar', 'si': ['no_existe']}], {})
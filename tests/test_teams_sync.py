@@ -0,0 +1,91 @@
+import http.server
+import threading
+
+import pytest
+import requests
+
+from teams_sync import DESCARGADO, ESPEJO_OFFLINE, SIN_CAMBIOS, crear_sesion, descargar_condicional
+
+CSV = b"Transaccion_ID,Precio_Venta_Final\nTRX-1,10.5\nTRX-2,20.0\n"
+
+
+class TeamsFalso(http.server.BaseHTTPRequestHandler):
+    """Sirve CSV con ETag y 304 condicional; `self.server.modo` fuerza un 404 o un corte a mitad del cuerpo"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.pedidos += 1
+        etag = f'"v{self.server.version}"'
+        if self.server.modo == '404':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+        else:
+            cuerpo = CSV * self.server.version
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo[:10] if self.server.modo == 'cortar' else cuerpo)
+            if self.server.modo == 'cortar':
+                self.close_connection = True
+
+
+@pytest.fixture
+def teams():
+    srv = http.server.ThreadingHTTPServer(('127.0.0.1', 0), TeamsFalso)
+    srv.daemon_threads = True
+    srv.modo, srv.version, srv.pedidos = 'ok', 1, 0
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    srv.url = f'http://127.0.0.1:{srv.server_port}/ventas.csv'
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _descargar(teams, directorio):
+    return descargar_condicional(teams.url, directorio, sesion=crear_sesion(reintentos=0))
+
+
+def test_200_y_304(teams, tmp_path):
+    primera = _descargar(teams, tmp_path)
+    assert primera['estado'] == DESCARGADO and primera['ruta'].read_bytes() == CSV
+
+    segunda = _descargar(teams, tmp_path)
+    assert segunda['estado'] == SIN_CAMBIOS and segunda['version'] == primera['version']
+
+    teams.version = 2
+    tercera = _descargar(teams, tmp_path)
+    assert tercera['estado'] == DESCARGADO and tercera['version'] != primera['version']
+    assert tercera['ruta'].read_bytes() == CSV * 2
+
+
+def test_sin_conexion_sirve_el_espejo(teams, tmp_path):
+    primera = _descargar(teams, tmp_path)
+    teams.shutdown()
+    teams.server_close()
+    offline = _descargar(teams, tmp_path)
+    assert offline['estado'] == ESPEJO_OFFLINE and offline['version'] == primera['version']
+
+
+def test_corte_a_mitad_del_cuerpo_sirve_el_espejo(teams, tmp_path):
+    primera = _descargar(teams, tmp_path)
+    teams.modo, teams.version = 'cortar', 2
+    cortada = _descargar(teams, tmp_path)
+    assert cortada['estado'] == ESPEJO_OFFLINE and cortada['version'] == primera['version']
+    assert cortada['ruta'].read_bytes() == CSV  # El espejo no quedó a medias
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_404_es_un_error(teams, tmp_path):
+    _descargar(teams, tmp_path)
+    teams.modo = '404'
+    with pytest.raises(requests.HTTPError):
+        _descargar(teams, tmp_path)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregados import AgregadosTablero
+from conftest import RAIZ
+from cubo import fecha_venta
+from ingesta_streaming import particionar_en_bloques
+from temporal import AlmacenTemporal
+
+
+def _igual(a, b):
+    categorias = b.cubo.valores('Categoria')
+    ka, kb = a.cubo.consultar(Categoria=categorias), b.cubo.consultar(Categoria=categorias)
+    return (a.filas == b.filas and np.isclose(ka['ingresos'], kb['ingresos'])
+            and np.isclose(ka['utilidad'], kb['utilidad']) and ka['nps_mediana'] == kb['nps_mediana']
+            and a.conteo_estados(categorias).sort_index().equals(b.conteo_estados(categorias).sort_index()))
+
+
+def _entre(df, desde, hasta):
+    dias = fecha_venta(df['Fecha_Venta'])
+    return df[((dias >= pd.Timestamp(desde)) & (dias <= pd.Timestamp(hasta))).to_numpy()]
+
+
+@pytest.mark.parametrize('desde, hasta', [('2025-03-10', '2025-06-20'), ('2025-01-01', '2025-01-31'),
+                                          ('2024-12-15', '2024-12-15')])
+def test_rango_igual_a_filtrar_las_filas(maestro, desde, hasta):
+    almacen = AlmacenTemporal.desde_df(maestro)
+    assert _igual(almacen.agregados(), AgregadosTablero.desde_df(maestro, almacen.anchos))
+    directo = _entre(maestro, desde, hasta)
+    assert _igual(almacen.agregados(desde, hasta), AgregadosTablero.desde_df(directo, almacen.anchos))
+    assert len(almacen.filas(desde, hasta)) == len(directo)
+
+
+def test_sin_filas_los_rangos_son_meses_completos(maestro):
+    almacen = AlmacenTemporal(AgregadosTablero.anchos_para(maestro), conservar_filas=False)
+    for bloque in np.array_split(np.arange(len(maestro)), 3):
+        almacen.agregar(maestro.iloc[bloque])
+    assert _igual(almacen.agregados(), AgregadosTablero.desde_df(maestro, almacen.anchos))
+    desde, hasta = almacen.rango_efectivo(pd.Timestamp('2025-03-10').date(), pd.Timestamp('2025-06-20').date())
+    assert (str(desde), str(hasta)) == ('2025-03-01', '2025-06-30')
+    directo = _entre(maestro, desde, hasta)
+    assert _igual(almacen.agregados('2025-03-10', '2025-06-20'), AgregadosTablero.desde_df(directo, almacen.anchos))
+
+
+def test_ventanas_moviles(maestro):
+    almacen = AlmacenTemporal.desde_df(maestro)
+    _, ultimo = almacen.rango()
+    ventanas = almacen.ventanas()
+    for n in (7, 30):
+        actual = _entre(maestro, pd.Timestamp(ultimo) - pd.Timedelta(days=n - 1), ultimo)
+        previo = _entre(maestro, pd.Timestamp(ultimo) - pd.Timedelta(days=2 * n - 1),
+                        pd.Timestamp(ultimo) - pd.Timedelta(days=n))
+        assert ventanas[n]['filas'] == len(actual)
+        assert np.isclose(ventanas[n]['ingresos'], actual['Precio_Venta_Final'].sum())
+        assert ventanas[n]['previo']['filas'] == len(previo)
+
+
+def test_particionar_en_bloques_igual_a_la_tabla_completa(maestro):
+    ruta = RAIZ / 'df_consolidado-4.csv'
+    almacen = particionar_en_bloques(str(ruta), filas_por_bloque=2_000)
+    completo = AlmacenTemporal.desde_df(maestro)
+    assert almacen.anchos == completo.anchos == AgregadosTablero.anchos_para(maestro)
+    a, b = almacen.agregados(), completo.agregados()
+    assert _igual(a, b)
+    for eje_a, eje_b in zip(a.grilla_dispersion(), b.grilla_dispersion()):
+        assert np.array_equal(eje_a, eje_b)
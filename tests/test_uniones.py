@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from uniones import DENSIDAD_MAXIMA, CacheIndices, ErrorCardinalidad, IndiceClaves, claves_enteras, unir
+
+
+def _como_merge(hechos, dimension, on):
+    esperado = hechos.merge(dimension, on=on, how='left')
+    esperado[on] = claves_enteras(esperado[on], on)
+    return esperado
+
+
+@pytest.mark.parametrize('escala', [1, DENSIDAD_MAXIMA * 1000])  # Direccionamiento directo y searchsorted
+def test_unir_igual_a_merge(escala):
+    dimension = pd.DataFrame({'SKU_ID': np.array([3, 1, 2, 5]) * escala, 'Categoria': ['c', 'a', 'b', 'e']})
+    hechos = pd.DataFrame({'SKU_ID': pd.array(np.array([1, 2, 4, 5, 1]) * escala, dtype='Int64'),
+                           'Cantidad': [10, 20, 30, 40, 50]})
+    hechos.loc[2, 'SKU_ID'] = pd.NA
+    unida, reporte = unir(hechos, dimension, 'SKU_ID', validar='m:1')
+    unida['SKU_ID'] = claves_enteras(unida['SKU_ID'], 'SKU_ID')
+    pd.testing.assert_frame_equal(unida, _como_merge(hechos, dimension, 'SKU_ID'), check_dtype=False)
+    assert reporte == {'clave': 'SKU_ID', 'filas_hechos': 5, 'filas_resultado': 5, 'sin_pareja': 1,
+                       'fanout': 0, 'claves_duplicadas': 0}
+
+
+def test_dimension_con_duplicados(tablas_teams):
+    trans = tablas_teams['trans']
+    inv = tablas_teams['inv']
+    repetida = pd.concat([inv, inv.iloc[:3]], ignore_index=True)
+
+    with pytest.raises(ErrorCardinalidad, match='3 claves repetidas'):
+        unir(trans, repetida, 'SKU_ID', validar='m:1')
+
+    # Sin validar, las repeticiones multiplican filas como en pandas y quedan en el reporte
+    unida, reporte = unir(trans, repetida, 'SKU_ID')
+    esperado = trans.merge(repetida, on='SKU_ID', how='left')
+    assert len(unida) == len(esperado) == reporte['filas_resultado']
+    assert reporte['fanout'] == len(esperado) - len(trans) > 0
+    assert reporte['claves_duplicadas'] == 3
+    assert np.isclose(unida['Costo_Unitario_USD'].sum(), esperado['Costo_Unitario_USD'].sum())
+
+
+def test_cache_indices_reutiliza_por_claves():
+    cache = CacheIndices(max_entradas=2)
+    serie = pd.Series(['PROD-1', 'PROD-2'])
+    assert cache.obtener(serie, 'SKU_ID') is cache.obtener(serie.copy(), 'SKU_ID')
+    cache.obtener(pd.Series([7]), 'SKU_ID')
+    cache.obtener(pd.Series([8]), 'SKU_ID')
+    assert len(cache) == 2
+    assert isinstance(cache.obtener(serie, 'SKU_ID'), IndiceClaves)
@@ -0,0 +1,152 @@
+"""Uniones por clave entera (SKU_ID, Transaccion_ID) con índices ordenados reutilizables y control de cardinalidad."""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from esquemas import ESQUEMAS, numeros_id
+
+# Prefijo textual de cada clave: 'PROD-1000' -> 1000, 'TRX-10042' -> 10042
+PREFIJOS = ESQUEMAS['consolidado']['ids']
+
+
+class ErrorCardinalidad(ValueError):
+    """La tabla de dimensión repite claves y la unión se pidió como muchos-a-uno"""
+
+
+def claves_enteras(serie, columna):
+    """Clave como int64 (-1 para nulos o valores sin el formato esperado, que nunca encuentran pareja).
+    Los IDs no canónicos ('PROD-01') tampoco: no se cruzan con 'PROD-1'"""
+    if not pd.api.types.is_numeric_dtype(serie):
+        serie, _ = numeros_id(serie, PREFIJOS.get(columna, ''))
+    return serie.astype('Float64').fillna(-1).astype('int64').to_numpy()
+
+
+# Si el rango de claves no supera este múltiplo del número de filas, la búsqueda es por direccionamiento directo
+DENSIDAD_MAXIMA = 8
+
+
+class IndiceClaves:
+    """Claves de una tabla de dimensión ordenadas (argsort estable) con el rango [inicio, fin) de cada una.
+
+    Los IDs (PROD-####, TRX-#####) son enteros casi consecutivos: cuando el rango es compacto se guarda
+    una tabla de desplazamientos indexada por la clave misma (O(1) por búsqueda); si no, searchsorted.
+    Solo depende de la columna clave: se puede reutilizar con cualquier tabla que tenga exactamente
+    esas claves en ese orden (p. ej. el mismo inventario en otro rerun).
+    """
+
+    def __init__(self, claves):
+        self.orden = np.argsort(claves, kind='stable')
+        self.claves = claves[self.orden]
+        validas = self.claves[self.claves >= 0]
+        unicas, repeticiones = np.unique(validas, return_counts=True)
+        self.claves_unicas = unicas
+        self.claves_duplicadas = int((repeticiones > 1).sum())
+        self.filas_duplicadas = int((repeticiones - 1).sum())
+
+        self._desplazamientos = None
+        if len(unicas) and unicas[-1] - unicas[0] < DENSIDAD_MAXIMA * len(unicas) + 1024:
+            self._minimo = int(unicas[0])
+            conteos = np.bincount(validas - self._minimo, minlength=int(unicas[-1]) - self._minimo + 1)
+            inicio_validas = len(self.claves) - len(validas)  # Las claves nulas (-1) quedan al principio
+            self._desplazamientos = inicio_validas + np.concatenate([[0], np.cumsum(conteos)])
+
+    @classmethod
+    def desde_serie(cls, serie, columna):
+        return cls(claves_enteras(serie, columna))
+
+    def __len__(self):
+        return len(self.claves)
+
+    def rangos(self, claves):
+        """Para cada clave buscada, [inicio, fin) de sus filas dentro de `self.orden`"""
+        if self._desplazamientos is not None:
+            pos = claves - self._minimo
+            fuera = (pos < 0) | (pos >= len(self._desplazamientos) - 1)
+            pos[fuera] = 0
+            inicio = self._desplazamientos[pos]
+            fin = self._desplazamientos[pos + 1]
+            fin[fuera] = inicio[fuera]
+            return inicio, fin
+        inicio = np.searchsorted(self.claves, claves, side='left')
+        fin = np.searchsorted(self.claves, claves, side='right')
+        fin[claves < 0] = inicio[claves < 0]  # Los nulos no se cruzan con nada
+        return inicio, fin
+
+
+class CacheIndices:
+    """Cache LRU de índices por huella de la columna clave, compartida por todas las sesiones"""
+
+    def __init__(self, max_entradas=16):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, serie, columna):
+        claves = claves_enteras(serie, columna)
+        huella = (columna, hashlib.blake2b(claves.tobytes(), digest_size=16).hexdigest())
+        with self._lock:
+            if huella in self._entradas:
+                self._entradas.move_to_end(huella)
+                return self._entradas[huella]
+        indice = IndiceClaves(claves)
+        with self._lock:
+            self._entradas[huella] = indice
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return indice
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+cache_indices = CacheIndices()
+
+
+def unir(hechos, dimension, on, validar=None, indice=None, sufijos=('_x', '_y')):
+    """Left join de `hechos` con `dimension` por la clave `on`, equivalente a `pd.merge(how='left')`.
+
+    Las claves se comparan como enteros y la dimensión se busca en un índice ordenado cacheado.
+    Con `validar='m:1'` lanza ErrorCardinalidad si la dimensión repite claves; sin validar, las
+    repeticiones multiplican filas como en pandas y quedan contadas en el reporte.
+    Devuelve (tabla unida, reporte de cardinalidad).
+    """
+    if indice is None:
+        indice = cache_indices.obtener(dimension[on], on)
+    if validar == 'm:1' and indice.claves_duplicadas:
+        raise ErrorCardinalidad(f"{on}: {indice.claves_duplicadas} claves repetidas en la tabla de dimensión")
+
+    buscadas = claves_enteras(hechos[on], on)
+    inicio, fin = indice.rangos(buscadas)
+    coincidencias = fin - inicio
+    repeticiones = np.maximum(coincidencias, 1)
+
+    # Fila de hechos repetida una vez por coincidencia; posición en la dimensión (-1 = sin pareja)
+    filas_hechos = np.repeat(np.arange(len(hechos)), repeticiones)
+    desplazamiento = np.arange(len(filas_hechos)) - np.repeat(np.cumsum(repeticiones) - repeticiones, repeticiones)
+    con_pareja = np.repeat(coincidencias > 0, repeticiones)
+    pos_ordenada = np.where(con_pareja, np.repeat(inicio, repeticiones) + desplazamiento, 0)
+    filas_dimension = np.where(con_pareja, indice.orden[pos_ordenada] if len(indice) else -1, -1)
+
+    izquierda = (hechos.iloc[filas_hechos] if len(filas_hechos) > len(hechos) else hechos).reset_index(drop=True)
+    derecha = dimension.drop(columns=on).reset_index(drop=True).reindex(filas_dimension).reset_index(drop=True)
+    comunes = izquierda.columns.intersection(derecha.columns)
+    if len(comunes):
+        izquierda = izquierda.rename(columns={c: f'{c}{sufijos[0]}' for c in comunes})
+        derecha = derecha.rename(columns={c: f'{c}{sufijos[1]}' for c in comunes})
+
+    reporte = {
+        'clave': on,
+        'filas_hechos': len(hechos),
+        'filas_resultado': len(filas_hechos),
+        'sin_pareja': int((coincidencias == 0).sum()),
+        'fanout': int(len(filas_hechos) - len(hechos)),
+        'claves_duplicadas': indice.claves_duplicadas,
+    }
+    return pd.concat([izquierda, derecha], axis=1), reporte